@@ -0,0 +1,126 @@
+import asyncio
+from collections import deque
+from pymongo import UpdateOne
+import config
+from utils.logger import bot_logger
+
+MAX_STORED_MESSAGES = 1000  # Per-user cap on the messages array
+
+
+class ChatWriteBuffer:
+    def __init__(self, users_collection, flush_interval_ms=None, max_batch=None, max_pending=None, on_flush=None):
+        self.users_collection = users_collection
+        self.flush_interval = (flush_interval_ms or getattr(config, 'CHAT_FLUSH_INTERVAL_MS', 500)) / 1000
+        self.max_batch = max_batch or getattr(config, 'CHAT_FLUSH_MAX_BATCH', 200)
+        self.max_pending = max_pending or getattr(config, 'CHAT_FLUSH_MAX_PENDING', 20000)
+        self.on_flush = on_flush
+
+        self.pending = deque()
+        self.batch_ready = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self._task = None
+        self._closing = False
+
+        self.flushed_messages = 0
+        self.flushed_batches = 0
+        self.dropped_messages = 0
+        self.failed_flushes = 0
+
+    @property
+    def queue_depth(self):
+        return len(self.pending)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.ensure_future(self._run())
+
+    def enqueue(self, user_id, username, message):
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped_messages += 1
+        self.pending.append((user_id, username, message))
+        if len(self.pending) >= self.max_batch:
+            self.batch_ready.set()
+        self.start()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self.batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.batch_ready.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+
+            batch = []
+            while self.pending:
+                batch.append(self.pending.popleft())
+
+            # Coalesce per user, keeping message order
+            per_user = {}
+            for user_id, username, message in batch:
+                entry = per_user.setdefault(user_id, {'username': username, 'messages': []})
+                entry['username'] = username
+                entry['messages'].append(message)
+
+            operations = [
+                UpdateOne(
+                    {'_id': user_id},
+                    {
+                        '$set': {'username': entry['username'].lower()},
+                        '$push': {
+                            'messages': {
+                                '$each': entry['messages'],
+                                '$slice': -MAX_STORED_MESSAGES
+                            }
+                        }
+                    },
+                    upsert=True
+                )
+                for user_id, entry in per_user.items()
+            ]
+
+            try:
+                await self.users_collection.bulk_write(operations, ordered=False)
+            except Exception as e:
+                self.failed_flushes += 1
+                bot_logger.error(f"Failed to flush {len(batch)} chat messages: {e}")
+                # Put the batch back in front so it is retried on the next tick
+                self.pending.extendleft(reversed(batch))
+                while len(self.pending) > self.max_pending:
+                    self.pending.popleft()
+                    self.dropped_messages += 1
+                return
+
+            self.flushed_messages += len(batch)
+            self.flushed_batches += 1
+            bot_logger.debug(f"Flushed {len(batch)} chat messages for {len(per_user)} users")
+
+        if self.on_flush:
+            self.on_flush(per_user)
+
+    async def close(self):
+        self._closing = True
+        self.batch_ready.set()
+        if self._task:
+            try:
+                await self._task
+            except Exception as e:
+                bot_logger.error(f"Chat write buffer stopped with an error: {e}")
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "flushed_messages": self.flushed_messages,
+            "flushed_batches": self.flushed_batches,
+            "dropped_messages": self.dropped_messages,
+            "failed_flushes": self.failed_flushes,
+        }
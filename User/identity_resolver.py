@@ -0,0 +1,200 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+import config
+from utils.logger import api_logger
+
+HELIX_USERS_URL = "https://api.twitch.tv/helix/users"
+HELIX_MAX_LOGINS = 100
+LOGIN_PATTERN = re.compile(r'^[a-z0-9_]{1,25}$')
+
+
+class TwitchIdentityResolver:
+    def __init__(self, db, http, token_provider, maxsize=5000, ttl_days=None, negative_ttl=600, batch_window=0.02):
+        self.collection = db['twitch_identities']
+        self.http = http
+        self.token_provider = token_provider
+        self.maxsize = maxsize
+        self.ttl = timedelta(days=ttl_days or getattr(config, 'IDENTITY_TTL_DAYS', 7))
+        self.negative_ttl = negative_ttl
+        self.batch_window = batch_window
+
+        self.cache = OrderedDict()  # login -> (expires_at, user_id or None)
+        self.pending = {}  # login -> Future waiting on the next Helix batch
+        self.dirty = {}  # login -> user_id learned from chat, not yet persisted
+        self._flush_task = None
+        self._persist_task = None
+        self.background_tasks = set()  # Helix batches and identity writes still in flight
+
+        self.hits = 0
+        self.misses = 0
+        self.helix_calls = 0
+
+    @staticmethod
+    def normalize(login):
+        return login.lstrip('@').strip().lower()
+
+    def _remember(self, login, user_id, ttl_seconds):
+        self.cache[login] = (time.monotonic() + ttl_seconds, user_id)
+        self.cache.move_to_end(login)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    def _lookup(self, login):
+        entry = self.cache.get(login)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self.cache[login]
+            return False, None
+        self.cache.move_to_end(login)
+        return True, entry[1]
+
+    def peek(self, login):
+        return self._lookup(self.normalize(login))[1]
+
+    def learn(self, user_id, login):
+        # IDs seen in chat are authoritative and free, so they never cost a Helix call
+        if not user_id or not login:
+            return
+        login = self.normalize(login)
+        known, cached_id = self._lookup(login)
+        if known and cached_id == user_id:
+            return
+        self._remember(login, user_id, self.ttl.total_seconds())
+        self.dirty[login] = user_id
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.ensure_future(self._persist_learned())
+
+    async def _persist_learned(self):
+        await asyncio.sleep(5)
+        learned, self.dirty = self.dirty, {}
+        if learned:
+            # Tracked rather than awaited, so cancelling the timer in close() can't cut a write short
+            self._spawn(self._store(learned))
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _store(self, identities):
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({'_id': login}, {'$set': {'user_id': user_id, 'updated_at': now}}, upsert=True)
+            for login, user_id in identities.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            api_logger.error(f"Failed to persist {len(operations)} Twitch identities: {e}")
+
+    async def resolve(self, login):
+        login = self.normalize(login)
+        if not LOGIN_PATTERN.match(login):
+            return None
+
+        known, user_id = self._lookup(login)
+        if known:
+            self.hits += 1
+            return user_id
+
+        self.misses += 1
+        future = self.pending.get(login)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[login] = future
+            if len(self.pending) >= HELIX_MAX_LOGINS:
+                self._spawn(self._flush())
+            elif self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.ensure_future(self._flush_after_window())
+        return await asyncio.shield(future)
+
+    async def resolve_many(self, logins):
+        user_ids = await asyncio.gather(*(self.resolve(login) for login in logins))
+        return dict(zip(logins, user_ids))
+
+    async def _flush_after_window(self):
+        # Give concurrent commands a moment to join the same batch
+        await asyncio.sleep(self.batch_window)
+        while self.pending:
+            await self._flush()
+
+    async def _flush(self):
+        batch = {}
+        for login in list(self.pending)[:HELIX_MAX_LOGINS]:
+            batch[login] = self.pending.pop(login)
+        if not batch:
+            return
+
+        try:
+            found = await self._resolve_batch(list(batch))
+        except Exception as e:
+            api_logger.error(f"Failed to resolve Twitch logins {list(batch)}: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_result(None)
+            return
+
+        for login, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(login))
+
+    async def _resolve_batch(self, logins):
+        found = {}
+        cutoff = datetime.utcnow() - self.ttl
+        cursor = self.collection.find({'_id': {'$in': logins}, 'updated_at': {'$gt': cutoff}})
+        async for doc in cursor:
+            found[doc['_id']] = doc['user_id']
+            self._remember(doc['_id'], doc['user_id'], self.ttl.total_seconds())
+
+        missing = [login for login in logins if login not in found]
+        if not missing:
+            return found
+
+        headers = {
+            "Client-ID": config.TWITCH_CLIENT_ID,
+            "Authorization": f"Bearer {await self.token_provider()}"
+        }
+        self.helix_calls += 1
+        response = await self.http.get(HELIX_USERS_URL, params=[('login', login) for login in missing], headers=headers)
+        if response.status != 200:
+            # Transient failure: don't negative-cache, the next lookup will retry
+            api_logger.warning(f"Helix user lookup failed for {len(missing)} logins. Status: {response.status}")
+            return found
+
+        resolved = {user['login'].lower(): user['id'] for user in response.json().get('data', [])}
+        for login in missing:
+            if login in resolved:
+                self._remember(login, resolved[login], self.ttl.total_seconds())
+            else:
+                self._remember(login, None, self.negative_ttl)
+        if resolved:
+            await self._store(resolved)
+        found.update(resolved)
+        return found
+
+    async def close(self):
+        # Answer lookups already batched and persist identities still waiting on the write timer
+        if self._persist_task is not None and not self._persist_task.done():
+            self._persist_task.cancel()
+        learned, self.dirty = self.dirty, {}
+        if learned:
+            self._spawn(self._store(learned))
+        if self._flush_task is not None and not self._flush_task.done():
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        while self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "helix_calls": self.helix_calls,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
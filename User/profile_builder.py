@@ -0,0 +1,226 @@
+import asyncio
+import re
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+import config
+from api.prompt_builder import dedupe_lines, prompt_builder
+from utils.logger import bot_logger
+
+TOP_TOPICS = 15
+TOP_PHRASES = 10
+TOP_EMOTES = 10
+RECENT_MESSAGES = 10
+DECAY = 0.9  # Older activity fades a little on every rebuild so profiles follow current habits
+
+STOPWORDS = frozenset("""
+    a about after again all also am an and any are as at be because been but by can could did do does
+    dont for from get got had has have he her him his how i im if in into is it its just know like lol
+    me more my no not now of oh ok on one or our out really so some than that thats the their them then
+    there they this to too up us was we well were what when who why will with would yeah yes you your
+""".split())
+
+WORD = re.compile(r"[a-z][a-z0-9']{2,}")
+# Twitch emote names: channel emotes (volicHype), CamelCase globals (PogChamp, KEKW, LUL)
+EMOTE = re.compile(r'^(?:[a-z]{3,}[A-Z0-9]\w*|[A-Z][a-z]+[A-Z]\w*|[A-Z]{3,}[a-z]?)$')
+
+DIGEST_SYSTEM_PROMPT = (
+    "You keep short, playful profiles of Twitch chatters for a chatbot. "
+    "Given the previous profile and the chatter's newest messages, write an updated profile "
+    "of 2-3 sentences, under 300 characters, describing their interests, humor and chat habits. "
+    "Only describe what the messages support."
+)
+
+
+def _top(counter, limit, minimum=0.5):
+    return {key: round(value, 2) for key, value in counter.most_common(limit) if value >= minimum}
+
+
+def _hour(timestamp):
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.hour
+
+
+class ProfileBuilder:
+    def __init__(self, db, llm=None, rebuild_every=None, digest_every=None):
+        self.profiles = db['user_profiles']
+        self.users = db['users']
+        self.llm = llm
+        self.rebuild_every = rebuild_every or getattr(config, 'PROFILE_REBUILD_EVERY', 25)
+        self.digest_every = digest_every or getattr(config, 'PROFILE_DIGEST_EVERY', 100)
+        self.pending_max_age = getattr(config, 'PROFILE_PENDING_MAX_AGE', 1800)
+        self.max_pending_users = getattr(config, 'PROFILE_MAX_PENDING_USERS', 5000)
+
+        # user_id -> {'username': str, 'messages': [message dicts], 'since': monotonic}, oldest first
+        self.pending = OrderedDict()
+        self.queue = asyncio.Queue()
+        self.queued = set()
+        self.listeners = []  # callback(user_id) after a profile is rewritten
+        self._task = None
+
+        self.rebuilds = 0
+        self.digests = 0
+        self.failures = 0
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def on_messages(self, per_user):
+        # Fed from ChatWriteBuffer flushes; cheap bookkeeping only, the rebuild runs in the background
+        for user_id, entry in per_user.items():
+            pending = self.pending.get(user_id)
+            if pending is None:
+                pending = self.pending[user_id] = {'username': entry['username'], 'messages': [], 'since': time.monotonic()}
+            pending['username'] = entry['username']
+            pending['messages'].extend(entry['messages'])
+            if len(pending['messages']) >= self.rebuild_every:
+                self._schedule(user_id)
+        self._age_out()
+
+    def _age_out(self):
+        # Light chatters never reach rebuild_every; build from what they have once their buffer is old
+        # or too many are waiting, so pending can't grow with every chatter the bot has ever seen
+        now = time.monotonic()
+        excess = len(self.pending) - self.max_pending_users
+        for user_id, entry in self.pending.items():
+            if excess <= 0 and now - entry['since'] < self.pending_max_age:
+                break
+            excess -= 1
+            if user_id not in self.queued:
+                self._schedule(user_id)
+
+    def seed(self, user_id, username, messages):
+        # Users who chatted before profiles existed get one built from their stored history
+        if user_id in self.pending or user_id in self.queued:
+            return
+        self.pending[user_id] = {'username': username, 'messages': list(messages), 'since': time.monotonic()}
+        self._schedule(user_id)
+
+    def _schedule(self, user_id):
+        if user_id not in self.queued:
+            self.queued.add(user_id)
+            self.queue.put_nowait(user_id)
+            self.start()
+
+    async def get(self, user_id):
+        return await self.profiles.find_one({'_id': user_id})
+
+    async def _run(self):
+        while True:
+            user_id = await self.queue.get()
+            try:
+                await self.rebuild(user_id)
+            except Exception as e:
+                self.failures += 1
+                bot_logger.error(f"Failed to rebuild profile for user {user_id}: {e}")
+            finally:
+                self.queued.discard(user_id)
+
+    async def rebuild(self, user_id):
+        entry = self.pending.pop(user_id, None)
+        if not entry or not entry['messages']:
+            return
+        messages = entry['messages']
+
+        profile = await self.profiles.find_one({'_id': user_id}) or {}
+        if profile:
+            user = await self.users.find_one({'_id': user_id}, {'quotes': 1})
+        else:
+            # First build: fold in the stored history, which may predate profiles and already
+            # holds the flushed messages that triggered this rebuild; oldest first, like the history
+            user = await self.users.find_one({'_id': user_id}, {'quotes': 1, 'messages': 1})
+            history = (user or {}).get('messages') or []
+            stored = {(message.get('content'), message.get('timestamp')) for message in history}
+            messages = history + [
+                message for message in messages if (message.get('content'), message.get('timestamp')) not in stored
+            ]
+        contents = [message.get('content') or '' for message in messages]
+
+        topics = Counter({key: value * DECAY for key, value in profile.get('topics', {}).items()})
+        phrases = Counter({key: value * DECAY for key, value in profile.get('phrases', {}).items()})
+        emotes = Counter({key: value * DECAY for key, value in profile.get('emotes', {}).items()})
+        hours = list(profile.get('active_hours') or [0] * 24)
+
+        for content in contents:
+            message_emotes = [token for token in content.split() if EMOTE.match(token)]
+            emotes.update(message_emotes)
+            skip = STOPWORDS.union(emote.lower() for emote in message_emotes)
+            words = [word for word in WORD.findall(content.lower()) if word not in skip]
+            topics.update(word for word in words if len(word) >= 4)
+            phrases.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        for message in messages:
+            hour = _hour(message.get('timestamp'))
+            if hour is not None:
+                hours[hour] += 1
+
+        since_digest = profile.get('messages_since_digest', 0) + len(messages)
+        recent = dedupe_lines((profile.get('recent_messages') or []) + contents)[-RECENT_MESSAGES:]
+
+        update = {
+            'username': entry['username'].lower(),
+            'topics': _top(topics, TOP_TOPICS),
+            'phrases': _top(phrases, TOP_PHRASES, minimum=1.5),  # One-off word pairs are noise
+            'emotes': _top(emotes, TOP_EMOTES),
+            'active_hours': hours,
+            'recent_messages': recent,
+            'quote_count': len((user or {}).get('quotes', [])),
+            'message_count': profile.get('message_count', 0) + len(messages),
+            'messages_since_digest': since_digest,
+            'updated_at': datetime.now(timezone.utc),
+        }
+        if self.llm and (since_digest >= self.digest_every or not profile.get('digest')):
+            digest = await self._digest(entry['username'], profile.get('digest'), contents)
+            if digest:
+                update['digest'] = digest
+                update['messages_since_digest'] = 0
+
+        await self.profiles.update_one({'_id': user_id}, {'$set': update}, upsert=True)
+        self.rebuilds += 1
+        for callback in self.listeners:
+            callback(user_id)
+
+    async def _digest(self, username, previous, contents):
+        history = prompt_builder.fit_lines(contents, getattr(config, 'PROFILE_DIGEST_TOKENS', 400))
+        if not history:
+            return None
+        prompt = (
+            f"Chatter: {username}\n"
+            f"Previous profile: {previous or '(none yet)'}\n"
+            "Newest messages:\n" + "\n".join(history)
+        )
+        try:
+            digest = await self.llm.complete(
+                messages=[
+                    {"role": "system", "content": DIGEST_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=120
+            )
+        except Exception as e:
+            bot_logger.warning(f"Profile digest for {username} failed, keeping the previous one: {e}")
+            return None
+        self.digests += 1
+        return digest
+
+    def stats(self):
+        return {
+            "pending_users": len(self.pending),
+            "queued": self.queue.qsize(),
+            "rebuilds": self.rebuilds,
+            "digests": self.digests,
+            "failures": self.failures,
+        }
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
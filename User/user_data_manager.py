@@ -1,42 +1,40 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
-import aiohttp
 import config
 import asyncio
 from datetime import datetime, timedelta
 from utils.logger import bot_logger
-from functools import lru_cache, wraps
-import time
-from datetime import datetime, timedelta
+from utils.async_cache import AsyncTTLCache
 from User.ignored_user_manager import IgnoredUserManager
-
-def timed_lru_cache(seconds: int, maxsize: int = 128):
-    def wrapper_cache(func):
-        cached_func = lru_cache(maxsize=maxsize)(func)
-        cached_func.lifetime = timedelta(seconds=seconds)
-        cached_func.expiration = datetime.utcnow() + cached_func.lifetime
-
-        @wraps(cached_func)
-        def wrapped_func(*args, **kwargs):
-            if datetime.utcnow() >= cached_func.expiration:
-                cached_func.cache_clear()
-                cached_func.expiration = datetime.utcnow() + cached_func.lifetime
-
-            return cached_func(*args, **kwargs)
-
-        wrapped_func.cache_clear = cached_func.cache_clear  # Ensure cache_clear is accessible
-        return wrapped_func
-
-    return wrapper_cache
+from User.chat_write_buffer import ChatWriteBuffer
+from User.identity_resolver import TwitchIdentityResolver
+from User.profile_builder import ProfileBuilder
+from api.prompt_builder import prompt_builder
+from api.similarity_engine import SimilarityEngine
 
 class UserDataManager:
-    def __init__(self, users_collection, ignored_users_file):
+    def __init__(self, users_collection, ignored_users_file, http, quote_managers, llm=None):
         self.users_collection = users_collection['users']
+        self.quotes_collection = users_collection['quotes']
+        self.http = http
+        self.quote_managers = quote_managers  # channel -> QuoteManager, owned by the bot
         self.ignored_user_manager = IgnoredUserManager(ignored_users_file)
         self.access_token = None
         self.token_expiry = datetime.now()
-        self.cache = {}
-        self.cache_timeout = 300  # 5 minutes
+        self.user_cache = AsyncTTLCache(ttl=300, maxsize=1000)
+        # Summaries are allowed to lag chat by up to their TTL; quote changes invalidate them explicitly
+        self.summary_cache = AsyncTTLCache(ttl=getattr(config, 'USER_SUMMARY_TTL', 120), maxsize=1000)
+        self.write_buffer = ChatWriteBuffer(self.users_collection, on_flush=self.on_chat_flushed)
+        self.identity_resolver = TwitchIdentityResolver(users_collection, http, self.ensure_valid_access_token)
+        self.user_quote_ids = AsyncTTLCache(ttl=3600, maxsize=5000)  # user_id -> [quote_id]
+        self.quote_owner_ids = {}  # username -> user_id, to invalidate by quote author
+        self.quote_docs = AsyncTTLCache(ttl=3600, maxsize=5000)  # quotes outside the loaded channel stores
+        # Condensed per-user profiles, rebuilt in the background every few flushed messages
+        self.profile_builder = ProfileBuilder(users_collection, llm)
+        self.profile_builder.add_listener(self.invalidate_user_summary)
+        # Hashed TF-IDF chat vectors behind compatibility scores and the !ship leaderboard
+        self.similarity = SimilarityEngine(users_collection)
+        self.background_tasks = set()
 
     def clean_username(self, username):
         return username.lstrip('@').lower()
@@ -50,65 +48,72 @@ class UserDataManager:
                 'grant_type': 'client_credentials'
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        self.access_token = data['access_token']
-                        self.token_expiry = datetime.now() + timedelta(seconds=data['expires_in'] - 300)
-                        print("Successfully refreshed Twitch access token")
-                    else:
-                        print(f"Failed to refresh access token. Status: {response.status}")
+            response = await self.http.post(url, params=params)
+            if response.status == 200:
+                data = response.json()
+                self.access_token = data['access_token']
+                self.token_expiry = datetime.now() + timedelta(seconds=data['expires_in'] - 300)
+                print("Successfully refreshed Twitch access token")
+            else:
+                print(f"Failed to refresh access token. Status: {response.status}")
         return self.access_token
 
     async def get_user_info_by_name_or_id(self, identifier):
         if isinstance(identifier, str):
-            url = f"https://api.twitch.tv/helix/users?login={identifier}"
-        else:
-            url = f"https://api.twitch.tv/helix/users?id={identifier}"
+            return await self.identity_resolver.resolve(identifier)
+
+        url = f"https://api.twitch.tv/helix/users?id={identifier}"
         
         headers = {
             "Client-ID": config.TWITCH_CLIENT_ID,
             "Authorization": f"Bearer {await self.ensure_valid_access_token()}"
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data['data']:
-                        return data['data'][0]['id']
-                print(f"Failed to get user ID for {identifier}. Status: {response.status}")
+        response = await self.http.get(url, headers=headers)
+        if response.status == 200:
+            data = response.json()
+            if data['data']:
+                return data['data'][0]['id']
+        print(f"Failed to get user ID for {identifier}. Status: {response.status}")
         return None
 
     async def get_user_info(self, user_id):
-        current_time = time.time()
-        if user_id in self.cache and current_time - self.cache[user_id]['timestamp'] < self.cache_timeout:
-            bot_logger.debug(f"Cache hit for user_id: {user_id}")
-            return self.cache[user_id]['data']
+        return await self.user_cache.get_or_compute(user_id, lambda: self._load_user_info(user_id))
 
+    async def _load_user_info(self, user_id):
         user_data = await self.users_collection.find_one({'_id': user_id})
         
         if user_data:
-            self.cache[user_id] = {'data': user_data, 'timestamp': current_time}
-            bot_logger.debug(f"User data summary for ID {user_id}: username: {user_data.get('username', 'Unknown')}, message count: {len(user_data.get('messages', []))}")
+            bot_logger.debug("User data summary for ID %s: username: %s, message count: %d", user_id, user_data.get('username', 'Unknown'), len(user_data.get('messages', [])))
         else:
-            bot_logger.debug(f"No user data found for user_id: {user_id}")
+            bot_logger.debug("No user data found for user_id: %s", user_id)
 
         return user_data
 
     async def get_user_data(self, user_id):
+        profile = await self.profile_builder.get(user_id)
+        if profile:
+            all_quotes = await self.get_user_quotes(user_id)
+            return {
+                'all_messages': profile.get('recent_messages', []),
+                'all_quotes': [quote['text'] for quote in all_quotes],
+                'profile': profile.get('digest', ''),
+            }
+
         user_data = await self.get_user_info(user_id)
         if not user_data:
             return {'all_messages': [], 'all_quotes': []}
         
         all_messages = [msg['content'] for msg in user_data.get('messages', [])]
+        self.profile_builder.seed(user_id, user_data.get('username', ''), user_data.get('messages', []))
         all_quotes = await self.get_user_quotes(user_id)
         return {
             'all_messages': all_messages,
             'all_quotes': [quote['text'] for quote in all_quotes]
     }
 
-    async def update_user_chat_data(self, user_id, username, message_content, timestamp):
+    def update_user_chat_data(self, user_id, username, message_content, timestamp, channel=None):
+        self.identity_resolver.learn(user_id, username)
+
         if username.lstrip('@').lower() in self.ignored_user_manager.ignored_users:
             bot_logger.info(f"Ignoring message from {username} (ID: {user_id})")
             return
@@ -120,68 +125,138 @@ class UserDataManager:
             'content': message_content,
             'timestamp': timestamp.isoformat()
         }
+        if channel:
+            new_message['channel'] = channel
 
-        result = await self.users_collection.update_one(
-            {'_id': user_id},
-            {
-                '$set': {'username': username.lower()},
-                '$push': {
-                    'messages': {
-                        '$each': [new_message],
-                        '$slice': -1000  # Keep only the last 1000 messages
-                    }
-                }
-            },
-            upsert=True
-        )
-        bot_logger.info(f"Updated user data for {username} (ID: {user_id}). Modified count: {result.modified_count}")
-        self.get_user_summary.cache_clear()
+        # Buffered; the write-behind flusher persists it with one bulk_write per batch
+        self.write_buffer.enqueue(user_id, username, new_message)
+
+    def on_chat_flushed(self, per_user):
+        for user_id in per_user:
+            self.user_cache.invalidate(user_id)
+        self.profile_builder.on_messages(per_user)
+        self.similarity.on_messages(per_user)
+        unseeded = [user_id for user_id in per_user if self.similarity.needs_seed(user_id)]
+        if unseeded:
+            task = asyncio.ensure_future(self._seed_similarity(unseeded))
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
+
+    async def _seed_similarity(self, user_ids):
+        for user_id in user_ids:
+            try:
+                await self.seed_similarity(user_id)
+            except Exception as e:
+                bot_logger.warning(f"Failed to seed similarity vector for {user_id}: {e}")
+
+    async def seed_similarity(self, user_id, channel_name=None):
+        # Stored history is folded in once per user, on first sight, alongside what was counted live
+        if not self.similarity.needs_seed(user_id):
+            return
+        if await self.similarity.claim_seed(user_id):
+            user_data = await self.get_user_info(user_id) or {}
+            self.similarity.seed(user_id, user_data.get('username'), user_data.get('messages', []), channel_name)
+        else:
+            await self.similarity.refresh(user_id)
+
+    @property
+    def chat_queue_depth(self):
+        return self.write_buffer.queue_depth
+
+    def start(self):
+        self.write_buffer.start()
+
+    async def close(self):
+        await self.write_buffer.close()
+        await self.identity_resolver.close()
+        await self.profile_builder.close()
+        # The final flush may have started seeding vectors; let it land before the last persist
+        while self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        await self.similarity.close()
+
+    async def get_similarity(self, user1_id, user2_id, channel_name=None):
+        for user_id in (user1_id, user2_id):
+            await self.seed_similarity(user_id, channel_name)
+            if channel_name and self.similarity.has_vector(user_id):
+                self.similarity.add_member(channel_name, user_id)
+        return self.similarity.score(user1_id, user2_id)
 
     async def get_user_quotes(self, user_id):
-        user_data = await self.users_collection.find_one({'_id': user_id})
-        if not user_data or 'quotes' not in user_data:
+        quote_ids = await self.user_quote_ids.get_or_compute(user_id, lambda: self._load_user_quote_ids(user_id))
+        if not quote_ids:
             return []
-        
-        quote_ids = user_data['quotes']
-        quotes = []
+
+        # The loaded channels' quote stores and the shared document cache cover most IDs;
+        # whatever is left is fetched with a single $in query
+        stores = [manager.quote_store for manager in self.quote_managers.values()]
+        quotes = {}
+        missing = []
         for quote_id in quote_ids:
-            quote = await self.bot.quote_manager.quotes_collection.find_one({'_id': quote_id})
+            quote = next((store.get(quote_id) for store in stores if quote_id in store), None) or self.quote_docs.get(quote_id)
             if quote:
-                quotes.append(quote)
-        
-        return quotes
-    
-    @timed_lru_cache(seconds=300, maxsize=1000)
-    async def get_user_summary(self, user_id, channel_name):
+                quotes[quote_id] = quote
+            else:
+                missing.append(quote_id)
+
+        if missing:
+            cursor = self.quotes_collection.find({'_id': {'$in': missing}}, {'text': 1, 'author': 1})
+            async for quote in cursor:
+                self.quote_docs.set(quote['_id'], quote)
+                quotes[quote['_id']] = quote
+
+        return [quotes[quote_id] for quote_id in quote_ids if quote_id in quotes]
+
+    async def _load_user_quote_ids(self, user_id):
+        user_data = await self.users_collection.find_one({'_id': user_id}, {'quotes': 1, 'username': 1})
+        if not user_data:
+            return []
+        if user_data.get('username'):
+            self.quote_owner_ids[user_data['username']] = user_id
+        return user_data.get('quotes', [])
+
+    def invalidate_user_quotes(self, username):
+        user_id = self.quote_owner_ids.pop(username, None) or self.identity_resolver.peek(username)
+        if user_id:
+            self.user_quote_ids.invalidate(user_id)
+            self.invalidate_user_summary(user_id)
+
+    async def get_user_summary(self, user_id, channel_name, token_budget=None):
+        return await self.summary_cache.get_or_compute(
+            (user_id, channel_name, token_budget),
+            lambda: self._build_user_summary(user_id, channel_name, token_budget)
+        )
+
+    def invalidate_user_summary(self, user_id):
+        self.summary_cache.invalidate_where(lambda key: key[0] == user_id)
+
+    async def _build_user_summary(self, user_id, channel_name, token_budget=None):
+        # The condensed profile is a few hundred bytes; the raw user document can be ~100 KB
+        profile = await self.profile_builder.get(user_id)
+        if profile:
+            quotes = await self.get_user_quotes(user_id)
+            return prompt_builder.profile_summary(
+                user_id, channel_name, profile, [quote['text'] for quote in quotes], budget=token_budget
+            )
+
         user_data = await self.get_user_info(user_id)
         
         if not user_data:
             return f"No data available for user ID: {user_id}"
 
-        summary = f"User ID: {user_id}, Channel: {channel_name}\n"
-        summary += f"Username: {user_data.get('username', 'Unknown')}\n"
-        
-        messages = user_data.get('messages', [])
-        summary += f"Messages sent: {len(messages)}\n"
-        
-        recent_messages = messages[-100:]
-        if recent_messages:
-            summary += "Recent messages:\n"
-            for msg in recent_messages:
-                summary += f"- {msg['content']}\n"
-        else:
-            summary += "No recent messages available.\n"
-        
+        # No profile yet: summarise the raw history once and build the profile in the background
+        self.profile_builder.seed(user_id, user_data.get('username', ''), user_data.get('messages', []))
         quotes = await self.get_user_quotes(user_id)
-        if quotes:
-            summary += f"Number of quotes: {len(quotes)}\n"
-            summary += "Recent quotes:\n"
-            for quote in quotes[:5]:
-                summary += f"- {quote['text']}\n"
-        else:
-            summary += "No quotes available.\n"
+        summary = prompt_builder.user_summary(
+            user_id,
+            channel_name,
+            user_data.get('username', 'Unknown'),
+            [msg['content'] for msg in user_data.get('messages', [])],
+            [quote['text'] for quote in quotes],
+            budget=token_budget,
+        )
         
-        bot_logger.debug(f"User summary: {summary}")
+        bot_logger.debug("User summary: %s", summary)
         return summary
     
     async def fetch_user_chat_history(self, user_id, channel_name, limit=1000):
@@ -196,7 +271,7 @@ class UserDataManager:
         while len(all_messages) < limit:
             url = "https://api.twitch.tv/helix/chat/messages"
             params = {
-                "broadcaster_id": broadcaster_id['id'],
+                "broadcaster_id": broadcaster_id,
                 "user_id": user_id,
                 "first": 100
             }
@@ -208,19 +283,18 @@ class UserDataManager:
                 "Authorization": f"Bearer {await self.ensure_valid_access_token()}"
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        messages = data.get("data", [])
-                        all_messages.extend(messages)
-                        pagination = data.get("pagination", {}).get("cursor")
-                        
-                        if not pagination or not messages:
-                            break
-                    else:
-                        print(f"Failed to fetch chat messages. Status: {response.status}")
-                        break
+            response = await self.http.get(url, params=params, headers=headers)
+            if response.status == 200:
+                data = response.json()
+                messages = data.get("data", [])
+                all_messages.extend(messages)
+                pagination = data.get("pagination", {}).get("cursor")
+                
+                if not pagination or not messages:
+                    break
+            else:
+                print(f"Failed to fetch chat messages. Status: {response.status}")
+                break
 
             await asyncio.sleep(1)  # Respect rate limits
 
@@ -232,7 +306,13 @@ class UserDataManager:
         return users
     
     def clear_user_summary_cache(self):
-        self.get_user_summary.cache_clear()
-        bot_logger.info("User summary cache cleared")    
+        self.summary_cache.clear()
+        bot_logger.info("User summary cache cleared")
+
+    def get_cache_stats(self):
+        return {
+            "user_info": self.user_cache.stats(),
+            "user_summary": self.summary_cache.stats(),
+        }
 
 
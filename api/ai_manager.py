@@ -1,83 +1,72 @@
-from openai import OpenAI
-import config
 import logging
-import random
+import config
+from api.llm_engine import LLMEngine
+from api.response_pool import TEMPLATES
+from api.prompt_builder import (
+    CHAT_SYSTEM_PROMPT, PERSONALIZED_SYSTEM_PROMPT, ROAST_SYSTEM_PROMPT, prompt_builder
+)
 
 logger = logging.getLogger(__name__)
-client = OpenAI(api_key=config.OPENAI_API_KEY)
 
 class AIManager:
-    def __init__(self, bot, valorant_manager):
+    def __init__(self, bot, valorant_manager, llm_engine=None, response_pool=None):
         self.bot = bot
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+        self.llm = llm_engine or LLMEngine()
+        self.response_pool = response_pool
         self.valorant_manager = valorant_manager
 
-    async def generate_response(self, user_summary, prompt):
+    async def generate_response(self, user_summary, prompt, max_chars=None):
+        if user_summary:
+            prompt = f"Here's a summary of the user you're talking to:\n{user_summary}\n\n{prompt}"
+        messages = [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": f"You are VolicTV's witty and sarcastic Twitch chatbot assistant. You love gaming, especially Valorant, and often make playful jabs at VolicTV, or anyone who is a moderator in the chat. Keep responses under 400 characters. Here's a summary of the user you're talking to:\n{user_summary}"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=100
-            )
-            return response.choices[0].message.content.strip()
+            if max_chars:
+                # Stream and stop at the chat length budget instead of truncating a finished answer
+                return await self.llm.stream_complete(messages, max_chars=max_chars)
+            return await self.llm.complete(messages=messages, max_tokens=100)
         except Exception as e:
             print(f"Error generating AI response: {e}")
             return "I'm sorry, I couldn't generate a response at this time."
 
     async def generate_roast(self, user_data: dict, target: str) -> str:
-        # Extract all messages from user_data
-        all_messages = user_data.get('all_messages', [])
-        all_quotes = user_data.get('all_quotes', [])    
-        
-        # Join all messages into a single string, limiting to last 1000 characters if too long
-        message_history = " ".join(all_messages)
-        if len(message_history) > 1000:
-            message_history = message_history[-1000:]
-
-        prompt = f"""Generate a savage, witty roast for {target} based on their chat history:
-
-            Chat history: {message_history}
-            Quotes: {all_quotes}
-
-            The roast should be:
-            1. Funny and clever
-            2. Related to the user's chat history or Valorant stats if available
-            3. No more than 3 sentences
-            4. Adult Friendly
-            5. Include 1-2 appropriate emojis
-            6. Reference their chat messages or behavior
-            7. If possible, incorporate or reference one of their memorable quotes
-
-            Keep it mean but not too personal."""
+        # Newest distinct messages and first quotes that fit the roast's token budget
+        message_history = prompt_builder.fit_lines(
+            user_data.get('all_messages', []), getattr(config, 'PROMPT_ROAST_HISTORY_TOKENS', 300)
+        )
+        quotes = prompt_builder.fit_lines(
+            user_data.get('all_quotes', []), getattr(config, 'PROMPT_QUOTE_TOKENS', 120), newest_last=False
+        )
+
+        profile = f"Profile: {user_data['profile']}\n" if user_data.get('profile') else ""
+        prompt = (
+            f"Generate a savage, witty roast for {target} based on their chat history.\n{profile}"
+            "Chat history:\n" + ("\n".join(message_history) or "(none)") + "\n"
+            "Quotes:\n" + ("\n".join(quotes) or "(none)")
+        )
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            return await self.llm.complete(
                 messages=[
-                    {"role": "system", "content": "You are a mean AI assistant skilled in generating playful roasts based on user data, valorant stats, chat history and quotes."},
+                    {"role": "system", "content": ROAST_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
             )
-            return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"Error generating roast: {e}")
             return f"Sorry, I couldn't come up with a roast for {target} right now."
     
     async def generate_volictv_roast(self):
-        prompt = """Generate a savage, witty roast for VolicTV, a Valorant Twitch streamer. The roast should:
-        1. Be clever and unexpected
-        2. Reference Valorant or gaming culture
-        3. Include playful jabs at his streaming skills or gameplay
-        4. Be slightly edgy but not offensive
-        5. Include 1-2 appropriate emojis
-        6. Be no longer than 300 characters
-
-        Make it memorable, funny, and tailored to a Valorant streamer!
-        """
+        pooled = self.pooled_response('volictv_roast')
+        if pooled:
+            return pooled
+        prompt = TEMPLATES['volictv_roast'].prompt
         return await self.generate_enhanced_personalized_response("", prompt, context="Roasting VolicTV, the Valorant streamer")
+
+    def pooled_response(self, name):
+        return self.response_pool.take(name) if self.response_pool else None
     
     async def generate_compliment(self, user_summary, target_user):
         prompt = f"""
@@ -94,45 +83,28 @@ class AIManager:
         return await self.generate_response(user_summary, prompt)
     
     async def generate_enhanced_personalized_response(self, user_summary, prompt, context=""):
-        # Combine user summary, prompt, and context into a single prompt
-        full_prompt = f"""User profile: {user_summary}
-
-        Generate a witty, personalized response to the following prompt:
-        {prompt}
-
-        Additional context: {context}
-
-        The response should:
-        1. Be clever and unexpected
-        2. Include a touch of playful sarcasm or humor
-        3. Reference gaming or Twitch culture if relevant
-        4. Include at least one appropriate emoji
-        5. Be no longer than 400 characters
-        6. Directly address or reference information from the user's profile if applicable
-
-        Make it memorable, funny, and tailored to the user!
-        """
+        # The response rules live in the static system prompt; only per-call data goes here
+        full_prompt = (
+            f"User profile: {user_summary}\n\n"
+            f"Generate a witty, personalized response to the following prompt:\n{prompt}\n\n"
+            f"Additional context: {context}"
+        )
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            return await self.llm.complete(
                 messages=[
-                    {"role": "system", "content": "You are VolicTV's witty and sarcastic Twitch chatbot assistant. You love gaming, especially Valorant, and often make playful jabs at users."},
+                    {"role": "system", "content": PERSONALIZED_SYSTEM_PROMPT},
                     {"role": "user", "content": full_prompt}
                 ],
                 max_tokens=150
             )
-            return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"Error generating enhanced personalized response: {e}")
             return "I'm sorry, I couldn't generate a witty response at this time."
 
     async def generate_rizz(self, user_summary, target_user):
-        # Fetch Valorant pick-up lines
-        valorant_pickup_lines = await self.valorant_manager.fetch_valorant_pickup_lines()
-        
-        # Use a few lines as examples in the prompt
-        example_lines = "\n".join(random.sample(valorant_pickup_lines, min(15, len(valorant_pickup_lines))))
+        # A few Valorant pick-up lines as examples, pre-sampled from the cached corpus
+        example_lines = self.valorant_manager.pickup_lines.sample()
 
         prompt = f"""
         Generate a bold and cheeky one-liner for '{target_user}' that includes references to gaming culture and Valorant.
@@ -148,6 +120,11 @@ class AIManager:
         {example_lines}
         """
         return await self.generate_response(user_summary, prompt)
-    
 
+    def get_llm_stats(self):
+        return self.llm.stats()
 
+    async def close(self):
+        if self.response_pool:
+            await self.response_pool.close()
+        await self.llm.close()
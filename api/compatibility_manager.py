@@ -1,4 +1,4 @@
-import random
+import config
 
 class CompatibilityManager:
     def __init__(self, user_data_manager, ai_manager):
@@ -6,26 +6,37 @@ class CompatibilityManager:
         self.ai_manager = ai_manager
 
     def calculate_compatibility(self, user1_summary, user2_summary):
+        # Fallback for users with no chat vector yet; the same two summaries always give the same score
         common_words = set(user1_summary.lower().split()) & set(user2_summary.lower().split())
-        base_score = len(common_words) * 5
-        random_factor = random.randint(-10, 10)
-        compatibility = base_score + random_factor
-        return max(-100, min(100, compatibility))
+        return max(0, min(100, len(common_words) * 5))
 
-    async def generate_compatibility_report(self, user1, user2):
-        user1_id = await self.user_data_manager.get_user_info_by_name_or_id(user1)
-        user2_id = await self.user_data_manager.get_user_info_by_name_or_id(user2)
+    def ship_leaderboard(self, channel_name):
+        pairs = self.user_data_manager.similarity.leaderboard(channel_name)
+        if pairs is None:
+            return "💘 Still working out who belongs with who in chat, try again in a minute!"
+        if not pairs:
+            return "💘 Not enough chatters to ship anyone yet. Start talking!"
+        ranking = " | ".join(f"{rank}. {user_a} x {user_b} ({score}%)" for rank, (score, user_a, user_b) in enumerate(pairs, 1))
+        return f"💘 Top ships in chat: {ranking}"
+
+    async def generate_compatibility_report(self, user1, user2, channel_name=None):
+        user_ids = await self.user_data_manager.identity_resolver.resolve_many([user1, user2])
+        user1_id, user2_id = user_ids[user1], user_ids[user2]
 
         if not user1_id or not user2_id:
             return "I couldn't find one of the users. Make sure both usernames are correct!"
 
         if user1.lower() == user2.lower():
-            return await self.generate_self_compatibility_response(user1)
+            return await self.generate_self_compatibility_response(user1, user1_id)
 
-        user1_summary = await self.user_data_manager.get_user_summary(user1_id, user1)
-        user2_summary = await self.user_data_manager.get_user_summary(user2_id, user2)
+        # Two profiles share one prompt, so each gets a smaller slice of the budget
+        budget = getattr(config, 'PROMPT_COMPATIBILITY_TOKENS', 250)
+        user1_summary = await self.user_data_manager.get_user_summary(user1_id, user1, token_budget=budget)
+        user2_summary = await self.user_data_manager.get_user_summary(user2_id, user2, token_budget=budget)
 
-        compatibility_score = self.calculate_compatibility(user1_summary, user2_summary)
+        compatibility_score = await self.user_data_manager.get_similarity(user1_id, user2_id, channel_name)
+        if compatibility_score is None:
+            compatibility_score = self.calculate_compatibility(user1_summary, user2_summary)
 
         prompt = f"""
         Generate a concise and fun love compatibility assessment for {user1} and {user2} based on these profiles:
@@ -48,8 +59,9 @@ class CompatibilityManager:
         compatibility_result = await self.ai_manager.generate_response("", prompt)
         return f"💘 {compatibility_result}"
 
-    async def generate_self_compatibility_response(self, username):
-        user_id = await self.user_data_manager.get_user_info_by_name_or_id(username)
+    async def generate_self_compatibility_response(self, username, user_id=None):
+        if not user_id:
+            user_id = await self.user_data_manager.get_user_info_by_name_or_id(username)
         if not user_id:
             return f"I couldn't find user {username}. Are you sure that's the correct username?"
 
@@ -57,7 +69,7 @@ class CompatibilityManager:
         
         prompt = f"""
         Generate a witty and humorous response for {username} who just tried to check their self-compatibility.
-        Use their user profile to personalize the response: {user_summary}
+        Use their user profile to personalize the response.
         The response should:
         1. Be lighthearted and funny, but also 18+, and slightly insulting
         2. Include references to their chat history or behavior
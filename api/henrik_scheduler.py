@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import time
+import config
+from utils.logger import api_logger
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class SchedulerFullError(Exception):
+    pass
+
+
+class HenrikScheduler:
+    def __init__(self, http, rate_limit=None, period=60, max_queue=None, workers=4):
+        self.http = http
+        # HenrikDev's basic keys allow 30 requests/minute; headers correct this once we see a response
+        self.limit = rate_limit or getattr(config, 'HENRIKDEV_RATE_LIMIT', 30)
+        self.period = period
+        self.tokens = float(self.limit)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+        self.max_queue = max_queue or getattr(config, 'HENRIKDEV_MAX_QUEUE', 40)
+        self.queue = asyncio.PriorityQueue()
+        self.sequence = itertools.count()
+        self.inflight = {}  # url -> (Future shared by identical requests, priority)
+        self.worker_count = workers
+        self.workers = []
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated_at) * self.limit / self.period)
+        self.updated_at = now
+
+    async def _acquire_token(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.period / self.limit)
+
+    def _update_from_headers(self, response):
+        headers = response.headers
+        try:
+            limit = headers.get('x-ratelimit-limit')
+            remaining = headers.get('x-ratelimit-remaining')
+            reset = headers.get('x-ratelimit-reset')
+            if limit is not None:
+                self.limit = max(1, int(limit))
+            if remaining is not None:
+                self._refill()
+                self.tokens = min(self.tokens, float(remaining))
+                if int(remaining) <= 0 and reset is not None:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + float(reset))
+            if response.status == 429:
+                self.throttled += 1
+                retry_after = headers.get('Retry-After') or reset or 5
+                self.blocked_until = max(self.blocked_until, time.monotonic() + float(retry_after))
+                self.tokens = 0
+        except (TypeError, ValueError):
+            pass
+
+    def _start_workers(self):
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        while len(self.workers) < self.worker_count:
+            self.workers.append(asyncio.ensure_future(self._worker()))
+
+    async def get(self, url, headers=None, priority=INTERACTIVE):
+        queued = self.inflight.get(url)
+        if queued is not None:
+            future, queued_priority = queued
+            self.coalesced += 1
+            if priority < queued_priority:
+                # An interactive caller joined a background request: queue it again in the fast lane
+                self.inflight[url] = (future, priority)
+                self.queue.put_nowait((priority, next(self.sequence), url, headers, future, 0))
+            return await asyncio.shield(future)
+
+        # Background work gives up early so interactive commands keep the remaining queue space
+        limit = self.max_queue if priority == INTERACTIVE else self.max_queue // 2
+        if self.queue.qsize() >= limit:
+            self.rejected += 1
+            raise SchedulerFullError("HenrikDev request queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[url] = (future, priority)
+        self.submitted += 1
+        self.queue.put_nowait((priority, next(self.sequence), url, headers, future, 0))
+        self._start_workers()
+        return await asyncio.shield(future)
+
+    async def _worker(self):
+        while True:
+            priority, sequence, url, headers, future, attempt = await self.queue.get()
+            if future.done():
+                # Already answered through a promoted duplicate
+                self.queue.task_done()
+                continue
+            try:
+                await self._acquire_token()
+                response = await self.http.get(url, headers=headers, retries=0)
+                self._update_from_headers(response)
+                if response.status == 429 and priority == INTERACTIVE and attempt == 0:
+                    # Retry once after the advertised reset instead of surfacing the 429 in chat
+                    self.queue.put_nowait((priority, sequence, url, headers, future, attempt + 1))
+                    continue
+                self.inflight.pop(url, None)
+                if not future.done():
+                    future.set_result(response)
+            except Exception as e:
+                self.inflight.pop(url, None)
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()
+                api_logger.warning(f"HenrikDev request to {url} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        self._refill()
+        return {
+            "queued": self.queue.qsize(),
+            "inflight": len(self.inflight),
+            "tokens": round(self.tokens, 2),
+            "limit": self.limit,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
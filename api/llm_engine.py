@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import re
+import time
+from collections import deque
+
+import httpx
+from openai import AsyncOpenAI
+
+import config
+from utils.logger import api_logger
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*(?=\s|$)')
+# Chat English runs about 4 characters per token; sizing streams at 3 lets a long answer reach
+# the character budget and be cut at a sentence instead of stopping mid-sentence on max_tokens
+CHARS_PER_TOKEN = 3
+
+
+class LLMTimeoutError(Exception):
+    pass
+
+
+def cut_at_sentence(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    ends = [match.end() for match in SENTENCE_END.finditer(head)]
+    space = head.rfind(' ', 0, max_chars - 1)
+    # Prefer the last full sentence unless it would throw away most of the budget, or a word
+    # cut would keep nothing past it anyway (one long unbroken token after the sentence)
+    if ends and (ends[-1] >= max_chars // 2 or space <= ends[-1]):
+        return head[:ends[-1]].rstrip()
+    return (head[:space] if space > 0 else head[:max_chars - 1]).rstrip() + "…"
+
+
+class LLMEngine:
+    def __init__(self, api_key=None, model=DEFAULT_MODEL, max_concurrency=None, timeout=None):
+        self.model = model
+        self.max_concurrency = max_concurrency or getattr(config, 'LLM_MAX_CONCURRENCY', 4)
+        self.timeout = timeout or getattr(config, 'LLM_TIMEOUT_SECONDS', 20)
+        # One pooled HTTP client shared by every completion, sized to the concurrency limit
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency * 2,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key or config.OPENAI_API_KEY,
+            http_client=self.http_client,
+            max_retries=1,
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_calls = 0
+        self.total_errors = 0
+        self.total_timeouts = 0
+        self.total_cutoffs = 0
+        self.latencies = deque(maxlen=500)
+        self.first_token_latencies = deque(maxlen=500)
+        self.queue_waits = deque(maxlen=500)
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        # Concurrency slot plus the in-flight/queue-wait bookkeeping shared by every call style
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.queue_waits.append(started_at - queued_at)
+        self.in_flight += 1
+        self.total_calls += 1
+        try:
+            yield started_at
+        finally:
+            self.in_flight -= 1
+            self.latencies.append(time.perf_counter() - started_at)
+            self.semaphore.release()
+
+    async def complete(self, messages, max_tokens=None, timeout=None, **kwargs):
+        timeout = timeout or self.timeout
+        params = {"model": self.model, "messages": messages, **kwargs}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+
+        async with self._slot():
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(**params), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                self.total_timeouts += 1
+                api_logger.warning(f"LLM call timed out after {timeout}s")
+                raise LLMTimeoutError(f"LLM call timed out after {timeout}s")
+            except Exception:
+                self.total_errors += 1
+                raise
+
+        return response.choices[0].message.content.strip()
+
+    async def stream_complete(self, messages, max_chars, max_tokens=None, timeout=None, **kwargs):
+        """Stream a completion and stop reading once max_chars is reached, cut at a sentence boundary."""
+        timeout = timeout or self.timeout
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "max_tokens": max_tokens or max_chars // CHARS_PER_TOKEN,
+            **kwargs,
+        }
+
+        async with self._slot() as started_at:
+            try:
+                text, first_token_at = await asyncio.wait_for(
+                    self._read_stream(params, max_chars), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                self.total_timeouts += 1
+                api_logger.warning(f"LLM stream timed out after {timeout}s")
+                raise LLMTimeoutError(f"LLM stream timed out after {timeout}s")
+            except Exception:
+                self.total_errors += 1
+                raise
+
+        finished_at = time.perf_counter()
+        if first_token_at is not None:
+            self.first_token_latencies.append(first_token_at - started_at)
+        api_logger.debug(
+            "LLM stream: first token %.0f ms, total %.0f ms, %d chars%s",
+            ((first_token_at or finished_at) - started_at) * 1000,
+            (finished_at - started_at) * 1000,
+            len(text),
+            " (cut off)" if len(text) >= max_chars else "",
+        )
+        return cut_at_sentence(text, max_chars)
+
+    async def _read_stream(self, params, max_chars):
+        stream = await self.client.chat.completions.create(**params)
+        parts = []
+        length = 0
+        first_token_at = None
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+                length += len(delta)
+                if length > max_chars:
+                    # Everything past the budget would be thrown away; stop paying for it
+                    self.total_cutoffs += 1
+                    break
+        finally:
+            await stream.response.aclose()
+        return "".join(parts).strip(), first_token_at
+
+    @staticmethod
+    def _percentile(samples, pct):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def stats(self):
+        return {
+            "calls": self.total_calls,
+            "errors": self.total_errors,
+            "timeouts": self.total_timeouts,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "latency_p50_ms": round(self._percentile(self.latencies, 50) * 1000, 1),
+            "latency_p95_ms": round(self._percentile(self.latencies, 95) * 1000, 1),
+            "queue_wait_p95_ms": round(self._percentile(self.queue_waits, 95) * 1000, 1),
+            "first_token_p50_ms": round(self._percentile(self.first_token_latencies, 50) * 1000, 1),
+            "first_token_p95_ms": round(self._percentile(self.first_token_latencies, 95) * 1000, 1),
+            "stream_cutoffs": self.total_cutoffs,
+        }
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,154 @@
+import asyncio
+import numpy as np
+from pymongo.errors import BulkWriteError
+from api.valorant_analytics import STAT_FIELDS, MatchTable
+from utils.logger import api_logger
+
+
+def slim_match(match):
+    # Keep only what the analytics engine reads, in the same shape as the HenrikDev payload
+    metadata = match.get('metadata', {})
+    teams = match.get('teams') or {}
+    return {
+        '_id': metadata.get('matchid'),
+        'metadata': {
+            'matchid': metadata.get('matchid'),
+            'map': metadata.get('map'),
+            'mode': metadata.get('mode'),
+            'game_start': metadata.get('game_start') or 0,
+        },
+        'teams': {
+            team: {'has_won': bool(data.get('has_won'))}
+            for team, data in teams.items() if isinstance(data, dict)
+        } if isinstance(teams, dict) else {},
+        'players': {
+            'all_players': [
+                {
+                    'puuid': player.get('puuid'),
+                    'name': player.get('name'),
+                    'tag': player.get('tag'),
+                    'team': player.get('team'),
+                    'character': player.get('character'),
+                    'stats': {field: (player.get('stats') or {}).get(field) or 0 for field in STAT_FIELDS},
+                }
+                for player in match.get('players', {}).get('all_players', [])
+            ]
+        },
+        'kills': [
+            {
+                'killer_puuid': kill.get('killer_puuid'),
+                'damage_weapon_name': kill.get('damage_weapon_name') or kill.get('killer_weapon_name'),
+            }
+            for kill in match.get('kills', [])
+        ],
+    }
+
+
+def _field_key(label):
+    return str(label).replace('.', '_').replace('$', '_')
+
+
+class MatchStore:
+    def __init__(self, db, valorant_manager, fetch_size=10):
+        self.matches = db['valorant_matches']
+        self.aggregates = db['valorant_player_aggregates']
+        self.valorant_manager = valorant_manager
+        self.fetch_size = fetch_size
+        self.locks = {}  # puuid -> Lock, so one player's aggregates are never counted twice
+
+    async def get_aggregate(self, puuid):
+        return await self.aggregates.find_one({'_id': puuid})
+
+    async def get_career_summary(self, puuid):
+        # One line of lifetime totals over every match synced for the player
+        aggregate = await self.get_aggregate(puuid)
+        if not aggregate or not aggregate.get('matches'):
+            return None
+        matches = aggregate['matches']
+        deaths = aggregate.get('deaths', 0)
+        shots = sum(aggregate.get(field, 0) for field in ('headshots', 'bodyshots', 'legshots'))
+        parts = [
+            f"{matches} tracked matches",
+            f"Win Rate: {100 * aggregate.get('wins', 0) / matches:.1f}%",
+            f"K/D: {aggregate.get('kills', 0) / deaths:.2f}" if deaths else f"Kills: {aggregate.get('kills', 0)}",
+        ]
+        if shots:
+            parts.append(f"Headshot %: {100 * aggregate.get('headshots', 0) / shots:.1f}%")
+        for label, key in (("Top Agent", 'agents'), ("Top Map", 'maps'), ("Top Weapon", 'weapons')):
+            counts = aggregate.get(key) or {}
+            if counts:
+                parts.append(f"{label}: {max(counts, key=counts.get)}")
+        return " | ".join(parts)
+
+    async def get_matches(self, puuid, limit=50):
+        cursor = self.matches.find({'players.all_players.puuid': puuid}).sort('metadata.game_start', -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def sync(self, riot_id, account):
+        puuid = account.get('puuid')
+        if not puuid:
+            return 0
+        lock = self.locks.setdefault(puuid, asyncio.Lock())
+        async with lock:
+            return await self._sync(riot_id, account, puuid)
+
+    async def _sync(self, riot_id, account, puuid):
+        aggregate = await self.get_aggregate(puuid)
+        newest = aggregate.get('newest_game_start', 0) if aggregate else 0
+
+        # Probe with the newest match first; only pull a full page when there is something new
+        latest, error = await self.valorant_manager.get_player_recent_matches(riot_id, 1)
+        if error or not latest:
+            return 0
+        if (latest[0].get('metadata', {}).get('game_start') or 0) <= newest:
+            return 0
+
+        recent, error = await self.valorant_manager.get_player_recent_matches(riot_id, self.fetch_size)
+        if error or not recent:
+            return 0
+        new_matches = [
+            slim_match(match) for match in recent
+            if match.get('metadata', {}).get('matchid') and (match['metadata'].get('game_start') or 0) > newest
+        ]
+        if not new_matches:
+            return 0
+
+        try:
+            await self.matches.insert_many(new_matches, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates are matches already stored through another player in the same lobby;
+            # anything else leaves the aggregate untouched so the whole page is retried next sync
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                api_logger.error(f"Failed to store matches for {riot_id}: {e.details}")
+                return 0
+
+        await self._update_aggregate(puuid, account, new_matches)
+        return len(new_matches)
+
+    async def _update_aggregate(self, puuid, account, new_matches):
+        table = MatchTable.from_matches(new_matches, account['name'], account['tag'])
+        if not len(table):
+            return
+
+        increments = {'matches': len(table), 'wins': int(table.won.sum())}
+        for field in STAT_FIELDS:
+            increments[field] = int(table.stats[field].sum())
+        for labels, codes, prefix in (
+            (table.agents, table.agent_codes, 'agents'),
+            (table.maps, table.map_codes, 'maps'),
+            (table.weapons, table.weapon_codes, 'weapons'),
+        ):
+            counts = np.bincount(codes, minlength=len(labels))
+            for label, count in zip(labels, counts):
+                increments[f"{prefix}.{_field_key(label)}"] = int(count)
+
+        newest = max(match['metadata']['game_start'] for match in new_matches)
+        await self.aggregates.update_one(
+            {'_id': puuid},
+            {
+                '$inc': increments,
+                '$max': {'newest_game_start': newest},
+                '$set': {'name': account['name'], 'tag': account['tag']},
+            },
+            upsert=True
+        )
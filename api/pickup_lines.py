@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import random
+import time
+import config
+from utils.logger import api_logger
+from utils.web_scraper import parse_web_data
+
+PICKUP_LINES_URL = "https://psycatgames.com/magazine/conversation-starters/valorant-pick-up-lines/"
+
+
+class PickupLineCorpus:
+    def __init__(self, http, cache_file=None, ttl=None, sample_size=15, sample_count=8):
+        self.http = http
+        self.cache_file = cache_file or getattr(config, 'PICKUP_LINES_CACHE_FILE', 'pickup_lines_cache.json')
+        self.ttl = ttl or getattr(config, 'PICKUP_LINES_TTL', 7 * 86400)
+        self.sample_size = sample_size
+        self.sample_count = sample_count
+
+        self.lines = []
+        self.fetched_at = 0
+        self.samples = []
+        self.next_sample = 0
+        self.refresh_task = None
+        self.load_from_disk()
+
+    def load_from_disk(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as file:
+                cached = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        if cached.get('lines'):
+            self.lines = cached['lines']
+            self.fetched_at = cached.get('fetched_at', 0)
+            self._build_samples()
+
+    def _write_to_disk(self, lines, fetched_at):
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as file:
+            json.dump({'fetched_at': fetched_at, 'lines': lines}, file, ensure_ascii=False)
+        os.replace(temp_file, self.cache_file)
+
+    def _build_samples(self):
+        size = min(self.sample_size, len(self.lines))
+        self.samples = ["\n".join(random.sample(self.lines, size)) for _ in range(self.sample_count)] if size else []
+        self.next_sample = 0
+
+    @property
+    def is_stale(self):
+        return time.time() - self.fetched_at >= self.ttl
+
+    def ensure_fresh(self):
+        if self.is_stale and (self.refresh_task is None or self.refresh_task.done()):
+            self.refresh_task = asyncio.ensure_future(self.refresh())
+
+    async def refresh(self):
+        loop = asyncio.get_running_loop()
+        try:
+            response = await self.http.get(PICKUP_LINES_URL)
+            if response.status != 200:
+                raise RuntimeError(f"status {response.status}")
+            # BeautifulSoup parsing is CPU-bound, keep it off the event loop
+            lines = await loop.run_in_executor(None, parse_web_data, response.text(), None, 'h3')
+        except Exception as e:
+            api_logger.warning(f"Pick-up line refresh failed, keeping {len(self.lines)} cached lines: {e}")
+            # Don't hammer the site: try again after a tenth of the TTL
+            self.fetched_at = max(self.fetched_at, time.time() - self.ttl * 0.9)
+            return
+
+        if not lines:
+            api_logger.warning("Pick-up line refresh returned no lines, keeping the cached copy")
+            self.fetched_at = max(self.fetched_at, time.time() - self.ttl * 0.9)
+            return
+
+        self.lines = lines
+        self.fetched_at = time.time()
+        self._build_samples()
+        api_logger.info(f"Refreshed {len(lines)} Valorant pick-up lines")
+        try:
+            await loop.run_in_executor(None, self._write_to_disk, lines, self.fetched_at)
+        except OSError as e:
+            api_logger.warning(f"Could not write pick-up line cache: {e}")
+
+    def sample(self):
+        self.ensure_fresh()
+        if not self.samples:
+            return ""
+        example = self.samples[self.next_sample]
+        self.next_sample += 1
+        if self.next_sample >= len(self.samples):
+            self._build_samples()
+        return example
@@ -0,0 +1,167 @@
+import re
+import config
+from api.llm_engine import DEFAULT_MODEL
+from utils.logger import api_logger
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a characters/4 estimate
+    tiktoken = None
+
+# Static system prompts. They are kept byte-for-byte identical between calls and all
+# per-user data goes in the user message, so the provider can reuse its cached prefix.
+CHAT_SYSTEM_PROMPT = (
+    "You are VolicTV's witty and sarcastic Twitch chatbot assistant. You love gaming, especially Valorant, "
+    "and often make playful jabs at VolicTV, or anyone who is a moderator in the chat. "
+    "Keep responses under 400 characters."
+)
+
+PERSONALIZED_SYSTEM_PROMPT = (
+    "You are VolicTV's witty and sarcastic Twitch chatbot assistant. You love gaming, especially Valorant, "
+    "and often make playful jabs at users.\n"
+    "Every response should:\n"
+    "1. Be clever and unexpected\n"
+    "2. Include a touch of playful sarcasm or humor\n"
+    "3. Reference gaming or Twitch culture if relevant\n"
+    "4. Include at least one appropriate emoji\n"
+    "5. Be no longer than 400 characters\n"
+    "6. Directly address or reference information from the user's profile if applicable\n"
+    "Make it memorable, funny, and tailored to the user!"
+)
+
+ROAST_SYSTEM_PROMPT = (
+    "You are a mean AI assistant skilled in generating playful roasts based on user data, valorant stats, "
+    "chat history and quotes.\n"
+    "Every roast should be:\n"
+    "1. Funny and clever\n"
+    "2. Related to the user's chat history or Valorant stats if available\n"
+    "3. No more than 3 sentences\n"
+    "4. Adult Friendly\n"
+    "5. Include 1-2 appropriate emojis\n"
+    "6. Reference their chat messages or behavior\n"
+    "7. If possible, incorporate or reference one of their memorable quotes\n"
+    "Keep it mean but not too personal."
+)
+
+_WHITESPACE = re.compile(r'\s+')
+_CHAR_RUN = re.compile(r'(.)\1{3,}')
+
+
+def collapse_spam(line):
+    # "KEKW KEKW KEKW KEKW" -> "KEKW x4", "LOOOOOOL" -> "LOOOL"
+    words = _CHAR_RUN.sub(r'\1\1\1', _WHITESPACE.sub(' ', line).strip()).split(' ')
+    collapsed = []
+    count = 1
+    for i, word in enumerate(words):
+        if i + 1 < len(words) and words[i + 1] == word:
+            count += 1
+            continue
+        collapsed.append(f"{word} x{count}" if count > 2 else ' '.join([word] * count))
+        count = 1
+    return ' '.join(collapsed)
+
+
+def dedupe_lines(lines):
+    # Keep the most recent copy of each repeated line, in the original order
+    seen = set()
+    kept = []
+    for line in reversed(lines):
+        line = collapse_spam(str(line))
+        key = line.lower()
+        if line and key not in seen:
+            seen.add(key)
+            kept.append(line)
+    kept.reverse()
+    return kept
+
+
+class PromptBuilder:
+    def __init__(self, model=None):
+        self.model = model or DEFAULT_MODEL
+        self.encoding = None
+        self.encoding_loaded = False
+
+    def load_encoding(self):
+        # Blocking: reads, and on a cold cache downloads, the BPE file. Run it in an executor at startup.
+        if not self.encoding_loaded:
+            self.encoding_loaded = True
+            if tiktoken is not None:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(self.model)
+                except Exception as e:
+                    # Unknown model names or no network to fetch the BPE file: keep estimating
+                    api_logger.warning(f"tiktoken unavailable for {self.model}, estimating token counts: {e}")
+        return self.encoding
+
+    def count(self, text):
+        # Until load_encoding has finished, estimate rather than block the event loop on it
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def fit_lines(self, lines, budget, prefix="- ", newest_last=True):
+        """Deduplicate lines and keep as many of the newest as fit in the token budget."""
+        lines = dedupe_lines(lines)
+        ordered = reversed(lines) if newest_last else iter(lines)
+        kept = []
+        used = 0
+        for line in ordered:
+            cost = self.count(f"{prefix}{line}\n")
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        if newest_last:
+            kept.reverse()
+        return [f"{prefix}{line}" for line in kept]
+
+    def user_summary(self, user_id, channel_name, username, messages, quotes, budget=None):
+        budget = budget or getattr(config, 'PROMPT_SUMMARY_TOKENS', 600)
+        quote_budget = min(getattr(config, 'PROMPT_QUOTE_TOKENS', 120), budget // 4)
+
+        header = [
+            f"User ID: {user_id}, Channel: {channel_name}",
+            f"Username: {username}",
+            f"Messages sent: {len(messages)}",
+        ]
+        quote_lines = self.fit_lines(quotes, quote_budget, newest_last=False) if quotes else []
+        quote_section = (
+            [f"Number of quotes: {len(quotes)}", "Recent quotes:"] + quote_lines if quotes else ["No quotes available."]
+        )
+        used = self.count("\n".join(header + quote_section)) + 8
+        message_lines = self.fit_lines(messages, max(0, budget - used))
+        message_section = ["Recent messages:"] + message_lines if message_lines else ["No recent messages available."]
+        return "\n".join(header + message_section + quote_section) + "\n"
+
+    def profile_summary(self, user_id, channel_name, profile, quotes, budget=None):
+        # Rendered from the condensed user_profiles document instead of the raw chat history
+        budget = budget or getattr(config, 'PROMPT_SUMMARY_TOKENS', 600)
+        quote_budget = min(getattr(config, 'PROMPT_QUOTE_TOKENS', 120), budget // 4)
+
+        lines = [
+            f"User ID: {user_id}, Channel: {channel_name}",
+            f"Username: {profile.get('username', 'Unknown')}",
+            f"Messages sent: {profile.get('message_count', 0)}",
+        ]
+        if profile.get('digest'):
+            lines.append(f"Profile: {profile['digest']}")
+        for label, key in (("Top topics", 'topics'), ("Frequent phrases", 'phrases'), ("Favourite emotes", 'emotes')):
+            if profile.get(key):
+                lines.append(f"{label}: {', '.join(profile[key])}")
+        hours = profile.get('active_hours') or []
+        if any(hours):
+            peak = max(range(len(hours)), key=hours.__getitem__)
+            lines.append(f"Most active around {peak:02d}:00 UTC")
+
+        quote_lines = self.fit_lines(quotes, quote_budget, newest_last=False) if quotes else []
+        quote_count = max(profile.get('quote_count', 0), len(quotes))
+        quote_section = (
+            [f"Number of quotes: {quote_count}", "Recent quotes:"] + quote_lines if quote_lines else ["No quotes available."]
+        )
+        used = self.count("\n".join(lines + quote_section)) + 8
+        message_lines = self.fit_lines(profile.get('recent_messages') or [], max(0, budget - used))
+        message_section = ["Recent messages:"] + message_lines if message_lines else ["No recent messages available."]
+        return "\n".join(lines + message_section + quote_section) + "\n"
+
+
+prompt_builder = PromptBuilder()
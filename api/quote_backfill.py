@@ -0,0 +1,151 @@
+import asyncio
+from aiolimiter import AsyncLimiter
+from pymongo.errors import BulkWriteError
+import config
+
+INSERT_BATCH_SIZE = 50
+
+
+class QuoteBackfill:
+    def __init__(self, quote_manager, window=None, rate=None, timeout=10, max_consecutive_misses=5, max_retries=None):
+        self.quote_manager = quote_manager
+        self.state_collection = quote_manager.db['quote_backfill_state']
+        self.window = window or getattr(config, 'QUOTE_BACKFILL_WINDOW', 5)
+        # Share of the per-30s chat budget the backfill may use, leaving room for normal replies
+        self.limiter = AsyncLimiter(rate or getattr(config, 'QUOTE_BACKFILL_RATE', 15), 30)
+        self.timeout = timeout
+        self.max_consecutive_misses = max_consecutive_misses
+        # Runs an ID below the newest stored quote is retried before it's taken as deleted
+        self.max_retries = max_retries or getattr(config, 'QUOTE_BACKFILL_MAX_RETRIES', 3)
+
+        self.pending = {}  # quote_id -> Future resolved by the matching StreamElements reply
+        self.to_insert = []
+        self.running = False
+
+    def on_quote_response(self, quote):
+        future = self.pending.get(quote['id'])
+        if future and not future.done():
+            future.set_result(quote)
+            return True
+        return False
+
+    async def get_retries(self):
+        # IDs below the newest stored quote that timed out, with the number of runs they've missed
+        state = await self.state_collection.find_one({"_id": self.quote_manager.channel_name})
+        return {int(quote_id): misses for quote_id, misses in ((state or {}).get('retries') or {}).items()}
+
+    async def save_retries(self, retries):
+        await self.state_collection.update_one(
+            {"_id": self.quote_manager.channel_name},
+            {"$set": {"retries": {str(quote_id): misses for quote_id, misses in retries.items()}}},
+            upsert=True
+        )
+
+    async def run(self, bot, max_checks=200):
+        if self.running:
+            print("Quote backfill already running.")
+            return 0
+        self.running = True
+        try:
+            return await self._run(bot, max_checks)
+        finally:
+            self.running = False
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+
+    async def _run(self, bot, max_checks):
+        manager = self.quote_manager
+        retries = await self.get_retries()
+        # The window always starts at the newest stored quote, so a gap below it can't pin the backfill
+        last_id = await manager.get_last_quote_number()
+        retries = {quote_id: misses for quote_id, misses in retries.items() if quote_id < last_id}
+        candidates = [str(i) for i in sorted(retries)] + [str(i) for i in range(last_id + 1, last_id + max_checks + 1)]
+        print(f"Checking for new quotes after ID {last_id} ({len(retries)} earlier IDs to retry)...")
+
+        # One existence check for the whole range instead of a find_one per ID
+        cursor = manager.quotes_collection.find(
+            {"_id": {"$in": candidates}, "channel": manager.channel_name}, {"_id": 1}
+        )
+        existing = {doc['_id'] async for doc in cursor}
+        to_fetch = [quote_id for quote_id in candidates if quote_id not in existing]
+
+        window = asyncio.Semaphore(self.window)
+        stop = asyncio.Event()
+        consecutive_misses = 0
+        missed = set()
+        found = set()
+        quotes_added = 0
+
+        async def fetch(quote_id):
+            nonlocal consecutive_misses, quotes_added
+            try:
+                future = asyncio.get_running_loop().create_future()
+                self.pending[quote_id] = future
+                async with self.limiter:
+                    await bot.send_message(manager.channel_name, f"!quote {quote_id}")
+                try:
+                    quote = await asyncio.wait_for(future, timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    missed.add(int(quote_id))
+                    # Only misses past the newest stored quote mean we've run out of quotes
+                    if int(quote_id) > last_id:
+                        consecutive_misses += 1
+                        if consecutive_misses >= self.max_consecutive_misses:
+                            stop.set()
+                    return
+                finally:
+                    self.pending.pop(quote_id, None)
+
+                if int(quote_id) > last_id:
+                    consecutive_misses = 0
+                found.add(int(quote_id))
+                self.to_insert.append(quote)
+                if len(self.to_insert) >= INSERT_BATCH_SIZE:
+                    quotes_added += await self.flush_inserts()
+            finally:
+                window.release()
+
+        tasks = []
+        for quote_id in to_fetch:
+            await window.acquire()
+            if stop.is_set():
+                window.release()
+                break
+            tasks.append(asyncio.ensure_future(fetch(quote_id)))
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        quotes_added += await self.flush_inserts()
+
+        # A miss below a quote that exists is retried on later runs, in case it was only rate limited,
+        # and given up as deleted after max_retries; misses past the newest quote are just not there yet
+        newest = max(found | {last_id})
+        next_retries = {}
+        for quote_id in missed:
+            if quote_id < newest:
+                misses = retries.get(quote_id, 0) + 1
+                if misses < self.max_retries:
+                    next_retries[quote_id] = misses
+        if next_retries != retries:
+            await self.save_retries(next_retries)
+        print(f"Finished checking for new quotes. Added {quotes_added} new quotes.")
+        return quotes_added
+
+    async def flush_inserts(self):
+        if not self.to_insert:
+            return 0
+        batch, self.to_insert = self.to_insert, []
+        manager = self.quote_manager
+        docs = [
+            {"_id": quote['id'], "text": quote['text'], "author": quote['author'], "channel": manager.channel_name}
+            for quote in batch
+        ]
+        failed = set()
+        try:
+            await manager.quotes_collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {docs[error['index']]['_id'] for error in e.details.get('writeErrors', [])}
+
+        inserted = [doc for doc in docs if doc['_id'] not in failed]
+        await manager.on_quotes_inserted(inserted)
+        return len(inserted)
@@ -2,106 +2,110 @@ import asyncio
 from twitchio.ext import commands
 import re
 import twitchio
-from motor.motor_asyncio import AsyncIOMotorClient
-import config
-import logging
 from pymongo.errors import DuplicateKeyError
 from bson.int64 import Int64
 import backoff
+from api.quote_search_index import QuoteSearchIndex
+from api.quote_store import QuoteStore
+from api.quote_backfill import QuoteBackfill
+from pymongo import UpdateOne
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+QUOTE_BOT = 'streamelements'  # The channel bot whose !quote replies are parsed and stored
 
 class QuoteManager:
-    def __init__(self, channel_name: str):
+    def __init__(self, channel_name: str, db):
         self.channel_name = channel_name
-        self.client = AsyncIOMotorClient(config.MONGO_URI)
-        self.db = self.client['twitch_bot_db']
+        self.db = db
         self.quotes_collection = self.db['quotes']
-        self.quote_received = asyncio.Event()
-        self.current_quote = None
-        self.quote_cache = {}
+        self.quote_store = QuoteStore(channel_name)
+        self.search_index = QuoteSearchIndex()
+        self.backfill = QuoteBackfill(self)
+        self.quote_listeners = []
+        self.load_task = None
+
+    def add_quote_listener(self, callback):
+        # callback(author_username) runs whenever a user's quote list changes
+        self.quote_listeners.append(callback)
+
+    def notify_quote_listeners(self, author):
+        author = author.lstrip('@').lower()
+        for callback in self.quote_listeners:
+            callback(author)
+
+    async def load_quotes(self):
+        self.quote_store.clear()
+        self.search_index.clear()
+        cursor = self.quotes_collection.find({"channel": self.channel_name}, {"text": 1, "author": 1})
+        async for quote in cursor:
+            self.quote_store.add(quote['_id'], quote['text'], quote['author'])
+            self.search_index.add(quote['_id'], quote['text'], quote['author'])
+        print(f"Loaded {len(self.quote_store)} quotes for channel {self.channel_name}")
+
+    async def ensure_loaded(self):
+        # Channels are joined on demand; the first command in a channel loads its quotes once
+        task = self.load_task
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = self.load_task = asyncio.ensure_future(self.load_quotes())
+        await asyncio.shield(task)
+
+    async def update_quote_cache(self):
+        # Pick up quotes added or deleted outside the bot (e.g. by the SingleScripts)
+        stored_ids = set()
+        cursor = self.quotes_collection.find({"channel": self.channel_name}, {"text": 1, "author": 1})
+        async for quote in cursor:
+            stored_ids.add(quote['_id'])
+            if quote['_id'] not in self.quote_store:
+                self.quote_store.add(quote['_id'], quote['text'], quote['author'])
+                self.search_index.add(quote['_id'], quote['text'], quote['author'])
+        for quote_id in [quote_id for quote_id in self.quote_store.quotes if quote_id not in stored_ids]:
+            self.quote_store.remove(quote_id)
+            self.search_index.remove(quote_id)
 
     async def add_quote(self, quote_id: str, text: str, author: str):
         new_quote = {"_id": quote_id, "text": text, "author": author, "channel": self.channel_name}
-        # Update local cache first
-        self.quote_cache[quote_id] = new_quote
-        # Then update the database
         try:
             await self.quotes_collection.insert_one(new_quote)
-            return True
         except DuplicateKeyError:
-            # If insert fails, remove from local cache
-            del self.quote_cache[quote_id]
             return False
+        self.quote_store.add(quote_id, text, author)
+        self.search_index.add(quote_id, text, author)
+        self.notify_quote_listeners(author)
+        return True
 
     async def get_random_quote(self):
-        cursor = self.quotes_collection.aggregate([
-            {"$match": {"channel": self.channel_name}},
-            {"$sample": {"size": 1}}
-        ])
-        async for doc in cursor:
-            return doc
-        return None
+        # Shuffle-bag draw from memory: no repeats until every quote has been shown
+        return self.quote_store.random()
 
     async def get_quote_by_id(self, quote_id: str):
+        quote = self.quote_store.get(quote_id)
+        if quote:
+            return quote
         return await self.quotes_collection.find_one({"_id": quote_id, "channel": self.channel_name})
 
-    async def search_quotes(self, search_term: str):
-        cursor = self.quotes_collection.find({
-            "channel": self.channel_name,
-            "$or": [
-                {"text": {"$regex": search_term, "$options": "i"}},
-                {"author": {"$regex": search_term, "$options": "i"}}
-            ]
-        })
-        return await cursor.to_list(length=None)
+    async def search_quotes(self, search_term: str, limit: int = 10):
+        # Served entirely from the in-memory index, best matches first
+        quote_ids = self.search_index.search(search_term, limit=limit)
+        return [self.quote_store.get(quote_id) for quote_id in quote_ids if quote_id in self.quote_store]
 
     async def fetch_new_quotes(self, bot, max_checks=200):
-        print("Checking for new quotes...")
-        last_id = await self.get_last_quote_number()
-        print(f"Last quote in database: ID {last_id}")
-
-        quotes_added = 0
-        for i in range(last_id + 1, last_id + max_checks + 1):
-            quote_id = str(i)
-            existing_quote = await self.quotes_collection.find_one({"_id": quote_id, "channel": self.channel_name})
-            if existing_quote:
-                print(f"Quote {quote_id} already exists in database. Skipping.")
-                continue
-
-            try:
-                print(f"Fetching quote {quote_id}...")
-                await bot.send_message(self.channel_name, f"!quote {quote_id}")
-                
-                # Wait for the quote to be received and processed
-                try:
-                    await asyncio.wait_for(self.quote_received.wait(), timeout=10)
-                except asyncio.TimeoutError:
-                    print(f"Timeout waiting for quote {quote_id}. Moving to next quote.")
-                    continue
-                
-                if self.current_quote:
-                    success = await self.add_quote(self.current_quote['id'], self.current_quote['text'], self.current_quote['author'])
-                    if success:
-                        quotes_added += 1
-                        print(f"Added quote {quote_id} to database.")
-                        await self.update_user_quote(quote_id, self.current_quote['author'])
-                    else:
-                        print(f"Failed to add quote {quote_id} to database.")
-                else:
-                    print(f"No quote received for ID {quote_id}. Stopping fetch process.")
-                    break
-
-                # Reset for next iteration
-                self.quote_received.clear()
-                self.current_quote = None
-
-            except Exception as e:
-                print(f"Error fetching quote {quote_id}: {str(e)}")
-                break
-
-        print(f"Finished checking for new quotes. Added {quotes_added} new quotes.")
+        return await self.backfill.run(bot, max_checks=max_checks)
+
+    async def on_quotes_inserted(self, quotes):
+        if not quotes:
+            return
+        quote_ids_by_author = {}
+        for quote in quotes:
+            self.quote_store.add(quote['_id'], quote['text'], quote['author'])
+            self.search_index.add(quote['_id'], quote['text'], quote['author'])
+            author = quote['author'].lstrip('@').lower()
+            quote_ids_by_author.setdefault(author, []).append(quote['_id'])
+
+        await self.db['users'].bulk_write([
+            UpdateOne({"username": author}, {"$addToSet": {"quotes": {"$each": quote_ids}}}, upsert=True)
+            for author, quote_ids in quote_ids_by_author.items()
+        ], ordered=False)
+        for author in quote_ids_by_author:
+            self.notify_quote_listeners(author)
 
     async def parse_quote_response(self, message):
         # Updated pattern to handle quotes not being enclosed in quotes
@@ -113,14 +117,13 @@ class QuoteManager:
         return None
 
     async def process_message(self, message: twitchio.Message):
-        if message.author and message.author.name.lower() == 'streamelements':
+        if message.author and message.author.name.lower() == QUOTE_BOT:
             quote = await self.parse_quote_response(message.content)
             if quote:
-                self.current_quote = quote
-                self.quote_received.set()
+                # Replies carry the quote's #id, so they are matched to the request that asked for it
+                self.backfill.on_quote_response(quote)
             else:
                 print(f"Failed to parse quote from message: {message.content}")
-                self.quote_received.set()  # Set the event even if parsing fails
 
     async def update_user_quote(self, quote_id: str, author: str, session=None):
         user_collection = self.db['users']
@@ -130,12 +133,7 @@ class QuoteManager:
             upsert=True,
             session=session
         )
-        # Also update the user's document in the users collection
-        await self.bot.user_data_manager.users_collection.update_one(
-            {"username": author.lstrip('@').lower()},
-            {"$addToSet": {"quotes": quote_id}},
-            upsert=True
-        )
+        self.notify_quote_listeners(author)
 
     async def count_quotes_by_author(self, author: str):
         count = await self.quotes_collection.count_documents({
@@ -0,0 +1,136 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+AUTHOR_WEIGHT = 2  # An author match counts like the word appearing twice in the text
+MIN_TRIGRAM_SIMILARITY = 0.35
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower().replace("'", ""))
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class QuoteSearchIndex:
+    def __init__(self):
+        self.postings = defaultdict(dict)  # token -> {quote_id: weighted term frequency}
+        self.doc_tokens = {}  # quote_id -> {token: weighted term frequency}
+        self.doc_text = {}  # quote_id -> " text author " as space-joined tokens for phrase matching
+        self.trigram_tokens = defaultdict(set)  # trigram -> tokens containing it
+        self.vocabulary = []  # sorted, for prefix lookups on short query terms
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    def add(self, quote_id, text, author):
+        if quote_id in self.doc_tokens:
+            self.remove(quote_id)
+
+        counts = defaultdict(int)
+        for token in tokenize(text):
+            counts[token] += 1
+        for token in tokenize(author):
+            counts[token] += AUTHOR_WEIGHT
+
+        for token, count in counts.items():
+            if token not in self.postings:
+                self._add_to_vocabulary(token)
+            self.postings[token][quote_id] = count
+        self.doc_tokens[quote_id] = dict(counts)
+        self.doc_text[quote_id] = f" {' '.join(tokenize(text) + tokenize(author))} "
+
+    def remove(self, quote_id):
+        for token in self.doc_tokens.pop(quote_id, {}):
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(quote_id, None)
+            if not docs:
+                del self.postings[token]
+                self._remove_from_vocabulary(token)
+        self.doc_text.pop(quote_id, None)
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_tokens.clear()
+        self.doc_text.clear()
+        self.trigram_tokens.clear()
+        self.vocabulary.clear()
+
+    def _add_to_vocabulary(self, token):
+        insort(self.vocabulary, token)
+        for gram in trigrams(token):
+            self.trigram_tokens[gram].add(token)
+
+    def _remove_from_vocabulary(self, token):
+        index = bisect_left(self.vocabulary, token)
+        if index < len(self.vocabulary) and self.vocabulary[index] == token:
+            del self.vocabulary[index]
+        for gram in trigrams(token):
+            tokens = self.trigram_tokens.get(gram)
+            if tokens:
+                tokens.discard(token)
+                if not tokens:
+                    del self.trigram_tokens[gram]
+
+    def _expand(self, term):
+        # Exact match, then prefix matches, then trigram neighbours for typos and fragments
+        expansions = {}
+        if term in self.postings:
+            expansions[term] = 1.0
+
+        index = bisect_left(self.vocabulary, term)
+        while index < len(self.vocabulary) and self.vocabulary[index].startswith(term):
+            token = self.vocabulary[index]
+            expansions.setdefault(token, 0.8)
+            index += 1
+
+        if len(term) >= 3:
+            query_grams = trigrams(term)
+            overlap = defaultdict(int)
+            for gram in query_grams:
+                for token in self.trigram_tokens.get(gram, ()):
+                    overlap[token] += 1
+            for token, shared in overlap.items():
+                similarity = shared / (len(query_grams) + len(trigrams(token)) - shared)
+                if similarity >= MIN_TRIGRAM_SIMILARITY:
+                    weight = 0.7 if term in token else similarity * 0.7
+                    if weight > expansions.get(token, 0):
+                        expansions[token] = weight
+        return expansions
+
+    def search(self, query, limit=10):
+        terms = tokenize(query)
+        if not terms or not self.doc_tokens:
+            return []
+
+        total_docs = len(self.doc_tokens)
+        scores = defaultdict(float)
+        for term in terms:
+            term_scores = {}
+            for token, weight in self._expand(term).items():
+                docs = self.postings[token]
+                idf = math.log(1 + total_docs / len(docs))
+                for quote_id, frequency in docs.items():
+                    score = weight * idf * (1 + math.log(frequency))
+                    if score > term_scores.get(quote_id, 0):
+                        term_scores[quote_id] = score
+            for quote_id, score in term_scores.items():
+                scores[quote_id] += score
+
+        # Boost quotes that contain the whole query as a phrase of whole words
+        phrase = f" {' '.join(terms)} "
+        if len(terms) > 1:
+            for quote_id in scores:
+                if phrase in self.doc_text[quote_id]:
+                    scores[quote_id] *= 2
+
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [quote_id for quote_id, _ in ranked]
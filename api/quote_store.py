@@ -0,0 +1,97 @@
+import random
+
+
+class ShuffleBag:
+    # Incremental Fisher-Yates: items[:remaining] are undrawn this cycle, everything after was drawn
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+        self.remaining = 0
+        self.last_drawn = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def _swap(self, i, j):
+        if i == j:
+            return
+        items = self.items
+        items[i], items[j] = items[j], items[i]
+        self.positions[items[i]] = i
+        self.positions[items[j]] = j
+
+    def add(self, item):
+        if item in self.positions:
+            return
+        self.items.append(item)
+        self.positions[item] = len(self.items) - 1
+        # New items join the current cycle so they can come up before the next reshuffle
+        self._swap(self.remaining, len(self.items) - 1)
+        self.remaining += 1
+
+    def remove(self, item):
+        index = self.positions.get(item)
+        if index is None:
+            return
+        if index < self.remaining:
+            self._swap(index, self.remaining - 1)
+            index = self.remaining - 1
+            self.remaining -= 1
+        self._swap(index, len(self.items) - 1)
+        self.items.pop()
+        del self.positions[item]
+
+    def draw(self):
+        if not self.items:
+            return None
+        if self.remaining == 0:
+            self.remaining = len(self.items)
+        low = 0
+        if self.remaining == len(self.items) and len(self.items) > 1 and self.items[0] == self.last_drawn:
+            # Fresh cycle: don't let the last quote of the previous cycle open the next one
+            low = 1
+        index = random.randrange(low, self.remaining)
+        self._swap(index, self.remaining - 1)
+        self.remaining -= 1
+        self.last_drawn = self.items[self.remaining]
+        return self.last_drawn
+
+
+class QuoteStore:
+    def __init__(self, channel_name):
+        self.channel_name = channel_name
+        self.quotes = {}  # quote_id -> (text, author)
+        self.bag = ShuffleBag()
+
+    def __len__(self):
+        return len(self.quotes)
+
+    def __contains__(self, quote_id):
+        return quote_id in self.quotes
+
+    def _to_doc(self, quote_id, entry):
+        text, author = entry
+        return {"_id": quote_id, "text": text, "author": author, "channel": self.channel_name}
+
+    def add(self, quote_id, text, author):
+        self.quotes[quote_id] = (text, author)
+        self.bag.add(quote_id)
+
+    def remove(self, quote_id):
+        self.quotes.pop(quote_id, None)
+        self.bag.remove(quote_id)
+
+    def clear(self):
+        self.quotes = {}
+        self.bag = ShuffleBag()
+
+    def get(self, quote_id):
+        entry = self.quotes.get(quote_id)
+        return self._to_doc(quote_id, entry) if entry else None
+
+    def random(self):
+        quote_id = self.bag.draw()
+        return self.get(quote_id) if quote_id is not None else None
+
+    def all(self):
+        return [self._to_doc(quote_id, entry) for quote_id, entry in self.quotes.items()]
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import config
+from api.prompt_builder import PERSONALIZED_SYSTEM_PROMPT
+from utils.logger import api_logger
+
+
+class ResponseTemplate:
+    def __init__(self, name, prompt, system=PERSONALIZED_SYSTEM_PROMPT, max_tokens=100):
+        self.name = name
+        self.prompt = prompt
+        self.system = system
+        self.max_tokens = max_tokens
+        # Stored entries are tied to the prompt text, so editing a prompt retires its old pool
+        self.key = f"{name}:{hashlib.md5((system + prompt).encode('utf-8')).hexdigest()[:8]}"
+
+
+# Flavor text that doesn't depend on who asked, so it can be written ahead of time
+TEMPLATES = {
+    template.name: template for template in (
+        ResponseTemplate(
+            'quote',
+            "Write a single witty one-liner reacting to someone pulling a random quote out of VolicTV's "
+            "stream quote book. Don't repeat or invent the quote itself.",
+        ),
+        ResponseTemplate(
+            'quote_empty',
+            "Write a single witty one-liner about VolicTV's stream quote book being completely empty.",
+        ),
+        ResponseTemplate(
+            'quotesearch',
+            "Write a single witty one-liner reacting to a chatter digging up an old quote from VolicTV's "
+            "stream quote book with a search. Don't repeat or invent the quote itself.",
+        ),
+        ResponseTemplate(
+            'quotecount_above',
+            "Write a single witty one-liner teasing a chatter who has more quotes in the stream quote book "
+            "than the average chatter.",
+        ),
+        ResponseTemplate(
+            'quotecount_below',
+            "Write a single witty one-liner teasing a chatter who has fewer quotes in the stream quote book "
+            "than the average chatter and should step it up.",
+        ),
+        ResponseTemplate(
+            'quotecount_average',
+            "Write a single witty one-liner about a chatter having an exactly average number of quotes "
+            "in the stream quote book.",
+        ),
+        ResponseTemplate(
+            'volictv_roast',
+            "Generate a savage, witty roast for VolicTV, a Valorant Twitch streamer. The roast should:\n"
+            "1. Be clever and unexpected\n"
+            "2. Reference Valorant or gaming culture\n"
+            "3. Include playful jabs at his streaming skills or gameplay\n"
+            "4. Be slightly edgy but not offensive\n"
+            "5. Include 1-2 appropriate emojis\n"
+            "6. Be no longer than 300 characters\n"
+            "Make it memorable, funny, and tailored to a Valorant streamer!",
+            max_tokens=150,
+        ),
+    )
+}
+
+
+class ResponsePool:
+    def __init__(self, db, llm, templates=None, size=None, ttl=None, refill_interval=None):
+        self.collection = db['response_pool']
+        self.llm = llm
+        self.templates = templates or TEMPLATES
+        self.size = size or getattr(config, 'RESPONSE_POOL_SIZE', 10)
+        self.ttl = timedelta(seconds=ttl or getattr(config, 'RESPONSE_POOL_TTL', 3 * 86400))
+        self.refill_interval = refill_interval or getattr(config, 'RESPONSE_POOL_REFILL_INTERVAL', 2)
+
+        # Entries in memory have been claimed from the collection by this process, so workers that
+        # share the database never serve the same line; unused ones are handed back on close
+        self.pools = {name: deque() for name in self.templates}  # name -> (text, expires_at)
+        self.refill_needed = asyncio.Event()
+        self._task = None
+        self.loaded = False
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.claimed = 0
+
+    async def load(self):
+        # event_ready fires again on reconnect; the pools are already in memory by then
+        if self.loaded:
+            return
+        self.loaded = True
+        for name, template in self.templates.items():
+            while len(self.pools[name]) < self.size and await self._claim(template):
+                pass
+        api_logger.info(f"Claimed {sum(len(pool) for pool in self.pools.values())} pooled responses")
+        self.start()
+
+    @staticmethod
+    def _aware(moment):
+        # Mongo hands back naive UTC datetimes
+        return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        self.refill_needed.set()
+
+    def take(self, name):
+        """Pop a pre-generated response, or None so the caller can fall back to a live call."""
+        pool = self.pools.get(name)
+        now = datetime.now(timezone.utc)
+        while pool:
+            text, expires_at = pool.popleft()
+            if expires_at > now:
+                self.hits += 1
+                self.refill_needed.set()
+                return text
+        self.misses += 1
+        self.refill_needed.set()
+        return None
+
+    async def _claim(self, template):
+        # Atomic, so two workers can never both take the same stored entry
+        entry = await self.collection.find_one_and_delete(
+            {'template': template.key, 'expires_at': {'$gt': datetime.now(timezone.utc)}},
+            sort=[('created_at', 1)]
+        )
+        if entry is None:
+            return False
+        self.pools[template.name].append((entry['text'], self._aware(entry['expires_at'])))
+        self.claimed += 1
+        return True
+
+    def _llm_busy(self):
+        # Refills only use the LLM while no live command is running or waiting for it
+        return self.llm.in_flight > 0 or self.llm.waiting > 0
+
+    def _emptiest(self):
+        name = min(self.pools, key=lambda name: len(self.pools[name]))
+        return name if len(self.pools[name]) < self.size else None
+
+    async def _run(self):
+        while True:
+            name = self._emptiest()
+            if name is None:
+                self.refill_needed.clear()
+                await self.refill_needed.wait()
+                continue
+            await asyncio.sleep(self.refill_interval)
+            try:
+                if await self._claim(self.templates[name]) or self._llm_busy():
+                    continue
+                await self._generate(self.templates[name])
+            except Exception as e:
+                api_logger.warning(f"Failed to refill response pool '{name}': {e}")
+                await asyncio.sleep(self.refill_interval * 10)
+
+    async def _generate(self, template):
+        text = await self.llm.complete(
+            messages=[
+                {"role": "system", "content": template.system},
+                {"role": "user", "content": template.prompt}
+            ],
+            max_tokens=template.max_tokens,
+            temperature=1.0,
+        )
+        pool = self.pools[template.name]
+        if not text or any(text == pooled for pooled, _ in pool):
+            return
+        pool.append((text, datetime.now(timezone.utc) + self.ttl))
+        self.generated += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "pooled": {name: len(pool) for name, pool in self.pools.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "generated": self.generated,
+            "claimed": self.claimed,
+        }
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # Hand unused entries back so the next process (or another worker) can claim them
+        now = datetime.now(timezone.utc)
+        entries = [
+            {
+                'template': self.templates[name].key,
+                'text': text,
+                'created_at': expires_at - self.ttl,
+                'expires_at': expires_at,
+            }
+            for name, pool in self.pools.items() for text, expires_at in pool if expires_at > now
+        ]
+        for pool in self.pools.values():
+            pool.clear()
+        if entries:
+            try:
+                await self.collection.insert_many(entries, ordered=False)
+            except Exception as e:
+                api_logger.warning(f"Failed to return {len(entries)} pooled responses: {e}")
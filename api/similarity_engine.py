@@ -0,0 +1,310 @@
+import asyncio
+import math
+import time
+import zlib
+import numpy as np
+from scipy import sparse
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+import config
+from User.profile_builder import STOPWORDS, WORD
+from utils.logger import api_logger
+
+DIMENSIONS = 1 << 18  # Hashed feature space; collisions are rare at chat vocabulary sizes
+MAX_FEATURES = 500  # Per-user cap, lowest counts are pruned first
+BATCH_ROWS = 512
+
+
+def features(text):
+    # Hashed unigrams and bigrams; crc32 is stable across processes, unlike hash()
+    words = [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+    terms = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return [zlib.crc32(term.encode('utf-8')) % DIMENSIONS for term in terms]
+
+
+def to_percent(cosine):
+    # Chat vectors rarely exceed 0.5 cosine, so spread the low end: 0.04 -> 20%, 0.25 -> 50%, 1 -> 100%
+    return int(round(100 * math.sqrt(max(0.0, min(1.0, cosine)))))
+
+
+class SimilarityEngine:
+    def __init__(self, db, refresh_interval=None, leaderboard_size=5):
+        self.collection = db['user_vectors']
+        self.refresh_interval = refresh_interval or getattr(config, 'SIMILARITY_REFRESH_SECONDS', 600)
+        self.leaderboard_size = leaderboard_size
+
+        self.counts = {}  # user_id -> {feature: count}
+        self.usernames = {}  # user_id -> login
+        self.members = {}  # channel -> set of user_ids seen chatting there
+        self.document_frequency = {}  # feature -> number of users using it
+        self.seeded = set()  # user_ids whose stored chat history is already in their vector
+        self.live_keys = {}  # user_id -> (content, timestamp) counted before the user was seeded
+
+        # Unpersisted changes, written as $inc/$unset/$addToSet so supervisor workers that see
+        # the same chatter in different channels add to one vector instead of overwriting it
+        self.increments = {}  # user_id -> {feature: count}
+        self.pruned = {}  # user_id -> features dropped by the per-user cap
+        self.new_channels = {}  # user_id -> channels
+
+        self.leaderboards = {}  # channel -> [(percent, user_a, user_b)]
+        self.computed_at = {}  # channel -> monotonic time of the last all-pairs run
+        self.computing = {}  # channel -> Task
+        self._task = None
+        self.loaded = False
+
+    async def load(self):
+        # event_ready fires again on reconnect; reloading would double count document frequencies
+        if self.loaded:
+            return
+        self.loaded = True
+        async for doc in self.collection.find({}):
+            self._apply_doc(doc)
+        api_logger.info(f"Loaded similarity vectors for {len(self.counts)} users")
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def _apply_doc(self, doc):
+        user_id = doc['_id']
+        if doc.get('username'):
+            self.usernames[user_id] = doc['username']
+        for feature in self.counts.get(user_id, {}):
+            self.document_frequency[feature] -= 1
+        counts = {int(feature): count for feature, count in (doc.get('features') or {}).items()}
+        # Increments this process hasn't written yet aren't in the document
+        for feature, count in self.increments.get(user_id, {}).items():
+            counts[feature] = counts.get(feature, 0) + count
+        for feature in self.pruned.get(user_id, ()):
+            counts.pop(feature, None)
+        self.counts[user_id] = counts
+        for feature in counts:
+            self.document_frequency[feature] = self.document_frequency.get(feature, 0) + 1
+        for channel in doc.get('channels', []):
+            self.members.setdefault(channel, set()).add(user_id)
+        if doc.get('seeded'):
+            self.seeded.add(user_id)
+
+    def add_messages(self, user_id, username, messages):
+        user_counts = self.counts.setdefault(user_id, {})
+        increments = self.increments.setdefault(user_id, {})
+        pruned = self.pruned.get(user_id, set())
+        live_keys = self.live_keys.get(user_id)
+        if live_keys is None and user_id not in self.seeded:
+            live_keys = self.live_keys[user_id] = set()
+        self.usernames[user_id] = username.lower()
+        for message in messages:
+            if live_keys is not None:
+                live_keys.add((message.get('content'), message.get('timestamp')))
+            for feature in features(message.get('content') or ''):
+                if feature not in user_counts:
+                    self.document_frequency[feature] = self.document_frequency.get(feature, 0) + 1
+                    user_counts[feature] = 0
+                    pruned.discard(feature)
+                user_counts[feature] += 1
+                increments[feature] = increments.get(feature, 0) + 1
+            if message.get('channel'):
+                self.add_member(message['channel'], user_id)
+        if len(user_counts) > MAX_FEATURES:
+            pruned = self.pruned.setdefault(user_id, pruned)
+            for feature in sorted(user_counts, key=user_counts.get)[:len(user_counts) - MAX_FEATURES]:
+                del user_counts[feature]
+                increments.pop(feature, None)
+                pruned.add(feature)
+                self.document_frequency[feature] -= 1
+
+    def add_member(self, channel, user_id):
+        members = self.members.setdefault(channel, set())
+        if user_id not in members:
+            members.add(user_id)
+            self.new_channels.setdefault(user_id, set()).add(channel)
+
+    def on_messages(self, per_user):
+        # Fed from ChatWriteBuffer flushes
+        for user_id, entry in per_user.items():
+            self.add_messages(user_id, entry['username'], entry['messages'])
+
+    def needs_seed(self, user_id):
+        return user_id not in self.seeded
+
+    async def claim_seed(self, user_id):
+        """True if this process should fold the user's stored history in, False if another already has."""
+        self.seeded.add(user_id)
+        # Keep recording what's counted live until seed() has read the stored history
+        self.live_keys.setdefault(user_id, set())
+        try:
+            await self.collection.update_one(
+                {'_id': user_id, 'seeded': {'$ne': True}}, {'$set': {'seeded': True}}, upsert=True
+            )
+        except DuplicateKeyError:
+            # The document exists and is already seeded: another worker got there first
+            return False
+        except Exception:
+            self.seeded.discard(user_id)
+            raise
+        return True
+
+    def seed(self, user_id, username, messages, channel=None):
+        # Stored history already contains the flushed messages counted live, so skip those
+        live_keys = self.live_keys.pop(user_id, set())
+        self.add_messages(user_id, username or self.usernames.get(user_id, ''), [
+            message for message in messages
+            if (message.get('content'), message.get('timestamp')) not in live_keys
+        ])
+        if channel:
+            self.add_member(channel, user_id)
+
+    async def refresh(self, user_id):
+        # Pick up a vector another worker seeded, keeping this process's unwritten increments
+        self.live_keys.pop(user_id, None)
+        doc = await self.collection.find_one({'_id': user_id})
+        if doc:
+            self._apply_doc(doc)
+
+    def has_vector(self, user_id):
+        return bool(self.counts.get(user_id))
+
+    def _weights(self, user_counts):
+        # Sublinear tf * smoothed idf
+        total = len(self.counts) + 1
+        return {
+            feature: (1 + math.log(count)) * (math.log(total / (1 + self.document_frequency.get(feature, 0))) + 1)
+            for feature, count in user_counts.items() if count > 0
+        }
+
+    def score(self, user_a, user_b):
+        """Deterministic compatibility percentage from the cosine of two users' TF-IDF vectors."""
+        a = self._weights(self.counts.get(user_a, {}))
+        b = self._weights(self.counts.get(user_b, {}))
+        if not a or not b:
+            return None
+        if len(a) > len(b):
+            a, b = b, a
+        dot = sum(weight * b[feature] for feature, weight in a.items() if feature in b)
+        norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+        return to_percent(dot / norm) if norm else 0
+
+    def _snapshot(self, user_ids):
+        # Copy into plain arrays on the event loop so the matrix work can run in a thread
+        rows, cols, values = [], [], []
+        for row, user_id in enumerate(user_ids):
+            for feature, weight in self._weights(self.counts[user_id]).items():
+                rows.append(row)
+                cols.append(feature)
+                values.append(weight)
+        return np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32), np.asarray(values, dtype=np.float32)
+
+    @staticmethod
+    def _top_pairs(rows, cols, values, count, limit):
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(count, DIMENSIONS))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        matrix = sparse.diags(1 / np.maximum(norms, 1e-9)) @ matrix
+        transposed = matrix.T.tocsc()
+
+        best = []  # (cosine, i, j) with i < j
+        for start in range(0, count, BATCH_ROWS):
+            block = (matrix[start:start + BATCH_ROWS] @ transposed).toarray()
+            row_index = np.arange(start, start + block.shape[0])[:, None]
+            block[np.arange(count)[None, :] <= row_index] = 0  # upper triangle only, no self-pairs
+            flat = block.ravel()
+            take = min(limit, np.count_nonzero(flat))
+            if not take:
+                continue
+            candidates = np.argpartition(flat, -take)[-take:]
+            for index in candidates:
+                i, j = divmod(int(index), count)
+                best.append((float(flat[index]), start + i, j))
+            best = sorted(best, reverse=True)[:limit]
+        return best
+
+    async def compute_leaderboard(self, channel):
+        user_ids = sorted(user_id for user_id in self.members.get(channel, ()) if self.has_vector(user_id))
+        if len(user_ids) < 2:
+            self.leaderboards[channel] = []
+            return []
+        rows, cols, values = self._snapshot(user_ids)
+        started = time.perf_counter()
+        pairs = await asyncio.get_running_loop().run_in_executor(
+            None, self._top_pairs, rows, cols, values, len(user_ids), self.leaderboard_size
+        )
+        self.leaderboards[channel] = [
+            (to_percent(cosine), self.usernames.get(user_ids[i]), self.usernames.get(user_ids[j]))
+            for cosine, i, j in pairs
+        ]
+        self.computed_at[channel] = time.monotonic()
+        api_logger.info(
+            f"Computed #{channel} ship leaderboard over {len(user_ids)} chatters in {time.perf_counter() - started:.2f}s"
+        )
+        return self.leaderboards[channel]
+
+    def leaderboard(self, channel):
+        """Latest top pairs for a channel; schedules a recompute when missing or stale."""
+        computed_at = self.computed_at.get(channel)
+        if computed_at is None or time.monotonic() - computed_at > self.refresh_interval:
+            self._schedule(channel)
+        return self.leaderboards.get(channel)
+
+    def _schedule(self, channel):
+        task = self.computing.get(channel)
+        if task is None or task.done():
+            self.computing[channel] = asyncio.ensure_future(self.compute_leaderboard(channel))
+
+    def forget_channel(self, channel):
+        # Vectors and memberships stay; only the periodic leaderboard refresh stops
+        self.leaderboards.pop(channel, None)
+        self.computed_at.pop(channel, None)
+
+    async def persist(self):
+        user_ids = set(self.increments) | set(self.pruned) | set(self.new_channels)
+        if not user_ids:
+            return
+        increments, self.increments = self.increments, {}
+        pruned, self.pruned = self.pruned, {}
+        new_channels, self.new_channels = self.new_channels, {}
+
+        operations = []
+        for user_id in user_ids:
+            update = {'$set': {'username': self.usernames.get(user_id, '')}}
+            if increments.get(user_id):
+                update['$inc'] = {f"features.{feature}": count for feature, count in increments[user_id].items()}
+            if pruned.get(user_id):
+                update['$unset'] = {f"features.{feature}": "" for feature in pruned[user_id]}
+            if new_channels.get(user_id):
+                update['$addToSet'] = {'channels': {'$each': sorted(new_channels[user_id])}}
+            operations.append(UpdateOne({'_id': user_id}, update, upsert=True))
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Put everything back for the next attempt, merged with anything counted meanwhile
+            for user_id, counts in increments.items():
+                merged = self.increments.setdefault(user_id, {})
+                for feature, count in counts.items():
+                    if feature not in self.pruned.get(user_id, ()):
+                        merged[feature] = merged.get(feature, 0) + count
+            for user_id, dropped in pruned.items():
+                user_counts = self.counts.get(user_id, {})
+                self.pruned.setdefault(user_id, set()).update(
+                    feature for feature in dropped if feature not in user_counts
+                )
+            for user_id, channels in new_channels.items():
+                self.new_channels.setdefault(user_id, set()).update(channels)
+            api_logger.error(f"Failed to persist {len(operations)} similarity vectors: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(60)
+            await self.persist()
+            for channel in list(self.leaderboards):
+                self.leaderboard(channel)
+
+    def stats(self):
+        return {
+            "users": len(self.counts),
+            "features": len(self.document_frequency),
+            "unpersisted": len(set(self.increments) | set(self.pruned) | set(self.new_channels)),
+            "channels": {channel: len(members) for channel, members in self.members.items()},
+        }
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.persist()
@@ -0,0 +1,166 @@
+import numpy as np
+
+STAT_FIELDS = ('kills', 'deaths', 'assists', 'score', 'headshots', 'bodyshots', 'legshots')
+
+
+def _codes(values):
+    # Dictionary-encode a list of labels: (sorted unique labels, int code per value)
+    if not values:
+        return [], np.zeros(0, dtype=np.int32)
+    labels, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return labels.tolist(), codes.astype(np.int32)
+
+
+def _player_won(match, team):
+    teams = match.get('teams') or {}
+    team_data = teams.get((team or '').lower()) if isinstance(teams, dict) else None
+    return bool(team_data.get('has_won')) if isinstance(team_data, dict) else False
+
+
+# Columnar view of one player's matches: one array entry per match, plus their kill events
+class MatchTable:
+    def __init__(self):
+        self.stats = {field: np.zeros(0, dtype=np.int32) for field in STAT_FIELDS}
+        self.won = np.zeros(0, dtype=bool)
+        self.agents, self.agent_codes = [], np.zeros(0, dtype=np.int32)
+        self.maps, self.map_codes = [], np.zeros(0, dtype=np.int32)
+        self.modes, self.mode_codes = [], np.zeros(0, dtype=np.int32)
+        self.weapons, self.weapon_codes = [], np.zeros(0, dtype=np.int32)
+        self.kill_match_index = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.won)
+
+    @classmethod
+    def from_matches(cls, matches, name, tag):
+        name, tag = name.lower(), tag.lower()
+        columns = {field: [] for field in STAT_FIELDS}
+        won, agents, maps, modes = [], [], [], []
+        weapons, kill_match_index = [], []
+
+        for match in matches:
+            players = match.get('players', {}).get('all_players', [])
+            player = next(
+                (p for p in players if p.get('name', '').lower() == name and p.get('tag', '').lower() == tag),
+                None
+            )
+            if not player:
+                continue
+
+            index = len(won)
+            player_stats = player.get('stats', {})
+            for field in STAT_FIELDS:
+                columns[field].append(player_stats.get(field) or 0)
+            won.append(_player_won(match, player.get('team')))
+            agents.append(player.get('character', 'Unknown'))
+            metadata = match.get('metadata', {})
+            maps.append(metadata.get('map', 'Unknown'))
+            modes.append(metadata.get('mode', 'Unknown'))
+
+            puuid = player.get('puuid')
+            for kill in match.get('kills', []):
+                if kill.get('killer_puuid') == puuid:
+                    weapons.append(kill.get('damage_weapon_name') or kill.get('killer_weapon_name') or 'Unknown')
+                    kill_match_index.append(index)
+
+        table = cls()
+        table.stats = {field: np.asarray(values, dtype=np.int32) for field, values in columns.items()}
+        table.won = np.asarray(won, dtype=bool)
+        table.agents, table.agent_codes = _codes(agents)
+        table.maps, table.map_codes = _codes(maps)
+        table.modes, table.mode_codes = _codes(modes)
+        table.weapons, table.weapon_codes = _codes(weapons)
+        table.kill_match_index = np.asarray(kill_match_index, dtype=np.int32)
+        return table
+
+
+def _breakdown(labels, codes, table):
+    # Per-category aggregates in one bincount pass per column
+    size = len(labels)
+    if not size:
+        return {}
+    games = np.bincount(codes, minlength=size)
+    wins = np.bincount(codes, weights=table.won, minlength=size)
+    kills = np.bincount(codes, weights=table.stats['kills'], minlength=size)
+    deaths = np.bincount(codes, weights=table.stats['deaths'], minlength=size)
+    assists = np.bincount(codes, weights=table.stats['assists'], minlength=size)
+    score = np.bincount(codes, weights=table.stats['score'], minlength=size)
+    kda = (kills + assists) / np.maximum(deaths, 1)
+
+    return {
+        label: {
+            "matches": int(games[i]),
+            "win_rate": round(float(wins[i] / games[i] * 100), 2),
+            "kda": round(float(kda[i]), 2),
+            "avg_score": round(float(score[i] / games[i]), 0),
+        }
+        for i, label in enumerate(labels)
+    }
+
+
+def _most_common(labels, codes):
+    if not len(codes):
+        return "Unknown"
+    return labels[int(np.argmax(np.bincount(codes, minlength=len(labels))))]
+
+
+def analyze_table(table, detail_limit=10):
+    count = len(table)
+    analysis = {
+        "total_matches": count,
+        "avg_kda": [0, 0, 0],
+        "avg_score": 0,
+        "win_rate": 0,
+        "headshot_percentage": 0,
+        "most_played_mode": "Unknown",
+        "most_played_agent": "Unknown",
+        "most_played_map": "Unknown",
+        "most_used_weapon": "Unknown",
+        "best_agent": "Unknown",
+        "agents_breakdown": {},
+        "maps_breakdown": {},
+        "weapon_frequency": {},
+        "match_details": [],
+    }
+    if not count:
+        return analysis
+
+    stats = table.stats
+    analysis["avg_kda"] = [round(float(stats[field].mean()), 2) for field in ('kills', 'deaths', 'assists')]
+    analysis["avg_score"] = round(float(stats['score'].mean()), 0)
+    analysis["win_rate"] = round(float(table.won.mean() * 100), 2)
+    shots = int(stats['headshots'].sum() + stats['bodyshots'].sum() + stats['legshots'].sum())
+    analysis["headshot_percentage"] = round(float(stats['headshots'].sum()) / shots * 100, 2) if shots else 0
+
+    analysis["most_played_mode"] = _most_common(table.modes, table.mode_codes)
+    analysis["most_played_agent"] = _most_common(table.agents, table.agent_codes)
+    analysis["most_played_map"] = _most_common(table.maps, table.map_codes)
+
+    if len(table.weapon_codes):
+        weapon_counts = np.bincount(table.weapon_codes, minlength=len(table.weapons))
+        order = np.argsort(weapon_counts)[::-1]
+        analysis["weapon_frequency"] = {table.weapons[i]: int(weapon_counts[i]) for i in order}
+        analysis["most_used_weapon"] = table.weapons[int(order[0])]
+
+    agents = _breakdown(table.agents, table.agent_codes, table)
+    maps = _breakdown(table.maps, table.map_codes, table)
+    analysis["agents_breakdown"] = agents
+    analysis["maps_breakdown"] = maps
+    # Best agent by KDA, ignoring one-off picks when there is enough history
+    candidates = {agent: data for agent, data in agents.items() if data["matches"] >= 2} or agents
+    analysis["best_agent"] = max(candidates, key=lambda agent: candidates[agent]["kda"])
+
+    for i in range(min(count, detail_limit) if detail_limit else count):
+        analysis["match_details"].append({
+            "mode": table.modes[table.mode_codes[i]],
+            "map": table.maps[table.map_codes[i]],
+            "agent": table.agents[table.agent_codes[i]],
+            "kda": f"{stats['kills'][i]}/{stats['deaths'][i]}/{stats['assists'][i]}",
+            "score": int(stats['score'][i]),
+            "result": "Win" if table.won[i] else "Loss",
+        })
+    return analysis
+
+
+def analyze_matches(account, matches, detail_limit=10):
+    return analyze_table(MatchTable.from_matches(matches, account['name'], account['tag']), detail_limit)
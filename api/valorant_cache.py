@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import config
+from utils.async_cache import ComputeAbandoned
+from utils.logger import api_logger
+
+# endpoint -> (seconds an entry is fresh, seconds a stale entry may still be served while refreshing)
+ENDPOINT_TTLS = {
+    'account': (getattr(config, 'VALORANT_ACCOUNT_TTL', 3600), 7 * 86400),
+    'matches': (getattr(config, 'VALORANT_MATCHES_TTL', 120), 86400),
+}
+
+
+class ValorantCache:
+    def __init__(self, db, maxsize=2000):
+        self.collection = db['valorant_cache']
+        self.maxsize = maxsize
+        self.memory = OrderedDict()  # cache key -> (fetched_at epoch seconds, data)
+        self.inflight = {}  # cache key -> Future for a fetch in progress
+        self.background_tasks = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _remember(self, cache_key, fetched_at, data):
+        self.memory[cache_key] = (fetched_at, data)
+        self.memory.move_to_end(cache_key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    async def _load_from_mongo(self, cache_key):
+        try:
+            doc = await self.collection.find_one({'_id': cache_key})
+        except Exception as e:
+            api_logger.error(f"Valorant cache read failed for {cache_key}: {e}")
+            return None
+        if not doc:
+            return None
+        # Mongo hands back naive UTC datetimes
+        fetched_at = doc['fetched_at'].replace(tzinfo=timezone.utc).timestamp()
+        self._remember(cache_key, fetched_at, doc['data'])
+        return fetched_at, doc['data']
+
+    async def _store(self, endpoint, cache_key, data):
+        fetched_at = time.time()
+        self._remember(cache_key, fetched_at, data)
+        now = datetime.utcfromtimestamp(fetched_at)
+        try:
+            await self.collection.replace_one(
+                {'_id': cache_key},
+                {
+                    'endpoint': endpoint,
+                    'data': data,
+                    'fetched_at': now,
+                    # TTL index removes the document once it is too old to serve even stale
+                    'expires_at': now + timedelta(seconds=ENDPOINT_TTLS[endpoint][1]),
+                },
+                upsert=True
+            )
+        except Exception as e:
+            api_logger.error(f"Valorant cache write failed for {cache_key}: {e}")
+
+    async def _fetch(self, endpoint, cache_key, fetcher, background=False):
+        # Single-flight: one upstream request per key no matter how many commands ask
+        future = self.inflight.get(cache_key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except ComputeAbandoned:
+                return await self._fetch(endpoint, cache_key, fetcher, background)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[cache_key] = future
+        try:
+            data, error = await fetcher(background)
+            if error is None and data is not None:
+                await self._store(endpoint, cache_key, data)
+            future.set_result((data, error))
+            return data, error
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel waiters that were never cancelled themselves
+            future.set_exception(ComputeAbandoned(cache_key))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            if self.inflight.get(cache_key) is future:
+                del self.inflight[cache_key]
+
+    def _refresh_in_background(self, endpoint, cache_key, fetcher):
+        if cache_key in self.inflight:
+            return
+        self.refreshes += 1
+
+        async def refresh():
+            try:
+                data, error = await self._fetch(endpoint, cache_key, fetcher, background=True)
+                if error:
+                    self.refresh_failures += 1
+            except Exception as e:
+                self.refresh_failures += 1
+                api_logger.warning(f"Background refresh of {cache_key} failed: {e}")
+
+        task = asyncio.ensure_future(refresh())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def get_or_fetch(self, endpoint, key, fetcher):
+        cache_key = f"{endpoint}:{key}"
+        fresh_ttl, stale_ttl = ENDPOINT_TTLS[endpoint]
+
+        entry = self.memory.get(cache_key)
+        from_mongo = False
+        if entry is None:
+            entry = await self._load_from_mongo(cache_key)
+            from_mongo = entry is not None
+        else:
+            self.memory.move_to_end(cache_key)
+
+        if entry is not None:
+            fetched_at, data = entry
+            age = time.time() - fetched_at
+            if age < fresh_ttl:
+                self.hits += 1
+                if from_mongo:
+                    self.mongo_hits += 1
+                return data, None
+            if age < stale_ttl:
+                # Serve what we have now and refresh behind the caller's back
+                self.stale_hits += 1
+                self._refresh_in_background(endpoint, cache_key, fetcher)
+                return data, None
+
+        self.misses += 1
+        return await self._fetch(endpoint, cache_key, fetcher)
+
+    def invalidate(self, endpoint, key):
+        self.memory.pop(f"{endpoint}:{key}", None)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self.memory),
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+        }
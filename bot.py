@@ -1,72 +1,76 @@
 import twitchio
 from twitchio.ext import commands
 import config
-from api.quote_manager import QuoteManager
+from api.quote_manager import QuoteManager, QUOTE_BOT
 from User.user_data_manager import UserDataManager
 import random
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import aiohttp
+import queue
 from api.ai_manager import AIManager
+from api.llm_engine import LLMEngine
+from api.response_pool import ResponsePool
+from api.prompt_builder import prompt_builder
 from api.compatibility_manager import CompatibilityManager
 from commands.quote_commands import QuoteCommands
 from commands.user_commands import UserCommands
 from commands.ai_commands import AICommands
 from commands.compatibility_commands import CompatibilityCommands
 from utils import bot_logger
-import sys
-import logging
-import io
-from utils.logger import bot_logger
+from utils.logger import bot_logger, chat_logger
 from api.valorant_manager import ValorantManager
 from commands.valorant_commands import ValorantCommands
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,  # Set to DEBUG for more detailed logs
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('bot_debug.log')  # This will also save logs to a file
-    ]
-)
-
-# Define UnicodeStreamHandler
-class UnicodeStreamHandler(logging.StreamHandler):
-    def emit(self, record):
-        try:
-            msg = self.format(record)
-            stream = io.TextIOWrapper(self.stream.buffer, encoding='utf-8', errors='ignore')
-            stream.write(msg + self.terminator)
-            stream.detach()
-            self.flush()
-        except Exception:
-            self.handleError(record)
-
-# Replace the default handler with the UnicodeStreamHandler
-logging.getLogger().handlers = [UnicodeStreamHandler(sys.stdout)]
+from utils.http_client import HttpClient
+from utils.database import Database
+from utils.chat_scheduler import ChatScheduler, HIGH, LOW
+from utils.command_executor import CommandExecutor
+from utils.chat_pipeline import ChatPipeline
+from utils.channels import channel_key, configured_channels
 
 class Bot(commands.Bot):
 
-    def __init__(self):
-        super().__init__(token=config.TWITCH_OAUTH_TOKEN, prefix='!', initial_channels=[config.TWITCH_CHANNEL])
+    def __init__(self, channels=None, control=None):
+        # A supervisor worker gets its shard of channels plus a queue of join/part instructions
+        self.channel_names = set(channels if channels is not None else configured_channels())
+        self.control = control
+        super().__init__(token=config.TWITCH_OAUTH_TOKEN, prefix='!', initial_channels=sorted(self.channel_names))
         
-        # Initialize the database client and database first
-        self.mongo_client = AsyncIOMotorClient(config.MONGO_URI)
-        self.db = self.mongo_client['twitch_bot_db']
+        # Shared keep-alive HTTP pools for Helix, id.twitch.tv and HenrikDev
+        self.http = HttpClient()
+
+        # One shared, tuned Mongo client for every manager
+        self.database = Database()
+        self.mongo_client = self.database.client
+        self.db = self.database.db
+
+        # Every outbound chat line goes through the per-channel rate-limited scheduler
+        self.chat = ChatScheduler(self)
+        # Commands run behind cooldowns and per-command concurrency caps so bursts can't pile up LLM calls
+        self.command_executor = CommandExecutor(self)
         
         # Initialize ValorantManager with the db
-        self.valorant_manager = ValorantManager(self.db)
+        self.valorant_manager = ValorantManager(self.db, self.http)
         
+        # One pooled LLM engine; quiet periods are spent pre-generating flavor text
+        self.llm = LLMEngine()
+        self.response_pool = ResponsePool(self.db, self.llm)
+
         # Initialize AIManager with the valorant_manager
-        self.ai_manager = AIManager(self, self.valorant_manager)
+        self.ai_manager = AIManager(self, self.valorant_manager, llm_engine=self.llm, response_pool=self.response_pool)
         
-        self.quote_manager = QuoteManager(config.TWITCH_CHANNEL)
-        self.user_data_manager = UserDataManager(self.db, config.IGNORED_USERS_FILE)
-        self.processed_users = set()
+        # Channel-scoped state, created the first time a channel needs it
+        self.quote_managers = {}  # channel -> QuoteManager
+        self.processed_users = {}  # channel -> user IDs already greeted
+        # Quote numbers are the collection-wide _id, so only channels whose quote bot we trust are backfilled
+        self.backfill_channels = {channel_key(channel) for channel in getattr(config, 'QUOTE_BACKFILL_CHANNELS', [config.TWITCH_CHANNEL])}
+        self.user_data_manager = UserDataManager(
+            self.db, config.IGNORED_USERS_FILE, self.http, self.quote_managers, llm=self.llm
+        )
         self.bot_messages = set()  # To keep track of messages sent by the bot
         self.quotes_fetched = False
+        self.control_task = None
         self.compatibility_manager = CompatibilityManager(self.user_data_manager, self.ai_manager)
+        # Incoming chat is persisted inline, then queued and fanned out to quote, command and reply workers
+        self.pipeline = ChatPipeline(self)
         
         # Add command groups
         self.add_cog(QuoteCommands(self))
@@ -93,82 +97,143 @@ class Bot(commands.Bot):
     async def event_ready(self):
         print(f'Logged in as | {self.nick}')
         print(f'User id is | {self.user_id}')
-        
-        await self.quote_manager.print_all_quote_ids()
-        last_quote_number = await self.quote_manager.get_last_quote_number()
-        print(f"Last quote number in database: {last_quote_number}")
-        
+        self.user_data_manager.start()
+        self.pipeline.start()
+        await self.database.ensure_indexes()
+        if self.channel_names:
+            await self.database.check_query_plans(min(self.channel_names))
+        self.valorant_manager.pickup_lines.ensure_fresh()
+        await self.response_pool.load()
+        await asyncio.get_running_loop().run_in_executor(None, prompt_builder.load_encoding)
+        await self.user_data_manager.similarity.load()
+        if self.control is not None and self.control_task is None:
+            self.control_task = asyncio.ensure_future(self.watch_control())
+
+        await asyncio.gather(*(self.get_quote_manager(channel) for channel in self.channel_names))
+        for channel in sorted(self.channel_names & self.backfill_channels):
+            quote_manager = await self.get_quote_manager(channel)
+            await quote_manager.print_all_quote_ids()
+            last_quote_number = await quote_manager.get_last_quote_number()
+            print(f"Last quote number in database for {channel}: {last_quote_number}")
+
         if not self.quotes_fetched:
             await self.fetch_new_quotes()
             self.quotes_fetched = True
 
+    async def get_quote_manager(self, channel):
+        name = channel_key(channel)
+        quote_manager = self.quote_managers.get(name)
+        if quote_manager is None:
+            quote_manager = self.quote_managers[name] = QuoteManager(name, self.db)
+            quote_manager.add_quote_listener(self.user_data_manager.invalidate_user_quotes)
+        await quote_manager.ensure_loaded()
+        return quote_manager
+
+    async def join(self, channels):
+        channels = [channel_key(channel) for channel in channels if channel_key(channel) not in self.channel_names]
+        if not channels:
+            return
+        self.channel_names.update(channels)
+        await self.join_channels(channels)
+        bot_logger.info(f"Joined channels: {', '.join(channels)}")
+
+    async def part(self, channels):
+        channels = [channel_key(channel) for channel in channels if channel_key(channel) in self.channel_names]
+        if not channels:
+            return
+        await self.part_channels(channels)
+        for name in channels:
+            self.channel_names.discard(name)
+            self.chat.forget_channel(name)
+            self.quote_managers.pop(name, None)
+            self.processed_users.pop(name, None)
+            self.user_data_manager.summary_cache.invalidate_where(lambda key, name=name: key[1] == name)
+            self.user_data_manager.similarity.forget_channel(name)
+        bot_logger.info(f"Parted channels: {', '.join(channels)}")
+
+    async def watch_control(self):
+        # The supervisor's queue is a blocking multiprocessing queue, so poll it from a worker thread
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                action, channels = await loop.run_in_executor(None, self.control.get, True, 1)
+            except queue.Empty:
+                continue
+            try:
+                if action == 'join':
+                    await self.join(channels)
+                elif action == 'part':
+                    await self.part(channels)
+                elif action == 'stop':
+                    # run() closes the bot, flushing everything buffered, once the loop stops
+                    loop.stop()
+                    return
+            except Exception as e:
+                bot_logger.error(f"Failed to {action} channels {channels}: {e}")
+
     async def event_message(self, message):
         if message.author is None:
             bot_logger.warning("Received a message with no author.")
             return
 
-        author_name = message.author.name if message.author else "Unknown"
-        bot_logger.info(f"Received message: {message.content} from {author_name}")
+        # Persistence is an inline buffer enqueue; everything else happens on the pipeline's stage workers,
+        # so one slow handler can't delay later messages
+        self.pipeline.submit(message)
 
-        await self.user_data_manager.update_user_chat_data(
-            message.author.id, message.author.name, message.content, message.timestamp
+    def persist_message(self, message):
+        chat_logger.info("Received message: %s from %s", message.content, message.author.name)
+        self.user_data_manager.update_user_chat_data(
+            message.author.id, message.author.name, message.content, message.timestamp, message.channel.name
         )
 
-        if message.echo:
+    async def dispatch_command(self, message):
+        ctx = await self.get_context(message)
+        try:
+            await self.invoke(ctx)
+        except commands.CommandNotFound:
+            pass
+
+    async def invoke(self, context):
+        if not context.prefix or not context.is_valid:
             return
+        self.command_executor.run(context, super().invoke)
 
-        ctx = await self.get_context(message)
-        if ctx.prefix is not None:
-            try:
-                await self.invoke(ctx)
-            except commands.CommandNotFound:
-                pass
-        else:
-            await self.handle_regular_message(message)
-
-    async def handle_regular_message(self, message):
-        bot_logger.info(f"Handling regular message from {message.author.name}")
-        await self.quote_manager.process_message(message)
-        if message.author:
-            await self.user_data_manager.update_user_chat_data(
-                message.author.id,
-                message.author.name,
-                message.content,
-                message.timestamp
-            )
-            
-            if message.author.id not in self.processed_users:
-                await self.process_first_message(message)
-            
-            if random.random() < 0.01:  # 5% chance to respond to non-command messages
-                context = f"Responding to a chat message: '{message.content}'"
-                response = await self.ai_manager.generate_enhanced_personalized_response(message.content, context)
-                await self.send_message(message.channel.name, f"@{message.author.name}, {response}")
-
-    async def send_message(self, channel, content):
-        if isinstance(channel, str):
-            channel_obj = self.get_channel(channel)
-            if channel_obj is None:
-                try:
-                    channel_obj = await self.fetch_channel(channel)
-                except Exception as e:
-                    print(f"Error fetching channel {channel}: {e}")
-                    return
-        else:
-            channel_obj = channel
+    def is_quote_response(self, message):
+        return message.author.name.lower() == QUOTE_BOT
+
+    async def process_quote_message(self, message):
+        quote_manager = await self.get_quote_manager(message.channel)
+        await quote_manager.process_message(message)
+
+    def is_first_message(self, message):
+        return message.author.id not in self.processed_users.get(channel_key(message.channel), ())
+
+    def mark_first_message(self, message):
+        self.processed_users.setdefault(channel_key(message.channel), set()).add(message.author.id)
 
-        if channel_obj:
-            await channel_obj.send(content)
-        else:
-            print(f"Error: Channel {channel} not found")
+    def wants_random_reply(self, message):
+        return random.random() < 0.01  # 1% chance to respond to non-command messages
+
+    async def send_random_reply(self, message):
+        context = f"Responding to a chat message: '{message.content}'"
+        response = await self.ai_manager.generate_enhanced_personalized_response(message.content, context)
+        await self.send_message(message.channel.name, f"@{message.author.name}, {response}", priority=LOW)
+
+    async def send_message(self, channel, content, priority=HIGH):
+        await self.chat.send(channel, content, priority)
+
+    async def event_userstate(self, user):
+        # Twitch tells us our own badges on join and after every message we send
+        self.chat.set_mod(user.channel, bool(user.is_mod or getattr(user, 'is_broadcaster', False)))
 
     async def fetch_new_quotes(self):
-        await self.quote_manager.fetch_new_quotes(self, max_checks=200)
+        for channel in sorted(self.channel_names & self.backfill_channels):
+            quote_manager = await self.get_quote_manager(channel)
+            await quote_manager.fetch_new_quotes(self, max_checks=200)
 
     async def process_first_message(self, message):
         user_summary = await self.user_data_manager.get_user_summary(message.author.id, message.channel.name)
         print(f"User summary for {message.author.name}: {user_summary}")
-        self.processed_users.add(message.author.id)
 
     def clean_username(self, username):
         return username.lstrip('@')
@@ -186,23 +251,25 @@ class Bot(commands.Bot):
 
     async def update_local_data(self):
         # Update frequently accessed data
-        await self.quote_manager.update_quote_cache()
+        for quote_manager in list(self.quote_managers.values()):
+            await quote_manager.update_quote_cache()
         await self.user_data_manager.update_user_cache()
 
+    async def close(self):
+        if self.control_task:
+            self.control_task.cancel()
+        await self.pipeline.close()
+        await self.command_executor.close()
+        await self.chat.close()
+        await self.user_data_manager.close()
+        await self.ai_manager.close()
+        await self.valorant_manager.close()
+        await self.http.close()
+        self.database.close()
+        await super().close()
+
     async def fetch_user_id_from_twitch_api(self, username):
-        url = f"https://api.twitch.tv/helix/users?login={username}"
-        headers = {
-            "Client-ID": config.TWITCH_CLIENT_ID,
-            "Authorization": f"Bearer {await self.user_data_manager.ensure_valid_access_token()}"
-        }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data['data']:
-                        return data['data'][0]['id']
-                print(f"Failed to get user ID for {username}. Status: {response.status}")
-        return None
+        return await self.user_data_manager.identity_resolver.resolve(username)
 
 def main():
     bot = Bot()
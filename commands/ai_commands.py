@@ -10,7 +10,7 @@ class AICommands(commands.Cog):
     async def ai_response(self, ctx: commands.Context, *, question: str = None):
         bot_logger.info(f"AI response requested by {ctx.author.name}")
         user_summary = await self.bot.user_data_manager.get_user_summary(ctx.author.id, ctx.channel.name)
-        bot_logger.info(f"User summary for {ctx.author.name}: {user_summary}")
+        bot_logger.debug("User summary for %s: %s", ctx.author.name, user_summary)
         
         if "No chat history available" in user_summary:
             bot_logger.warning(f"No chat history available for {ctx.author.name}")
@@ -22,12 +22,8 @@ class AICommands(commands.Cog):
         else:
             prompt = f"Generate a brief personalized greeting for the user based on their profile and chat history."
 
-        ai_response = await self.bot.ai_manager.generate_response(user_summary, prompt)
-        
-        # Truncate the response if it's too long
-        max_response_length = 450  # Leave some room for the username and formatting
-        if len(ai_response) > max_response_length:
-            ai_response = ai_response[:max_response_length] + "..."
+        # Leave room for the @mention within Twitch's 500 character limit
+        ai_response = await self.bot.ai_manager.generate_response(user_summary, prompt, max_chars=450)
 
         await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, {ai_response}")
 
@@ -40,7 +36,7 @@ class AICommands(commands.Cog):
 
         user_name, user_id = await self.bot.get_user_by_name(target)
         if not user_id:
-            await ctx.send(f"@{ctx.author.name}, I couldn't find the user {target}. Are you sure they exist?")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't find the user {target}. Are you sure they exist?")
             return
 
         bot_logger.info(f"Generating roast for target: {target}, User ID: {user_id}")
@@ -48,7 +44,7 @@ class AICommands(commands.Cog):
         bot_logger.info(f"User data retrieved for {target}")
 
         roast = await self.bot.ai_manager.generate_roast(user_data, target)
-        await ctx.send(f"@{target}, {roast}")
+        await self.bot.send_message(ctx.channel, f"@{target}, {roast}")
     
     @commands.command(name='compliment')
     async def compliment_command(self, ctx: commands.Context, target_user: str = None):
@@ -59,16 +55,16 @@ class AICommands(commands.Cog):
 
         user_name, user_id = await self.bot.get_user_by_name(target_user)
         if not user_id:
-            await ctx.send(f"@{ctx.author.name}, I couldn't find the user {target_user}. Are you sure they exist?")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't find the user {target_user}. Are you sure they exist?")
             return
 
         bot_logger.info(f"Compliment command requested by {ctx.author.name} for {target_user}")
 
         user_summary = await self.bot.user_data_manager.get_user_summary(user_id, target_user)
-        bot_logger.info(f"User summary for {target_user}: {user_summary}")
+        bot_logger.debug("User summary for %s: %s", target_user, user_summary)
 
         compliment = await self.bot.ai_manager.generate_compliment(user_summary, target_user)
-        await ctx.send(f"@{target_user}, {compliment}")
+        await self.bot.send_message(ctx.channel, f"@{target_user}, {compliment}")
 
     @commands.command(name='about')
     async def about_command(self, ctx: commands.Context):
@@ -78,7 +74,7 @@ class AICommands(commands.Cog):
             "Use commands like !quote, !valocoach, !rank, and !roast to interact with me. "
             "I'm here to make the stream more engaging and fun! 🎮"
         )
-        await ctx.send(about_message)
+        await self.bot.send_message(ctx.channel, about_message)
 
     @commands.command(name='commands')
     async def list_commands(self, ctx: commands.Context):
@@ -90,6 +86,7 @@ class AICommands(commands.Cog):
             "!roast - Playful roast",
             "!compliment - Get a compliment",
             "!compatibility - Check compatibility",
+            "!ship - Top matches in chat",
             "!setriotid - Set Riot ID",
             "!valorantstats - Valorant stats",
             "!valocoach - Coaching tips",
@@ -100,7 +97,7 @@ class AICommands(commands.Cog):
         ]
 
         commands_message = "📜 Commands: " + " | ".join(command_list)
-        await ctx.send(commands_message)
+        await self.bot.send_message(ctx.channel, commands_message)
 
     @commands.command(name='rizz')
     async def rizz_command(self, ctx: commands.Context, target_user: str = None):
@@ -111,16 +108,16 @@ class AICommands(commands.Cog):
 
         user_name, user_id = await self.bot.get_user_by_name(target_user)
         if not user_id:
-            await ctx.send(f"@{ctx.author.name}, I couldn't find the user {target_user}. Are you sure they exist?")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't find the user {target_user}. Are you sure they exist?")
             return
 
         bot_logger.info(f"Rizz command requested by {ctx.author.name} for {target_user}")
 
         user_summary = await self.bot.user_data_manager.get_user_summary(user_id, target_user)
-        bot_logger.info(f"User summary for {target_user}: {user_summary}")
+        bot_logger.debug("User summary for %s: %s", target_user, user_summary)
 
         rizz_message = await self.bot.ai_manager.generate_rizz(user_summary, target_user)
-        await ctx.send(f"@{target_user}, {rizz_message}")
+        await self.bot.send_message(ctx.channel, f"@{target_user}, {rizz_message}")
 
 
 
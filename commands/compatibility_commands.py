@@ -4,17 +4,31 @@ class CompatibilityCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    @commands.command(name='compatibility', aliases=['compatible', 'compatable', 'compatability', 'ship', 'match'])
+    @commands.command(name='compatibility', aliases=['compatible', 'compatable', 'compatability', 'match'])
     async def compatibility_command(self, ctx: commands.Context, user1: str = None, user2: str = None):
         # Case 1: No arguments provided
         if not user1:
             usage_message = "❓ How to use the compatibility command:\n"
             usage_message += "• Compare yourself with someone else: !compatibility @theirusername\n"
             usage_message += "• Compare two other users: !compatibility @user1 @user2\n"
+            usage_message += "• See the best matches in chat: !ship\n"
             usage_message += "Remember, usernames are case-sensitive and the '@' symbol is optional!"
             await self.bot.send_message(ctx.channel, usage_message)
             return
 
+        await self._compatibility(ctx, user1, user2)
+
+    @commands.command(name='ship')
+    async def ship_command(self, ctx: commands.Context, user1: str = None, user2: str = None):
+        # No arguments: the channel's top pairs from the last background all-pairs run
+        if not user1:
+            result = self.bot.compatibility_manager.ship_leaderboard(ctx.channel.name)
+            await self.bot.send_message(ctx.channel, result)
+            return
+
+        await self._compatibility(ctx, user1, user2)
+
+    async def _compatibility(self, ctx, user1, user2):
         # Clean usernames
         user1 = self.bot.clean_username(user1)
         user2 = self.bot.clean_username(user2) if user2 else ctx.author.name
@@ -32,5 +46,5 @@ class CompatibilityCommands(commands.Cog):
             return
 
         # Case 2 & 3: One or both arguments provided
-        result = await self.bot.compatibility_manager.generate_compatibility_report(user1, user2)
+        result = await self.bot.compatibility_manager.generate_compatibility_report(user1, user2, ctx.channel.name)
         await self.bot.send_message(ctx.channel, result)
@@ -1,6 +1,7 @@
 from twitchio.ext import commands
 import random
 from utils import command_logger
+from utils.chat_scheduler import LOW
 
 class QuoteCommands(commands.Cog):
     def __init__(self, bot):
@@ -9,27 +10,31 @@ class QuoteCommands(commands.Cog):
     @commands.command(name='quote')
     async def quote_command(self, ctx: commands.Context):
         command_logger.info(f"Quote command used by {ctx.author.name}")
-        quote = await self.bot.quote_manager.get_random_quote()
+        quote_manager = await self.bot.get_quote_manager(ctx.channel)
+        quote = await quote_manager.get_random_quote()
         if quote:
             core_response = f"📜 Quote #{quote['_id']}: \"{quote['text']}\" - {quote['author']}"
             await self.bot.send_message(ctx.channel.name, core_response)
             
             context = "Responding to a request for a random quote"
-            witty_response = await self.bot.ai_manager.generate_enhanced_personalized_response(core_response, context)
+            witty_response = self.bot.ai_manager.pooled_response('quote') or \
+                await self.bot.ai_manager.generate_enhanced_personalized_response(core_response, context)
             if witty_response and witty_response != core_response:
-                await self.bot.send_message(ctx.channel.name, f"💬 {witty_response}")
+                await self.bot.send_message(ctx.channel.name, f"💬 {witty_response}", priority=LOW)
         else:
             core_response = "📭 No quotes found."
             await self.bot.send_message(ctx.channel.name, core_response)
             
             context = "No quotes available in the database"
-            witty_response = await self.bot.ai_manager.generate_enhanced_personalized_response(core_response, context)
+            witty_response = self.bot.ai_manager.pooled_response('quote_empty') or \
+                await self.bot.ai_manager.generate_enhanced_personalized_response(core_response, context)
             if witty_response and witty_response != core_response:
-                await self.bot.send_message(ctx.channel.name, f"💬 {witty_response}")
+                await self.bot.send_message(ctx.channel.name, f"💬 {witty_response}", priority=LOW)
 
     @commands.command(name='quoteid')
     async def quote_id_command(self, ctx: commands.Context, quote_id: str):
-        quote = await self.bot.quote_manager.get_quote_by_id(quote_id)
+        quote_manager = await self.bot.get_quote_manager(ctx.channel)
+        quote = await quote_manager.get_quote_by_id(quote_id)
         if quote:
             await self.bot.send_message(ctx.channel, f"Quote #{quote['_id']}: {quote['text']} - {quote['author']}")
         else:
@@ -42,21 +47,20 @@ class QuoteCommands(commands.Cog):
             return
 
         search_term = ' '.join(search_terms)
-        quotes = await self.bot.quote_manager.search_quotes(search_term)
+        quote_manager = await self.bot.get_quote_manager(ctx.channel)
+        quotes = await quote_manager.search_quotes(search_term, limit=3)
         
         if quotes:
+            # Vary repeated searches between the closest few matches
             random_quote = random.choice(quotes)
             core_response = f"📜 Quote #{random_quote['_id']}: \"{random_quote['text']}\" - {random_quote['author']}"
             context = f"Responding to a quote search for '{search_term}'"
-            witty_response = await self.bot.ai_manager.generate_enhanced_personalized_response(core_response, context)
+            witty_response = self.bot.ai_manager.pooled_response('quotesearch') or \
+                await self.bot.ai_manager.generate_enhanced_personalized_response(core_response, context)
             
             # Format the response
             formatted_response = f"{core_response}\n💬 {witty_response}"
-            
-            # Ensure the response fits within Twitch's character limit
-            if len(formatted_response) > 500:  # Twitch has a 500 character limit
-                formatted_response = formatted_response[:497] + "..."
-            
+
             await self.bot.send_message(ctx.channel.name, formatted_response)
         else:
             await self.bot.send_message(ctx.channel.name, f"🔍 No quotes found containing '{search_term}'.")
@@ -64,8 +68,9 @@ class QuoteCommands(commands.Cog):
     @commands.command(name='quotecount')
     async def quote_count_command(self, ctx: commands.Context):
         author = ctx.author.name
-        count = await self.bot.quote_manager.count_quotes_by_author(f'@{author}')
-        total_quotes, avg_quotes = await self.bot.quote_manager.get_quote_statistics()
+        quote_manager = await self.bot.get_quote_manager(ctx.channel)
+        count = await quote_manager.count_quotes_by_author(f'@{author}')
+        total_quotes, avg_quotes = await quote_manager.get_quote_statistics()
         
         emoji = "📚" if count > 0 else "📭"
         core_response = f"{emoji} @{author}, you have {count} quote(s) in the database!"
@@ -73,29 +78,34 @@ class QuoteCommands(commands.Cog):
         comparison = ""
         if count > avg_quotes:
             comparison = f"You're above average! The mean is {avg_quotes:.2f} quotes per user."
+            pool_name = 'quotecount_above'
         elif count < avg_quotes:
             comparison = f"You're below average. The mean is {avg_quotes:.2f} quotes per user. Step it up!"
+            pool_name = 'quotecount_below'
         else:
             comparison = f"You're exactly average! The mean is {avg_quotes:.2f} quotes per user."
+            pool_name = 'quotecount_average'
         
-        context = f"Commenting on {author}'s quote count ({count}) compared to the average ({avg_quotes:.2f})"
-        witty_response = await self.bot.ai_manager.generate_enhanced_personalized_response(comparison, context)
-        
-        full_response = f"{core_response}\n💬 {witty_response}"
-        
-        # Ensure the response fits within Twitch's character limit
-        if len(full_response) > 500:
-            full_response = full_response[:497] + "..."
-        
+        pooled = self.bot.ai_manager.pooled_response(pool_name)
+        if pooled:
+            # Pooled quips don't know the numbers, so the comparison is stated alongside
+            full_response = f"{core_response} {comparison}\n💬 {pooled}"
+        else:
+            context = f"Commenting on {author}'s quote count ({count}) compared to the average ({avg_quotes:.2f})"
+            witty_response = await self.bot.ai_manager.generate_enhanced_personalized_response(comparison, context)
+            full_response = f"{core_response}\n💬 {witty_response}"
+
         await self.bot.send_message(ctx.channel, full_response)
 
     @commands.command(name='lastquote')
     async def last_quote_command(self, ctx: commands.Context):
-        last_quote_info = await self.bot.quote_manager.get_last_quote()
+        quote_manager = await self.bot.get_quote_manager(ctx.channel)
+        last_quote_info = await quote_manager.get_last_quote()
         await self.bot.send_message(ctx.channel, last_quote_info)
 
     @commands.command(name='checkquotes')
     async def check_quotes_command(self, ctx: commands.Context):
-        last_id = await self.bot.quote_manager.get_last_quote_number()
-        total_quotes = await self.bot.quote_manager.quotes_collection.count_documents({"channel": self.bot.quote_manager.channel_name})
-        await ctx.send(f"Last quote ID: {last_id}, Total quotes: {total_quotes}")
+        quote_manager = await self.bot.get_quote_manager(ctx.channel)
+        last_id = await quote_manager.get_last_quote_number()
+        total_quotes = await quote_manager.quotes_collection.count_documents({"channel": quote_manager.channel_name})
+        await self.bot.send_message(ctx.channel, f"Last quote ID: {last_id}, Total quotes: {total_quotes}")
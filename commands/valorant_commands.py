@@ -11,8 +11,10 @@ import json
 from api.ai_manager import AIManager
 from datetime import datetime
 import logging
+import config
 from valorant import Client
 from collections import Counter
+from api.valorant_analytics import analyze_matches
 
 class ValorantCommands(commands.Cog):
     def __init__(self, bot):
@@ -25,41 +27,41 @@ class ValorantCommands(commands.Cog):
         existing_riot_id = await self.bot.valorant_manager.get_riot_id(ctx.author.name)
         
         if existing_riot_id:
-            await ctx.send(f"@{ctx.author.name}, you already have a Riot ID set ({existing_riot_id}). Are you sure you want to update it? Use !confirmupdateriotid <new_riot_id> to confirm.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, you already have a Riot ID set ({existing_riot_id}). Are you sure you want to update it? Use !confirmupdateriotid <new_riot_id> to confirm.")
             return
 
         try:
             success = await self.bot.valorant_manager.store_riot_id(ctx.author.name, riot_id)
             if success:
-                await ctx.send(f"@{ctx.author.name}, your Riot ID has been set to {riot_id}.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, your Riot ID has been set to {riot_id}.")
             else:
-                await ctx.send(f"@{ctx.author.name}, there was an error setting your Riot ID. Please try again later.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, there was an error setting your Riot ID. Please try again later.")
         except Exception as e:
             command_logger.error(f"Error setting Riot ID for {ctx.author.name}: {str(e)}")
-            await ctx.send(f"@{ctx.author.name}, an unexpected error occurred. Please try again later.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, an unexpected error occurred. Please try again later.")
 
     @commands.command(name='confirmupdateriotid')
     async def confirm_update_riot_id(self, ctx: commands.Context, *, riot_id: str = None):
         command_logger.info(f"Confirm update Riot ID command used by {ctx.author.name}")
         if not riot_id:
-            await ctx.send(f"@{ctx.author.name}, please provide your new Riot ID. Usage: !confirmupdateriotid <new_riot_id>")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, please provide your new Riot ID. Usage: !confirmupdateriotid <new_riot_id>")
             return
         try:
             success, message = await self.bot.valorant_manager.store_riot_id(ctx.author.name, riot_id)
             if success:
-                await ctx.send(f"@{ctx.author.name}, your Riot ID has been updated to {riot_id}.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, your Riot ID has been updated to {riot_id}.")
             else:
-                await ctx.send(f"@{ctx.author.name}, there was an error updating your Riot ID: {message}")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, there was an error updating your Riot ID: {message}")
         except Exception as e:
             command_logger.error(f"Error updating Riot ID for {ctx.author.name}: {str(e)}")
-            await ctx.send(f"@{ctx.author.name}, an unexpected error occurred: {str(e)}. Please try again later.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, an unexpected error occurred: {str(e)}. Please try again later.")
 
     @commands.command(name='valostat')
     async def valorant_stats(self, ctx: commands.Context, *, riot_id: str = None):
         if not riot_id:
             riot_id = await self.bot.valorant_manager.get_riot_id(ctx.author.name)
             if not riot_id:
-                await ctx.send(f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
                 return
 
         stats = await self.bot.valorant_manager.get_player_stats(riot_id)
@@ -72,9 +74,9 @@ class ValorantCommands(commands.Cog):
             response += f"Region: {account.region}\n"
             response += f"Account Level: {account.account_level}\n"
             
-            await ctx.send(response)
+            await self.bot.send_message(ctx.channel, response)
         else:
-            await ctx.send(f"@{ctx.author.name}, I couldn't fetch the Valorant stats for {riot_id}. Please check if the Riot ID is correct.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't fetch the Valorant stats for {riot_id}. Please check if the Riot ID is correct.")
 
     @commands.command(name='valomatch')
     async def valorant_recent_match(self, ctx: commands.Context, *, riot_id: str = None):
@@ -83,7 +85,7 @@ class ValorantCommands(commands.Cog):
             command_logger.debug(f"Retrieved Riot ID for {ctx.author.name}: {riot_id}")
         
         if not riot_id:
-            await ctx.send(f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
             return
 
         command_logger.debug(f"Fetching recent match data for Riot ID: {riot_id}")
@@ -109,9 +111,9 @@ class ValorantCommands(commands.Cog):
             else:
                 response += f"🔴🔵 Team Score: Red {teams.get('red', 'N/A')} - Blue {teams.get('blue', 'N/A')}\n"
             
-            await ctx.send(response)
+            await self.bot.send_message(ctx.channel, response)
         else:
-            await ctx.send(f"@{ctx.author.name}, I couldn't fetch the recent match data for {riot_id}. The API might be down or the Riot ID might be incorrect.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't fetch the recent match data for {riot_id}. The API might be down or the Riot ID might be incorrect.")
 
     @commands.command(name='valomatches')
     async def valorant_recent_matches(self, ctx: commands.Context, *, args: str = None):
@@ -127,13 +129,13 @@ class ValorantCommands(commands.Cog):
                     riot_id = part
 
         if num_matches < 1 or num_matches > 5:
-            await ctx.send(f"@{ctx.author.name}, please specify a number of matches between 1 and 5.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, please specify a number of matches between 1 and 5.")
             return
 
         if not riot_id:
             riot_id = await self.bot.valorant_manager.get_riot_id(ctx.author.name)
             if not riot_id:
-                await ctx.send(f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
                 return
 
         matches_data = await self.bot.valorant_manager.get_player_recent_matches(riot_id, num_matches=num_matches)
@@ -163,23 +165,10 @@ class ValorantCommands(commands.Cog):
                 
                 response += "\n"
 
-            # Split the response into multiple messages if it's too long
-            max_length = 500  # Twitch has a character limit for messages
-            messages = []
-            while len(response) > max_length:
-                split_index = response.rfind('\n\n', 0, max_length)
-                if split_index == -1:
-                    split_index = response.rfind('\n', 0, max_length)
-                if split_index == -1:
-                    split_index = max_length
-                messages.append(response[:split_index])
-                response = response[split_index:].lstrip()
-            messages.append(response)
-            
-            for message in messages:
-                await ctx.send(message)
+            # The chat scheduler splits this on match boundaries to fit Twitch's message limit
+            await self.bot.send_message(ctx.channel, response)
         else:
-            await ctx.send(f"@{ctx.author.name}, I couldn't fetch the recent match data for {riot_id}. The API might be down or the Riot ID might be incorrect.")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't fetch the recent match data for {riot_id}. The API might be down or the Riot ID might be incorrect.")
 
     @commands.command(name='valocoach')
     async def valorant_coach(self, ctx: commands.Context, *, args: str = None):
@@ -194,28 +183,31 @@ class ValorantCommands(commands.Cog):
                 elif '#' in part:
                     riot_id = part
 
-        if num_matches < 1 or num_matches > 10:
-            await ctx.send(f"@{ctx.author.name}, please specify a number of matches between 1 and 10.")
+        max_matches = getattr(config, 'VALOCOACH_MAX_MATCHES', 200)
+        if num_matches < 1 or num_matches > max_matches:
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, please specify a number of matches between 1 and {max_matches}.")
             return
 
         if not riot_id:
             riot_id = await self.bot.valorant_manager.get_riot_id(ctx.author.name)
             if not riot_id:
-                await ctx.send(f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
                 return
 
         stats, stats_error = await self.bot.valorant_manager.get_player_stats(riot_id)
-        matches, matches_error = await self.bot.valorant_manager.get_player_recent_matches(riot_id, num_matches)
+        matches, matches_error = None, None
+        if stats and not stats_error:
+            matches, matches_error = await self.bot.valorant_manager.get_match_history(riot_id, stats, num_matches)
 
         if stats_error or matches_error:
             error_message = stats_error or matches_error
-            await ctx.send(f"@{ctx.author.name}, {error_message}")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, {error_message}")
             return
 
-        if stats and matches:
-            analysis = self.analyze_matches(stats, matches)
+        analysis = analyze_matches(stats, matches) if stats and matches else None
+        if analysis and analysis['total_matches']:
             
-            stats_message = f"📊 Stats for {riot_id} (last {num_matches} matches):\n"
+            stats_message = f"📊 Stats for {riot_id} (last {analysis['total_matches']} matches):\n"
             stats_message += f"K/D/A: {analysis['avg_kda'][0]:.1f}/{analysis['avg_kda'][1]:.1f}/{analysis['avg_kda'][2]:.1f} | "
             stats_message += f"Avg Score: {analysis['avg_score']:.0f} | "
             stats_message += f"Win Rate: {analysis['win_rate']:.1f}% | "
@@ -223,10 +215,13 @@ class ValorantCommands(commands.Cog):
             stats_message += f"Most Played: {analysis['most_played_agent']} on {analysis['most_played_map']} ({analysis['most_played_mode']})\n"
             stats_message += f"Best Agent: {analysis['best_agent']} | Most Used Weapon: {analysis['most_used_weapon']}"
 
-            await ctx.send(stats_message)
+            await self.bot.send_message(ctx.channel, stats_message)
 
-            prompt = f"Act as a Valorant coach. Based on the following player stats from their last {num_matches} matches, provide a brief analysis and some tips for improvement:\n"
+            prompt = f"Act as a Valorant coach. Based on the following player stats from their last {analysis['total_matches']} matches, provide a brief analysis and some tips for improvement:\n"
             prompt += stats_message + "\n"
+            career = await self.bot.valorant_manager.match_store.get_career_summary(stats.get('puuid'))
+            if career:
+                prompt += f"Career totals, to compare their recent form against: {career}\n"
             prompt += "Recent Match Details:\n"
             for i, match in enumerate(analysis['match_details'], 1):
                 prompt += f"Match {i}: {match['mode']} on {match['map']} as {match['agent']}, KDA: {match['kda']}, Score: {match['score']}, Result: {match['result']}\n"
@@ -235,92 +230,32 @@ class ValorantCommands(commands.Cog):
             coach_response = await self.ai_manager.generate_response("", prompt)
             analysis_message = f"🎮 Coach's analysis:\n{coach_response}"
 
-            await ctx.send(analysis_message)
+            await self.bot.send_message(ctx.channel, analysis_message)
         else:
-            await ctx.send(f"@{ctx.author.name}, I couldn't analyze the recent matches for {riot_id}. The API might be down or the Riot ID might be incorrect.")
-
-    def analyze_matches(self, stats, matches):
-        analysis = {
-            "total_matches": len(matches),
-            "modes": [],
-            "agents": [],
-            "maps": [],
-            "avg_kda": [0, 0, 0],
-            "avg_score": 0,
-            "win_rate": 0,
-            "headshot_percentage": 0,
-            "most_used_weapon": "",
-            "best_agent": "",
-            "match_details": []
-        }
-
-        for match in matches:
-            player = next((p for p in match['players']['all_players'] if p['name'] == stats['name'] and p['tag'] == stats['tag']), None)
-            if not player:
-                continue
-
-            analysis["modes"].append(match['metadata']['mode'])
-            analysis["agents"].append(player['character'])
-            analysis["maps"].append(match['metadata']['map'])
-            
-            analysis["avg_kda"][0] += player['stats']['kills']
-            analysis["avg_kda"][1] += player['stats']['deaths']
-            analysis["avg_kda"][2] += player['stats']['assists']
-            analysis["avg_score"] += player['stats']['score']
-            analysis["win_rate"] += 1 if player['team'] == match['teams'][player['team'].lower()]['has_won'] else 0
-            analysis["headshot_percentage"] += player['stats']['headshots'] / player['stats']['kills'] if player['stats']['kills'] > 0 else 0
-
-            match_detail = {
-                "mode": match['metadata']['mode'],
-                "map": match['metadata']['map'],
-                "agent": player['character'],
-                "kda": f"{player['stats']['kills']}/{player['stats']['deaths']}/{player['stats']['assists']}",
-                "score": player['stats']['score'],
-                "result": "Win" if player['team'] == match['teams'][player['team'].lower()]['has_won'] else "Loss"
-            }
-            analysis["match_details"].append(match_detail)
-
-        num_matches = len(matches)
-        if num_matches > 0:
-            analysis["avg_kda"] = [round(k / num_matches, 2) for k in analysis["avg_kda"]]
-            analysis["avg_score"] = round(analysis["avg_score"] / num_matches, 0)
-            analysis["win_rate"] = round((analysis["win_rate"] / num_matches) * 100, 2)
-            analysis["headshot_percentage"] = round((analysis["headshot_percentage"] / num_matches) * 100, 2)
-
-        analysis["most_played_mode"] = max(set(analysis["modes"]), key=analysis["modes"].count)
-        analysis["most_played_agent"] = max(set(analysis["agents"]), key=analysis["agents"].count)
-        analysis["most_played_map"] = max(set(analysis["maps"]), key=analysis["maps"].count)
-
-        weapons = [kill['killer_weapon_name'] for match in matches for kill in match.get('kills', []) if kill.get('killer_puuid') == player.get('puuid')]
-        analysis["most_used_weapon"] = max(set(weapons), key=weapons.count) if weapons else "Unknown"
-
-        agent_stats = Counter(analysis["agents"])
-        analysis["best_agent"] = max(agent_stats, key=agent_stats.get)
-
-        return analysis
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't analyze the recent matches for {riot_id}. The API might be down or the Riot ID might be incorrect.")
 
     @commands.command(name='rank')
     async def valorant_rank(self, ctx: commands.Context, *, riot_id: str = None):
         if not riot_id:
             riot_id = await self.bot.valorant_manager.get_riot_id(ctx.author.name)
             if not riot_id:
-                await ctx.send(f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I don't have your Riot ID stored. Use !confirmupdateriotid to set it.")
                 return
 
         stats = await self.bot.valorant_manager.get_player_stats(riot_id)
         if stats:
             mmr = stats['mmr']
             if not mmr:
-                await ctx.send(f"@{ctx.author.name}, I couldn't fetch the rank for {riot_id}. The API might be down or the Riot ID might be incorrect.")
+                await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't fetch the rank for {riot_id}. The API might be down or the Riot ID might be incorrect.")
                 return
 
             response = f"@{ctx.author.name}, here is the rank for {riot_id}:\n"
             response += f"Rank: {mmr.get('currenttierpatched', 'Unranked')}\n"
             response += f"RR: {mmr.get('ranking_in_tier', 'N/A')}\n"
             response += f"Peak Rank: {mmr.get('highest_rank', {}).get('patched_tier', 'N/A')}"
-            await ctx.send(response)
+            await self.bot.send_message(ctx.channel, response)
         else:
-            await ctx.send(f"@{ctx.author.name}, I couldn't fetch the rank for {riot_id}. Please check if the Riot ID is correct (format: name#tag).")
+            await self.bot.send_message(ctx.channel, f"@{ctx.author.name}, I couldn't fetch the rank for {riot_id}. Please check if the Riot ID is correct (format: name#tag).")
 
 
 
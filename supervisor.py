@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import time
+
+import config
+from utils.channels import HashRing, configured_channels
+from utils.logger import bot_logger
+
+
+def run_worker(channels, control):
+    # Imported here so each spawned worker builds its own Mongo, HTTP and IRC connections
+    from bot import Bot
+    Bot(channels=channels, control=control).run()
+
+
+class Supervisor:
+    def __init__(self, workers=None, reload_interval=None):
+        self.worker_count = workers or getattr(config, 'BOT_WORKERS', 1)
+        self.reload_interval = reload_interval or getattr(config, 'CHANNEL_RELOAD_SECONDS', 60)
+        # Long enough for Bot.close to drain the pipeline and flush buffered chat, profiles and vectors
+        self.shutdown_timeout = getattr(config, 'WORKER_SHUTDOWN_SECONDS', 30)
+        self.ring = HashRing(str(worker) for worker in range(self.worker_count))
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = {}  # worker -> Process
+        self.controls = {}  # worker -> Queue of ('join' | 'part' | 'stop', [channels])
+        self.assignment = {}  # worker -> set of channels
+
+    def start_worker(self, worker):
+        control = self.context.Queue()
+        os.environ['VOLICAI_WORKER'] = worker
+        try:
+            process = self.context.Process(
+                target=run_worker,
+                args=(sorted(self.assignment.get(worker, ())), control),
+                name=f"volicai-worker-{worker}",
+                daemon=True,
+            )
+            process.start()
+        finally:
+            os.environ.pop('VOLICAI_WORKER', None)
+        self.processes[worker] = process
+        self.controls[worker] = control
+        bot_logger.info(f"Started worker {worker} (pid {process.pid}) for {len(self.assignment.get(worker, ()))} channels")
+
+    def rebalance(self, channels):
+        # Consistent hashing keeps every unchanged channel on the worker it is already on
+        new_assignment = {worker: set(assigned) for worker, assigned in self.ring.assign(channels).items()}
+        for worker in self.processes:
+            old = self.assignment.get(worker, set())
+            new = new_assignment.get(worker, set())
+            if old - new:
+                self.controls[worker].put(('part', sorted(old - new)))
+            if new - old:
+                self.controls[worker].put(('join', sorted(new - old)))
+            self.assignment[worker] = new
+        bot_logger.info(f"Rebalanced {len(channels)} channels across {self.worker_count} workers")
+
+    def run(self):
+        channels = configured_channels()
+        self.assignment = {worker: set(assigned) for worker, assigned in self.ring.assign(channels).items()}
+        for worker in (str(worker) for worker in range(self.worker_count)):
+            self.start_worker(worker)
+
+        try:
+            while True:
+                time.sleep(self.reload_interval)
+                for worker, process in list(self.processes.items()):
+                    if not process.is_alive():
+                        bot_logger.error(f"Worker {worker} exited with code {process.exitcode}, restarting")
+                        self.start_worker(worker)
+                latest = configured_channels()
+                if latest != channels:
+                    channels = latest
+                    self.rebalance(channels)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        # Workers close themselves (on Ctrl+C they already got SIGINT); terminating them straight
+        # away would kill the flushes in Bot.close, so only workers that hang past the timeout are killed
+        for worker, process in self.processes.items():
+            if process.is_alive():
+                self.controls[worker].put(('stop', []))
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in self.processes.values():
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+        for worker, process in self.processes.items():
+            if process.is_alive():
+                bot_logger.warning(f"Worker {worker} did not shut down within {self.shutdown_timeout}s, terminating it")
+                process.terminate()
+                process.join(timeout=5)
+
+
+def main():
+    Supervisor().run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import asyncio
+
+from utils.async_cache import AsyncTTLCache
+
+
+async def test_concurrent_misses_share_one_computation():
+    cache = AsyncTTLCache()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    results = await asyncio.gather(*(cache.get_or_compute('key', factory) for _ in range(5)))
+    stats = cache.stats()
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert stats['misses'] == 1 and stats['coalesced'] == 4
+
+
+async def test_cancelled_owner_hands_the_compute_to_a_waiter():
+    cache = AsyncTTLCache()
+
+    async def slow():
+        await asyncio.sleep(1)
+        return 'owner'
+
+    async def fast():
+        return 'waiter'
+
+    owner = asyncio.ensure_future(cache.get_or_compute('key', slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(cache.get_or_compute('key', fast))
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    assert await waiter == 'waiter'
+    assert owner.cancelled()
+    assert cache.get('key') == 'waiter'
+
+
+async def test_failed_compute_propagates_to_waiters():
+    cache = AsyncTTLCache()
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    results = await asyncio.gather(
+        cache.get_or_compute('key', broken), cache.get_or_compute('key', broken), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,184 @@
+import asyncio
+
+from conftest import FakeBot, FakeMessage, tick
+from utils.chat_pipeline import BLOCK, DROP_NEWEST, DROP_OLDEST, ChatPipeline, Stage
+
+
+class PipelineBot(FakeBot):
+    """Records which stage handled each message instead of doing the work."""
+
+    def __init__(self, random_reply=False):
+        super().__init__()
+        self.random_reply = random_reply
+        self.persisted = []
+        self.handled = {name: [] for name in ('quotes', 'commands', 'first_message', 'ai_replies')}
+        self.greeted = set()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    def persist_message(self, message):
+        self.persisted.append(message.content)
+
+    def is_quote_response(self, message):
+        return message.author.name == 'streamelements'
+
+    def is_first_message(self, message):
+        return message.author.name not in self.greeted
+
+    def mark_first_message(self, message):
+        self.greeted.add(message.author.name)
+
+    def wants_random_reply(self, message):
+        return self.random_reply
+
+    async def process_quote_message(self, message):
+        self.handled['quotes'].append(message.content)
+
+    async def dispatch_command(self, message):
+        self.handled['commands'].append(message.content)
+
+    async def process_first_message(self, message):
+        await self.release.wait()
+        self.handled['first_message'].append(message.content)
+
+    async def send_random_reply(self, message):
+        self.handled['ai_replies'].append(message.content)
+
+
+class Recorder:
+    def __init__(self, fail_on=None):
+        self.items = []
+        self.fail_on = fail_on
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, item):
+        await self.release.wait()
+        if item == self.fail_on:
+            raise ValueError(item)
+        self.items.append(item)
+
+
+def queued(stage):
+    return list(stage.queue._queue)
+
+
+async def test_drop_newest_refuses_new_items_when_full():
+    stage = Stage('test', Recorder(), maxsize=2, overload=DROP_NEWEST)
+    assert [stage.offer(item) for item in (1, 2, 3)] == [True, True, False]
+    assert queued(stage) == [1, 2]
+    assert stage.stats()['dropped'] == 1
+
+
+async def test_drop_oldest_evicts_the_stalest_item():
+    stage = Stage('test', Recorder(), maxsize=2, overload=DROP_OLDEST)
+    assert [stage.offer(item) for item in (1, 2, 3, 4)] == [True, True, True, True]
+    assert queued(stage) == [3, 4]
+    assert stage.stats()['dropped'] == 2
+    # Evicted items are marked done, so join() still completes once the rest are handled
+    assert stage.queue._unfinished_tasks == 2
+
+
+async def test_block_waits_for_space_instead_of_dropping():
+    handler = Recorder()
+    handler.release.clear()
+    stage = Stage('test', handler, maxsize=1, overload=BLOCK)
+    stage.start()
+    await stage.put(1)
+    await tick()  # The worker holds item 1, the queue is empty again
+    await stage.put(2)
+    third = asyncio.ensure_future(stage.put(3))
+    await tick()
+    blocked = not third.done()
+    handler.release.set()
+    await third
+    await stage.close(timeout=1)
+
+    assert blocked
+    assert handler.items == [1, 2, 3]
+    assert stage.stats()['dropped'] == 0
+
+
+async def test_stats_count_processed_failed_and_dropped():
+    stage = Stage('test', Recorder(fail_on='bad'), maxsize=3, overload=DROP_NEWEST)
+    for item in ('a', 'bad', 'b', 'c'):
+        stage.offer(item)
+    stage.start()
+    await stage.close(timeout=1)
+
+    assert stage.stats() == {"depth": 0, "capacity": 3, "processed": 2, "dropped": 1, "failed": 1}
+
+
+async def test_close_is_bounded_when_a_handler_is_stuck():
+    handler = Recorder()
+    handler.release.clear()
+    stage = Stage('test', handler, maxsize=5)
+    for item in (1, 2):
+        stage.offer(item)
+    stage.start()
+    await asyncio.wait_for(stage.close(timeout=0.05), 1)
+
+    assert stage.workers == []
+    assert stage.queue.qsize() == 1
+
+
+async def test_messages_are_persisted_even_when_ingress_is_full():
+    bot = PipelineBot()
+    pipeline = ChatPipeline(bot, maxsize=1)
+    results = [pipeline.submit(FakeMessage(f"msg {index}")) for index in range(3)]
+
+    assert results == [True, False, False]
+    assert bot.persisted == ['msg 0', 'msg 1', 'msg 2']
+    assert pipeline.stats()['ingress']['dropped'] == 2
+
+
+async def test_quote_replies_bypass_routing():
+    bot = PipelineBot()
+    pipeline = ChatPipeline(bot, maxsize=1)
+    pipeline.submit(FakeMessage("hello"))
+    # Ingress is full, but the StreamElements reply still reaches its own stage
+    pipeline.submit(FakeMessage("#12: gg", author='streamelements'))
+    pipeline.start()
+    await pipeline.close()
+
+    assert bot.handled['quotes'] == ['#12: gg']
+
+
+async def test_routing_and_drain_on_close():
+    bot = PipelineBot(random_reply=True)
+    pipeline = ChatPipeline(bot)
+    pipeline.start()
+    pipeline.submit(FakeMessage("!roast alice"))
+    pipeline.submit(FakeMessage("hi chat"))
+    pipeline.submit(FakeMessage("again"))
+    pipeline.submit(FakeMessage("bot line", author='volicai', echo=True))
+    await pipeline.close()
+
+    assert bot.persisted == ['!roast alice', 'hi chat', 'again', 'bot line']
+    assert bot.handled['commands'] == ['!roast alice']
+    assert bot.handled['first_message'] == ['hi chat']
+    assert bot.handled['ai_replies'] == ['hi chat', 'again']
+
+
+async def test_first_message_is_only_marked_once_queued():
+    bot = PipelineBot()
+    bot.release.clear()
+    pipeline = ChatPipeline(bot)
+    pipeline.stages['first_message'] = Stage('first_message', bot.process_first_message, maxsize=1)
+    pipeline.ingress.start()
+    pipeline.submit(FakeMessage("hi", author='alice'))
+    pipeline.submit(FakeMessage("hey", author='carol'))
+    await tick()
+    greeted_while_full = set(bot.greeted)
+    # The worker picks up alice's greeting, making room for carol's next message
+    pipeline.stages['first_message'].start()
+    await tick()
+    pipeline.submit(FakeMessage("still here", author='carol'))
+    await tick()
+    bot.release.set()
+    await pipeline.close()
+
+    # carol's greeting was dropped by the full stage, so her next message gets another chance
+    assert greeted_while_full == {'alice'}
+    assert bot.handled['first_message'] == ['hi', 'still here']
+    assert bot.greeted == {'alice', 'carol'}
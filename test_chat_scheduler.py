@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+from conftest import FakeBot
+from utils.chat_scheduler import HIGH, LOW, MERGE_SEPARATOR, ChatScheduler, split_message
+
+FAMILY = '\U0001F468‍\U0001F469‍\U0001F467'  # man ZWJ woman ZWJ girl
+FLAG = '\U0001F1FA\U0001F1F8'  # two regional indicators
+THUMBS = '\U0001F44D\U0001F3FD'  # thumbs up with a skin tone modifier
+
+
+def test_short_message_is_one_chunk():
+    assert split_message("gg ez") == ["gg ez"]
+
+
+def test_splits_prefer_sentence_then_word_breaks():
+    text = "First sentence here. Second one is a bit longer than the first"
+    chunks = split_message(text, limit=30)
+    assert chunks[0] == "First sentence here."
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert ' '.join(chunks) == text
+
+
+def test_newlines_are_flattened():
+    assert split_message("line one\nline two") == ["line one line two"]
+
+
+def test_exact_limit_is_not_split():
+    assert split_message('a' * 500) == ['a' * 500]
+    assert split_message('a' * 501) == ['a' * 500, 'a']
+
+
+def test_zwj_sequences_are_never_split():
+    text = FAMILY * 10
+    for limit in range(6, 20):
+        chunks = split_message(text, limit=limit)
+        assert ''.join(chunks) == text
+        assert all(len(chunk) <= limit for chunk in chunks)
+        assert all(len(chunk) % len(FAMILY) == 0 for chunk in chunks)
+
+
+def test_flag_pairs_are_never_split():
+    text = 'x' + FLAG * 10
+    for limit in range(3, 12):
+        chunks = split_message(text, limit=limit)
+        assert ''.join(chunks) == text
+        assert all(len(chunk.lstrip('x')) % 2 == 0 for chunk in chunks)
+
+
+def test_skin_tone_modifiers_stay_attached():
+    text = THUMBS * 10
+    chunks = split_message(text, limit=7)
+    assert ''.join(chunks) == text
+    assert all(len(chunk) % 2 == 0 for chunk in chunks)
+
+
+async def test_low_priority_lines_merge():
+    scheduler = ChatScheduler(FakeBot(), max_pending=10)
+    queue = scheduler._queue_for('chan')
+    queue.worker.cancel()
+    await scheduler.send('chan', "first", LOW)
+    await scheduler.send('chan', "second", LOW)
+    assert [text for text, _ in queue.low] == [f"first{MERGE_SEPARATOR}second"]
+    assert scheduler.merged == 1
+
+
+async def test_low_priority_merge_stops_at_the_message_limit():
+    scheduler = ChatScheduler(FakeBot(), max_pending=10)
+    queue = scheduler._queue_for('chan')
+    queue.worker.cancel()
+    await scheduler.send('chan', 'a' * 300, LOW)
+    await scheduler.send('chan', 'b' * 300, LOW)
+    assert [text for text, _ in queue.low] == ['a' * 300, 'b' * 300]
+
+
+async def test_expired_low_priority_lines_are_dropped():
+    scheduler = ChatScheduler(FakeBot(), max_pending=10, low_priority_max_age=30)
+    queue = scheduler._queue_for('chan')
+    queue.worker.cancel()
+    queue.low.append(["stale", time.monotonic() - 60])
+    queue.low.append(["fresh", time.monotonic()])
+    assert scheduler._next_message(queue) == "fresh"
+    assert scheduler.dropped == 1
+
+
+async def test_high_priority_sheds_low_priority_when_full():
+    scheduler = ChatScheduler(FakeBot(), max_pending=2)
+    queue = scheduler._queue_for('chan')
+    queue.worker.cancel()
+    await scheduler.send('chan', "reply one", HIGH)
+    await scheduler.send('chan', "chatter", LOW)
+    await scheduler.send('chan', "reply two", HIGH)
+    await scheduler.send('chan', "reply three", HIGH)
+    assert list(queue.high) == ["reply one", "reply two"]
+    assert list(queue.low) == []
+    assert scheduler.dropped == 2
+
+
+async def test_worker_sends_high_before_low():
+    bot = FakeBot()
+    scheduler = ChatScheduler(bot, max_pending=10)
+    await scheduler.send('chan', "chatter", LOW)
+    await scheduler.send('chan', "reply", HIGH)
+    await asyncio.sleep(0.05)
+    scheduler.forget_channel('chan')
+    assert bot.channels['chan'].sent[0] == "reply"
+    assert scheduler.sent == 1  # The one-second minimum interval holds back the low-priority line
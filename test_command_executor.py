@@ -0,0 +1,189 @@
+import asyncio
+
+from conftest import FakeAuthor, FakeBot, FakeMessage, settle, tick
+from utils.chat_scheduler import LOW
+from utils.command_executor import CommandExecutor
+
+
+class FakeCommand:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeContext:
+    def __init__(self, content, author, channel='volic', prefix='!'):
+        self.message = FakeMessage(content, author, channel)
+        self.command = FakeCommand(content[len(prefix):].split()[0])
+        self.author = author
+        self.channel = channel
+        self.prefix = prefix
+
+
+class Invoker:
+    """Records invocations; while `release` is unset each one blocks, holding its slot."""
+
+    def __init__(self, block=False):
+        self.calls = []
+        self.release = asyncio.Event()
+        if not block:
+            self.release.set()
+
+    async def __call__(self, ctx):
+        self.calls.append(ctx.message.content)
+        await self.release.wait()
+
+
+def executor_with(**policy):
+    return CommandExecutor(FakeBot(), policies={'roast': {'user_cooldown': 0, **policy}})
+
+
+async def test_user_cooldown_is_ignored_silently():
+    executor = executor_with(user_cooldown=60)
+    invoke = Invoker()
+    bob = FakeAuthor('bob')
+    assert executor.run(FakeContext('!roast alice', bob), invoke)
+    assert not executor.run(FakeContext('!roast carol', bob), invoke)
+    # Another user isn't affected by bob's cooldown
+    assert executor.run(FakeContext('!roast carol', FakeAuthor('dave')), invoke)
+    await settle(executor.tasks)
+
+    assert invoke.calls == ['!roast alice', '!roast carol']
+    assert executor.on_cooldown == 1
+    assert executor.bot.sent == []
+
+
+async def test_command_cooldown_is_per_channel():
+    executor = executor_with(command_cooldown=60)
+    invoke = Invoker()
+    assert executor.run(FakeContext('!roast alice', FakeAuthor('bob')), invoke)
+    assert not executor.run(FakeContext('!roast carol', FakeAuthor('dave')), invoke)
+    assert executor.run(FakeContext('!roast carol', FakeAuthor('dave'), channel='other'), invoke)
+    await settle(executor.tasks)
+
+    assert executor.on_cooldown == 1
+
+
+async def test_mods_and_broadcasters_bypass_cooldowns():
+    executor = executor_with(user_cooldown=60, command_cooldown=60)
+    invoke = Invoker()
+    mod = FakeAuthor('modbob', is_mod=True)
+    streamer = FakeAuthor('volic', is_broadcaster=True)
+    assert executor.run(FakeContext('!roast alice', mod), invoke)
+    assert executor.run(FakeContext('!roast carol', mod), invoke)
+    assert executor.run(FakeContext('!roast dave', streamer), invoke)
+    await settle(executor.tasks)
+
+    assert len(invoke.calls) == 3
+    assert executor.on_cooldown == 0
+
+
+async def test_same_target_is_deduplicated_while_pending():
+    executor = executor_with()
+    invoke = Invoker(block=True)
+    assert executor.run(FakeContext('!roast @Bob', FakeAuthor('alice')), invoke)
+    assert not executor.run(FakeContext('!roast bob', FakeAuthor('carol')), invoke)
+    # A different channel is a different request
+    assert executor.run(FakeContext('!roast bob', FakeAuthor('carol'), channel='other'), invoke)
+    invoke.release.set()
+    await settle(executor.tasks)
+    # Once answered, the same target can be asked for again
+    assert executor.run(FakeContext('!roast BOB', FakeAuthor('dave')), invoke)
+    await settle(executor.tasks)
+
+    assert executor.deduplicated == 1
+    assert invoke.calls == ['!roast @Bob', '!roast bob', '!roast BOB']
+
+
+async def test_argumentless_commands_target_their_caller():
+    executor = executor_with()
+    invoke = Invoker(block=True)
+    assert executor.run(FakeContext('!roast', FakeAuthor('bob')), invoke)
+    assert executor.run(FakeContext('!roast', FakeAuthor('alice')), invoke)
+    assert not executor.run(FakeContext('!roast', FakeAuthor('bob')), invoke)
+    invoke.release.set()
+    await settle(executor.tasks)
+
+    assert executor.deduplicated == 1
+
+
+async def test_full_gate_rejects_and_throttles_busy_replies():
+    executor = executor_with(concurrency=1, queue_size=1)
+    invoke = Invoker(block=True)
+    assert executor.run(FakeContext('!roast a', FakeAuthor('u1')), invoke)
+    assert executor.run(FakeContext('!roast b', FakeAuthor('u2')), invoke)
+    await tick()
+    gate = executor.gates['roast']
+    full = (gate.running, gate.waiting)
+    admitted = [executor.run(FakeContext(f'!roast {target}', FakeAuthor(target)), invoke) for target in ('c', 'd')]
+    await tick()
+    # Assert only once nothing is blocked, so a failure can't leave tasks stuck at loop shutdown
+    invoke.release.set()
+    await settle(executor.tasks)
+
+    assert full == (1, 1)
+    assert admitted == [False, False]
+    assert executor.rejected == 2
+    assert invoke.calls == ['!roast a', '!roast b']
+    # Only one busy reply per command and channel inside the throttle window
+    assert len(executor.bot.sent) == 1
+    channel, content, priority = executor.bot.sent[0]
+    assert channel == 'volic' and content.startswith('@c,') and priority == LOW
+
+
+async def test_admission_does_not_wait_for_a_slot():
+    executor = executor_with(concurrency=1, queue_size=4)
+    invoke = Invoker(block=True)
+    for index in range(3):
+        # Returns straight away even though only one can run
+        assert executor.run(FakeContext(f'!roast t{index}', FakeAuthor(f'u{index}')), invoke)
+    await tick()
+    gate = executor.gates['roast']
+    state = (gate.running, gate.waiting, len(executor.tasks))
+    invoke.release.set()
+    await settle(executor.tasks)
+
+    assert state == (1, 2, 3)
+    assert executor.executed == 3
+
+
+async def test_queued_invocations_expire_after_max_wait():
+    executor = executor_with(concurrency=1, queue_size=1, max_wait=0.05)
+    invoke = Invoker(block=True)
+    executor.run(FakeContext('!roast a', FakeAuthor('u1')), invoke)
+    executor.run(FakeContext('!roast b', FakeAuthor('u2')), invoke)
+    await asyncio.sleep(0.1)
+    gate = executor.gates['roast']
+    state = (gate.running, gate.waiting, sorted(target for _, target in gate.pending))
+    invoke.release.set()
+    await settle(executor.tasks)
+
+    assert state == (1, 0, ['a'])
+    assert executor.expired == 1
+    assert invoke.calls == ['!roast a']
+
+
+async def test_stats_and_gate_bookkeeping():
+    executor = executor_with(user_cooldown=60)
+    invoke = Invoker()
+    executor.run(FakeContext('!roast a', FakeAuthor('u1')), invoke)
+    executor.run(FakeContext('!roast b', FakeAuthor('u1')), invoke)
+    executor.run(FakeContext('!rank', FakeAuthor('u2')), invoke)
+    await settle(executor.tasks)
+
+    stats = executor.stats()
+    assert stats['executed'] == 2
+    assert stats['on_cooldown'] == 1
+    assert stats['deduplicated'] == stats['rejected'] == stats['expired'] == 0
+    assert stats['commands'] == {'roast': {'running': 0, 'waiting': 0}, 'rank': {'running': 0, 'waiting': 0}}
+
+
+async def test_close_cancels_invocations_still_running():
+    executor = executor_with()
+    invoke = Invoker(block=True)
+    executor.run(FakeContext('!roast a', FakeAuthor('u1')), invoke)
+    await tick()
+    await executor.close(timeout=0.01)
+    await tick()
+
+    assert not executor.tasks
+    assert executor.gates['roast'].pending == set()
@@ -0,0 +1,83 @@
+from api.quote_search_index import QuoteSearchIndex, tokenize, trigrams
+
+
+def build(quotes):
+    index = QuoteSearchIndex()
+    for quote_id, (text, author) in quotes.items():
+        index.add(quote_id, text, author)
+    return index
+
+
+def test_tokenize_drops_apostrophes_and_case():
+    assert tokenize("Don't PEEK mid!") == ['dont', 'peek', 'mid']
+
+
+def test_trigrams_are_padded():
+    assert trigrams('ace') == {'  a', ' ac', 'ace', 'ce '}
+
+
+def test_exact_match_outranks_prefix_match():
+    index = build({
+        '1': ("the operator never misses", 'alice'),
+        '2': ("that op was free", 'bob'),
+    })
+    assert index.search('op') == ['2', '1']
+
+
+def test_prefix_matches_short_terms():
+    index = build({'1': ("what a clutch round", 'alice'), '2': ("eco round again", 'bob')})
+    assert index.search('clu') == ['1']
+
+
+def test_trigram_match_survives_typos():
+    index = build({'1': ("jett dashed straight into the smoke", 'alice'), '2': ("sage wall saved us", 'bob')})
+    assert index.search('straigth') == ['1']
+
+
+def test_author_matches_count_double():
+    index = build({
+        '1': ("bob said hello", 'alice'),
+        '2': ("hello there", 'bob'),
+    })
+    assert index.search('bob')[0] == '2'
+
+
+def test_phrase_boost_ranks_the_exact_phrase_first():
+    index = build({
+        '1': ("push b then rotate to a", 'alice'),
+        '2': ("rotate to b push", 'bob'),
+        '3': ("push b", 'carol'),
+    })
+    results = index.search('push b')
+    assert results.index('1') < results.index('2')
+    assert results.index('3') < results.index('2')
+
+
+def test_remove_forgets_the_vocabulary():
+    index = build({'1': ("unique spectre spray", 'alice')})
+    index.remove('1')
+    assert index.search('spectre') == []
+    assert 'spectre' not in index.vocabulary
+    assert not any('spectre' in tokens for tokens in index.trigram_tokens.values())
+
+
+def test_readding_a_quote_replaces_its_text():
+    index = build({'1': ("old text", 'alice')})
+    index.add('1', "new words", 'alice')
+    assert index.search('old') == []
+    assert index.search('words') == ['1']
+    assert len(index) == 1
+
+
+def test_limit_caps_results():
+    index = build({str(i): (f"gg number {i}", 'alice') for i in range(20)})
+    assert len(index.search('gg', limit=5)) == 5
+
+
+def test_phrase_boost_respects_word_boundaries():
+    index = build({
+        '1': ("push bravo", 'alice'),
+        '2': ("push b", 'carol'),
+    })
+    # "push b" is a prefix of "push bravo" but not the phrase
+    assert index.search('push b')[0] == '2'
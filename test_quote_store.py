@@ -0,0 +1,86 @@
+import random
+
+from api.quote_store import QuoteStore, ShuffleBag
+
+
+def drain(bag, count):
+    return [bag.draw() for _ in range(count)]
+
+
+def test_empty_bag_draws_none():
+    assert ShuffleBag().draw() is None
+
+
+def test_every_item_once_per_cycle():
+    random.seed(1)
+    bag = ShuffleBag()
+    for item in range(10):
+        bag.add(item)
+    for _ in range(5):
+        assert sorted(drain(bag, 10)) == list(range(10))
+
+
+def test_no_repeat_across_cycle_boundary():
+    random.seed(2)
+    bag = ShuffleBag()
+    for item in range(3):
+        bag.add(item)
+    draws = drain(bag, 300)
+    assert all(first != second for first, second in zip(draws, draws[1:]))
+
+
+def test_item_added_mid_cycle_is_drawn_in_that_cycle():
+    random.seed(3)
+    bag = ShuffleBag()
+    for item in range(5):
+        bag.add(item)
+    first = drain(bag, 2)
+    bag.add('new')
+    rest = drain(bag, 4)
+    assert sorted(map(str, first + rest)) == sorted(map(str, list(range(5)) + ['new']))
+
+
+def test_removed_item_is_never_drawn():
+    random.seed(4)
+    bag = ShuffleBag()
+    for item in range(6):
+        bag.add(item)
+    drawn = drain(bag, 2)
+    bag.remove(drawn[0])
+    undrawn = [item for item in range(6) if item not in drawn]
+    bag.remove(undrawn[0])
+    rest = drain(bag, 3)
+    assert sorted(rest) == sorted(undrawn[1:])
+    assert drawn[0] not in drain(bag, 40)
+    assert len(bag) == 4
+
+
+def test_positions_stay_consistent_under_churn():
+    random.seed(5)
+    bag = ShuffleBag()
+    for step in range(500):
+        action = random.random()
+        if action < 0.4:
+            bag.add(random.randrange(50))
+        elif action < 0.6 and bag.items:
+            bag.remove(random.choice(bag.items))
+        else:
+            bag.draw()
+        assert all(bag.items[index] == item for item, index in bag.positions.items())
+        assert len(bag.positions) == len(bag.items)
+        assert 0 <= bag.remaining <= len(bag.items)
+
+
+def test_duplicate_add_is_ignored():
+    bag = ShuffleBag()
+    bag.add('a')
+    bag.add('a')
+    assert len(bag) == 1
+
+
+def test_store_random_returns_quote_documents():
+    store = QuoteStore('volictv')
+    store.add('7', "nice shot", 'alice')
+    assert store.random() == {"_id": '7', "text": "nice shot", "author": 'alice', "channel": 'volictv'}
+    store.remove('7')
+    assert store.random() is None
@@ -0,0 +1,70 @@
+import asyncio
+
+from api.valorant_cache import ValorantCache
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query['_id']] = doc
+
+
+def make_cache():
+    return ValorantCache({'valorant_cache': FakeCollection()})
+
+
+async def test_concurrent_misses_share_one_fetch():
+    cache = make_cache()
+    calls = []
+
+    async def fetcher(background):
+        calls.append(background)
+        await asyncio.sleep(0.01)
+        return {'rank': 'Gold 2'}, None
+
+    results = await asyncio.gather(*(cache.get_or_fetch('account', 'volic#na1', fetcher) for _ in range(4)))
+    assert results == [({'rank': 'Gold 2'}, None)] * 4
+    assert calls == [False]
+
+
+async def test_cancelled_owner_hands_the_fetch_to_a_waiter():
+    cache = make_cache()
+
+    async def slow(background):
+        await asyncio.sleep(1)
+        return {'owner': True}, None
+
+    async def fast(background):
+        return {'waiter': True}, None
+
+    owner = asyncio.ensure_future(cache.get_or_fetch('matches', 'volic#na1', slow))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.ensure_future(cache.get_or_fetch('matches', 'volic#na1', fast))
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    assert await waiter == ({'waiter': True}, None)
+    assert owner.cancelled()
+    assert not cache.inflight
+    # The waiter's result is cached like any other fetch
+    assert await cache.get_or_fetch('matches', 'volic#na1', slow) == ({'waiter': True}, None)
+
+
+async def test_failed_fetch_propagates_to_waiters():
+    cache = make_cache()
+
+    async def broken(background):
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    results = await asyncio.gather(
+        cache.get_or_fetch('account', 'volic#na1', broken),
+        cache.get_or_fetch('account', 'volic#na1', broken),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class ComputeAbandoned(Exception):
+    # The caller computing a shared value was cancelled; waiters retry with their own factory
+    pass
+
+
+class AsyncTTLCache:
+    def __init__(self, ttl=300, maxsize=1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future shared by concurrent callers
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key, factory, ttl=None):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        # Single-flight: concurrent misses for the same key share one computation
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except ComputeAbandoned:
+                return await self.get_or_compute(key, factory, ttl)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel waiters that were never cancelled themselves
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_exception(ComputeAbandoned(key))
+            future.exception()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                # Avoid "exception was never retrieved" when nobody else was waiting
+                future.exception()
+            raise
+        else:
+            # An invalidation while computing means the value may already be stale
+            if self._inflight.get(key) is future:
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+        for key in [k for k in self._inflight if predicate(k)]:
+            del self._inflight[key]
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,56 @@
+import bisect
+import hashlib
+import json
+
+import config
+
+
+def channel_key(channel):
+    # Channel objects and '#name' strings both normalise to the bare lowercase login
+    return (channel if isinstance(channel, str) else channel.name).lstrip('#').lower()
+
+
+def configured_channels():
+    # TWITCH_CHANNELS_FILE (a JSON list) wins so partners can be added without a redeploy
+    channels = None
+    channels_file = getattr(config, 'TWITCH_CHANNELS_FILE', None)
+    if channels_file:
+        try:
+            with open(channels_file, 'r', encoding='utf-8') as file:
+                channels = json.load(file)
+        except (FileNotFoundError, ValueError):
+            channels = None
+    if channels is None:
+        channels = getattr(config, 'TWITCH_CHANNELS', None) or [config.TWITCH_CHANNEL]
+    return sorted({channel_key(channel) for channel in channels if channel})
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    def __init__(self, nodes, replicas=100):
+        self.replicas = replicas
+        self.ring = []  # sorted (hash, node)
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            bisect.insort(self.ring, (_hash(f"{node}:{replica}"), node))
+
+    def remove(self, node):
+        self.ring = [(point, owner) for point, owner in self.ring if owner != node]
+
+    def node_for(self, key):
+        if not self.ring:
+            return None
+        index = bisect.bisect(self.ring, (_hash(key),)) % len(self.ring)
+        return self.ring[index][1]
+
+    def assign(self, keys):
+        assignment = {}
+        for key in keys:
+            assignment.setdefault(self.node_for(key), []).append(key)
+        return assignment
@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+import config
+from utils.logger import bot_logger
+
+# What a stage does with a new item when its queue is full
+BLOCK = 'block'  # Wait for space; for work that must not be lost
+DROP_NEWEST = 'drop_newest'  # Refuse the new item
+DROP_OLDEST = 'drop_oldest'  # Evict the oldest queued item; for work that goes stale
+
+OVERLOAD_LOG_INTERVAL = 30
+
+
+class Stage:
+    def __init__(self, name, handler, concurrency=1, maxsize=100, overload=DROP_NEWEST):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.overload = overload
+        self.queue = asyncio.Queue(maxsize)
+        self.workers = []
+
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_overload_log = 0.0
+
+    def start(self):
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        while len(self.workers) < self.concurrency:
+            self.workers.append(asyncio.ensure_future(self._worker()))
+
+    async def put(self, item):
+        if self.overload == BLOCK:
+            await self.queue.put(item)
+            return True
+        return self.offer(item)
+
+    def offer(self, item):
+        if self.queue.full():
+            if self.overload != DROP_OLDEST:
+                self._drop()
+                return False
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self._drop()
+        self.queue.put_nowait(item)
+        return True
+
+    def _drop(self):
+        self.dropped += 1
+        now = time.monotonic()
+        if now - self.last_overload_log >= OVERLOAD_LOG_INTERVAL:
+            self.last_overload_log = now
+            bot_logger.warning(
+                f"Chat pipeline stage '{self.name}' is overloaded ({self.queue.qsize()} queued, {self.dropped} dropped so far)"
+            )
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                bot_logger.error(f"Chat pipeline stage '{self.name}' failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        return {
+            "depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def close(self, timeout=0):
+        # Finish what's already queued first, bounded so one stuck handler can't hold up shutdown
+        if timeout and self.workers:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                bot_logger.warning(f"Chat pipeline stage '{self.name}' closed with {self.queue.qsize()} items still queued")
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+
+class ChatPipeline:
+    """Fans incoming chat out to independent worker stages so slow work never holds up later messages."""
+
+    def __init__(self, bot, maxsize=None, drain_timeout=None):
+        self.bot = bot
+        self.drain_timeout = drain_timeout or getattr(config, 'CHAT_PIPELINE_DRAIN_SECONDS', 5)
+        # event_message only does a put_nowait; classification runs on its own worker
+        self.ingress = Stage(
+            'ingress', self._route, concurrency=1,
+            maxsize=maxsize or getattr(config, 'CHAT_PIPELINE_QUEUE_SIZE', 2000), overload=DROP_NEWEST,
+        )
+        self.stages = {
+            stage.name: stage for stage in (
+                # One worker keeps StreamElements replies in order for the quote backfill; fed straight
+                # from submit so it never waits behind routing, and a dropped reply is just retried next backfill
+                Stage('quotes', bot.process_quote_message, concurrency=1, maxsize=500, overload=DROP_NEWEST),
+                # Only parsing and admission happen here; the executor runs admitted commands on their own tasks
+                Stage('commands', bot.dispatch_command, concurrency=2, maxsize=200, overload=DROP_NEWEST),
+                Stage('first_message', bot.process_first_message, concurrency=2, maxsize=100, overload=DROP_NEWEST),
+                # A random reply to a message from minutes ago makes no sense, so the oldest go first
+                Stage('ai_replies', bot.send_random_reply, concurrency=1, maxsize=5, overload=DROP_OLDEST),
+            )
+        }
+
+    def start(self):
+        self.ingress.start()
+        for stage in self.stages.values():
+            stage.start()
+
+    def submit(self, message):
+        # Called from event_message, so it never awaits. Chat history is only a buffer enqueue and
+        # quote replies feed the backfill, so neither waits for routing or is lost when ingress is full
+        self.bot.persist_message(message)
+        if not message.echo and self.bot.is_quote_response(message):
+            self.stages['quotes'].offer(message)
+        return self.ingress.offer(message)
+
+    async def _route(self, message):
+        if message.echo:
+            return
+
+        # A string prefix check is far cheaper than building a twitchio Context for every line
+        if message.content.startswith(self.bot.prefix):
+            await self.stages['commands'].put(message)
+            return
+
+        # Only a queued greeting counts; a dropped one is retried on the user's next message
+        if self.bot.is_first_message(message) and self.stages['first_message'].offer(message):
+            self.bot.mark_first_message(message)
+        if self.bot.wants_random_reply(message):
+            await self.stages['ai_replies'].put(message)
+
+    def stats(self):
+        stats = {"ingress": self.ingress.stats()}
+        stats.update({name: stage.stats() for name, stage in self.stages.items()})
+        return stats
+
+    async def close(self):
+        # Ingress drains first so everything it routes still reaches a stage before those drain
+        await self.ingress.close(self.drain_timeout)
+        await asyncio.gather(*(stage.close(self.drain_timeout) for stage in self.stages.values()))
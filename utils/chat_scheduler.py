@@ -0,0 +1,247 @@
+import asyncio
+import collections
+import time
+import unicodedata
+
+import config
+from utils.logger import bot_logger
+from utils.channels import channel_key
+
+HIGH = 0
+LOW = 1
+
+# Twitch counts its 500 character limit in code points
+MAX_MESSAGE_LENGTH = 500
+MERGE_SEPARATOR = " | "
+
+# Twitch allows 20 messages per 30s in channels where the bot is a regular user,
+# 100 where it is a moderator or the broadcaster; regular users also get at most one per second
+USER_LIMIT = (20, 30, 1.0)
+MOD_LIMIT = (100, 30, 0.0)
+
+
+def _joins_previous(char):
+    # Code points that belong to the grapheme before them: combining marks, ZWJ,
+    # variation selectors, emoji skin tones, keycaps and tag sequences (subdivision flags)
+    code = ord(char)
+    return (
+        unicodedata.combining(char)
+        or code == 0x200D
+        or 0xFE00 <= code <= 0xFE0F
+        or 0x1F3FB <= code <= 0x1F3FF
+        or code == 0x20E3
+        or 0xE0020 <= code <= 0xE007F
+    )
+
+
+def _is_regional_indicator(char):
+    return 0x1F1E6 <= ord(char) <= 0x1F1FF
+
+
+def _safe_cut(text, index):
+    # Move a cut point left until it no longer lands inside a grapheme cluster
+    while 0 < index < len(text) and (_joins_previous(text[index]) or text[index - 1] == '\u200d'):
+        index -= 1
+    if 0 < index < len(text) and _is_regional_indicator(text[index]):
+        run = 0
+        while index - run > 0 and _is_regional_indicator(text[index - run - 1]):
+            run += 1
+        if run % 2:
+            index -= 1  # Don't split a flag's pair of regional indicators
+    return index if index > 0 else None
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """Split text into chat-sized chunks, preferring paragraph, line, sentence and word breaks."""
+    chunks = []
+    text = text.strip()
+    while len(text) > limit:
+        cut = None
+        for separator in ('\n\n', '\n', '. ', ' '):
+            index = text.rfind(separator, 0, limit)
+            if index > limit // 3:
+                cut = index + (1 if separator == '. ' else 0)
+                break
+        if cut is None:
+            cut = _safe_cut(text, limit) or limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    # IRC lines can't carry newlines, anything after one would be lost
+    return [' '.join(chunk.split()) for chunk in chunks]
+
+
+class ChannelQueue:
+    def __init__(self, name, limits):
+        self.name = name
+        self.high = collections.deque()
+        self.low = collections.deque()  # [text, queued_at]
+        self.ready = asyncio.Event()
+        self.worker = None
+        self.is_mod = False
+        self.capacity, self.period, self.min_interval = limits
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.last_sent = 0.0
+
+    def set_limits(self, limits, is_mod):
+        self.refill()
+        self.is_mod = is_mod
+        self.capacity, self.period, self.min_interval = limits
+        self.tokens = min(self.tokens, self.capacity)
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / self.period)
+        self.updated_at = now
+
+    def __len__(self):
+        return len(self.high) + len(self.low)
+
+
+class ChatScheduler:
+    def __init__(self, bot, max_pending=None, low_priority_max_age=None):
+        self.bot = bot
+        self.max_pending = max_pending or getattr(config, 'CHAT_MAX_PENDING', 50)
+        self.low_priority_max_age = low_priority_max_age or getattr(config, 'CHAT_LOW_PRIORITY_MAX_AGE', 30)
+        self.user_limits = getattr(config, 'CHAT_USER_LIMIT', USER_LIMIT)
+        self.mod_limits = getattr(config, 'CHAT_MOD_LIMIT', MOD_LIMIT)
+        self.queues = {}  # channel name -> ChannelQueue
+        self.channels = {}  # channel name -> twitchio Channel
+
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _queue_for(self, name):
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = ChannelQueue(name, self.user_limits)
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.ensure_future(self._worker(queue))
+        return queue
+
+    def _get_channel(self, name):
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.bot.get_channel(name)
+            if channel is not None:
+                self.channels[name] = channel
+        return channel
+
+    def set_mod(self, channel, is_mod):
+        name = channel_key(channel)
+        queue = self._queue_for(name)
+        if queue.is_mod != is_mod:
+            queue.set_limits(self.mod_limits if is_mod else self.user_limits, is_mod)
+            bot_logger.info(f"Chat rate limit for #{name}: {queue.capacity}/{queue.period}s (moderator: {is_mod})")
+
+    def forget_channel(self, channel):
+        name = channel_key(channel)
+        self.channels.pop(name, None)
+        queue = self.queues.pop(name, None)
+        if queue and queue.worker:
+            queue.worker.cancel()
+
+    async def send(self, channel, content, priority=HIGH):
+        if not content:
+            return
+        name = channel_key(channel)
+        if not isinstance(channel, str):
+            self.channels.setdefault(name, channel)
+        queue = self._queue_for(name)
+
+        for chunk in split_message(str(content)):
+            if priority == HIGH:
+                # Make room by shedding low-priority chatter first
+                if len(queue) >= self.max_pending and queue.low:
+                    queue.low.popleft()
+                    self.dropped += 1
+                if len(queue) >= self.max_pending:
+                    self.dropped += 1
+                    bot_logger.warning(f"Outbound chat queue for #{name} is full, dropping a reply")
+                    continue
+                queue.high.append(chunk)
+            else:
+                last = queue.low[-1] if queue.low else None
+                if last and len(last[0]) + len(MERGE_SEPARATOR) + len(chunk) <= MAX_MESSAGE_LENGTH:
+                    last[0] = f"{last[0]}{MERGE_SEPARATOR}{chunk}"
+                    self.merged += 1
+                    continue
+                if len(queue) >= self.max_pending:
+                    self.dropped += 1
+                    continue
+                queue.low.append([chunk, time.monotonic()])
+        queue.ready.set()
+
+    def _next_message(self, queue):
+        if queue.high:
+            return queue.high.popleft()
+        while queue.low:
+            text, queued_at = queue.low.popleft()
+            if time.monotonic() - queued_at <= self.low_priority_max_age:
+                return text
+            self.dropped += 1  # Too late to still be relevant to the conversation
+        return None
+
+    async def _wait_for_slot(self, queue):
+        while True:
+            queue.refill()
+            wait = max(0.0, queue.last_sent + queue.min_interval - time.monotonic())
+            if queue.tokens < 1:
+                wait = max(wait, (1 - queue.tokens) * queue.period / queue.capacity)
+            if wait <= 0:
+                queue.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+    async def _worker(self, queue):
+        while True:
+            if not len(queue):
+                queue.ready.clear()
+                await queue.ready.wait()
+                continue
+            await self._wait_for_slot(queue)
+            text = self._next_message(queue)
+            if text is None:
+                queue.tokens += 1  # Only expired chatter was waiting; give the slot back
+                continue
+
+            channel = self._get_channel(queue.name)
+            if channel is None:
+                self.failed += 1
+                bot_logger.error(f"Error: Channel {queue.name} not found, dropping message")
+                continue
+            try:
+                await channel.send(text)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                self.channels.pop(queue.name, None)
+                bot_logger.error(f"Failed to send message to #{queue.name}: {e}")
+            finally:
+                queue.last_sent = time.monotonic()
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "channels": {
+                name: {
+                    "pending_high": len(queue.high),
+                    "pending_low": len(queue.low),
+                    "tokens": round(queue.tokens, 2),
+                    "moderator": queue.is_mod,
+                }
+                for name, queue in self.queues.items()
+            },
+        }
+
+    async def close(self):
+        for queue in self.queues.values():
+            if queue.worker:
+                queue.worker.cancel()
@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import config
+from utils.logger import command_logger
+from utils.channels import channel_key
+from utils.chat_scheduler import LOW
+
+BUSY_REPLY_INTERVAL = 10  # At most one "busy" reply per command and channel in this many seconds
+
+
+class CommandPolicy:
+    def __init__(self, concurrency=4, queue_size=16, max_wait=30, user_cooldown=2, command_cooldown=0):
+        self.concurrency = concurrency  # Invocations of the command running at once, across channels
+        self.queue_size = queue_size  # Invocations allowed to wait for a slot before new ones are rejected
+        self.max_wait = max_wait  # Seconds a queued invocation may wait before it is dropped as stale
+        self.user_cooldown = user_cooldown  # Seconds between one user's invocations of the command
+        self.command_cooldown = command_cooldown  # Seconds between any invocations of the command in a channel
+
+
+DEFAULT_POLICY = {'concurrency': 4, 'queue_size': 16, 'max_wait': 30, 'user_cooldown': 2}
+# Commands that hold an LLM call, Helix/HenrikDev requests and Mongo reads for seconds at a time
+LLM_POLICY = {'concurrency': 2, 'queue_size': 4, 'max_wait': 20, 'user_cooldown': 20}
+STATS_POLICY = {'concurrency': 2, 'queue_size': 4, 'max_wait': 20, 'user_cooldown': 15}
+
+POLICIES = {
+    'airesponse': LLM_POLICY,
+    'roast': LLM_POLICY,
+    'compliment': LLM_POLICY,
+    'rizz': LLM_POLICY,
+    'compatibility': LLM_POLICY,
+    'ship': LLM_POLICY,
+    'valocoach': LLM_POLICY,
+    'valostat': STATS_POLICY,
+    'valomatch': STATS_POLICY,
+    'valomatches': STATS_POLICY,
+    'rank': STATS_POLICY,
+    'quotesearch': {'concurrency': 3, 'queue_size': 8, 'max_wait': 15, 'user_cooldown': 5},
+}
+
+
+class CommandGate:
+    def __init__(self, name, policy):
+        self.name = name
+        self.policy = policy
+        self.semaphore = asyncio.Semaphore(policy.concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.pending = set()  # (channel, target) of invocations queued or running
+        self.last_channel_use = {}  # channel -> monotonic time
+        self.last_user_use = {}  # user_id -> monotonic time
+        self.last_busy_reply = {}  # channel -> monotonic time
+
+    def prune(self, now):
+        # Forget cooldowns that have already expired so the maps don't grow with every chatter
+        if len(self.last_user_use) > 1000:
+            self.last_user_use = {
+                user_id: used for user_id, used in self.last_user_use.items()
+                if now - used < self.policy.user_cooldown
+            }
+
+
+class CommandExecutor:
+    """Runs commands behind per-command cooldowns, concurrency caps and bounded wait queues."""
+
+    def __init__(self, bot, policies=None):
+        self.bot = bot
+        self.policies = dict(POLICIES)
+        self.policies.update(getattr(config, 'COMMAND_POLICIES', {}))
+        self.policies.update(policies or {})
+        self.gates = {}  # command name -> CommandGate
+        self.tasks = set()  # admitted invocations, waiting for a slot or running
+
+        self.executed = 0
+        self.on_cooldown = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def _gate(self, name):
+        gate = self.gates.get(name)
+        if gate is None:
+            policy = CommandPolicy(**{**DEFAULT_POLICY, **self.policies.get(name, {})})
+            gate = self.gates[name] = CommandGate(name, policy)
+        return gate
+
+    @staticmethod
+    def _target(ctx):
+        # "!roast @Bob" and "!roast bob" are the same request; argument-less commands target their caller
+        content = ctx.message.content[len(ctx.prefix):].split()[1:]
+        target = ' '.join(word.lstrip('@').lower() for word in content)
+        return target or f"@{ctx.author.name.lower()}"
+
+    @staticmethod
+    def _is_privileged(ctx):
+        return bool(ctx.author.is_mod or getattr(ctx.author, 'is_broadcaster', False))
+
+    def run(self, ctx, invoke):
+        """Admit or refuse an invocation without waiting; admitted ones wait for a slot on their own task.
+
+        Returns whether the invocation was admitted.
+        """
+        key = self.admit(ctx)
+        if key is None:
+            return False
+        self._spawn(self._execute(ctx, invoke, key))
+        return True
+
+    def admit(self, ctx):
+        # Every check and reservation happens without awaiting, so two invocations can't both pass
+        gate = self._gate(ctx.command.name)
+        policy = gate.policy
+        channel = channel_key(ctx.channel)
+        now = time.monotonic()
+
+        # Cooldown hits are ignored silently; answering them would be the spam we're avoiding
+        if not self._is_privileged(ctx):
+            if now - gate.last_channel_use.get(channel, -policy.command_cooldown) < policy.command_cooldown:
+                self.on_cooldown += 1
+                return None
+            if now - gate.last_user_use.get(ctx.author.id, -policy.user_cooldown) < policy.user_cooldown:
+                self.on_cooldown += 1
+                return None
+
+        key = (channel, self._target(ctx))
+        if key in gate.pending:
+            # The reply already on its way answers this one too
+            self.deduplicated += 1
+            return None
+
+        if gate.running + gate.waiting >= policy.concurrency + policy.queue_size:
+            self.rejected += 1
+            self._reply_busy(ctx, gate, channel, now)
+            return None
+
+        gate.last_channel_use[channel] = now
+        gate.last_user_use[ctx.author.id] = now
+        gate.prune(now)
+        gate.pending.add(key)
+        gate.waiting += 1
+        return key
+
+    async def _execute(self, ctx, invoke, key):
+        gate = self._gate(ctx.command.name)
+        channel, _ = key
+        try:
+            try:
+                await asyncio.wait_for(gate.semaphore.acquire(), timeout=gate.policy.max_wait)
+            except asyncio.TimeoutError:
+                self.expired += 1
+                command_logger.warning(f"Dropped !{gate.name} in #{channel} after waiting {gate.policy.max_wait}s for a slot")
+                return
+            finally:
+                gate.waiting -= 1
+            gate.running += 1
+            try:
+                await invoke(ctx)
+                self.executed += 1
+            except Exception as e:
+                command_logger.error(f"!{gate.name} failed in #{channel}: {e}")
+            finally:
+                gate.running -= 1
+                gate.semaphore.release()
+        finally:
+            gate.pending.discard(key)
+
+    def _reply_busy(self, ctx, gate, channel, now):
+        if now - gate.last_busy_reply.get(channel, -BUSY_REPLY_INTERVAL) < BUSY_REPLY_INTERVAL:
+            return
+        gate.last_busy_reply[channel] = now
+        command_logger.info(f"!{gate.name} is saturated in #{channel}, rejecting new invocations")
+        self._spawn(self.bot.send_message(
+            ctx.channel, f"@{ctx.author.name}, !{gate.name} is swamped right now, try again in a bit.", priority=LOW
+        ))
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def stats(self):
+        return {
+            "executed": self.executed,
+            "on_cooldown": self.on_cooldown,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "commands": {
+                name: {"running": gate.running, "waiting": gate.waiting}
+                for name, gate in self.gates.items()
+            },
+        }
+
+    async def close(self, timeout=5):
+        # Let invocations already admitted finish for a moment, then cancel the rest
+        if self.tasks:
+            _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,89 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+import config
+from utils.logger import bot_logger
+
+DATABASE_NAME = 'twitch_bot_db'
+
+# Every index a query path depends on: collection -> [(keys, options)]
+INDEXES = {
+    'users': [
+        ([('username', 1)], {'name': 'username'}),
+    ],
+    'quotes': [
+        ([('channel', 1), ('author', 1)], {'name': 'channel_author'}),
+    ],
+    'twitch_identities': [
+        ([('updated_at', 1)], {
+            'name': 'updated_at_ttl',
+            'expireAfterSeconds': getattr(config, 'IDENTITY_TTL_DAYS', 7) * 86400,
+        }),
+    ],
+    'valorant_matches': [
+        ([('players.all_players.puuid', 1), ('metadata.game_start', -1)], {'name': 'player_game_start'}),
+    ],
+    'valorant_cache': [
+        ([('expires_at', 1)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+    ],
+    'response_pool': [
+        ([('template', 1), ('created_at', 1)], {'name': 'template_created_at'}),
+        ([('expires_at', 1)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+    ],
+}
+
+
+class Database:
+    def __init__(self, uri=None, name=DATABASE_NAME):
+        self.client = AsyncIOMotorClient(
+            uri or config.MONGO_URI,
+            maxPoolSize=getattr(config, 'MONGO_MAX_POOL_SIZE', 50),
+            minPoolSize=getattr(config, 'MONGO_MIN_POOL_SIZE', 2),
+            maxIdleTimeMS=60000,
+            serverSelectionTimeoutMS=5000,
+            retryWrites=True,
+            appname='VolicAI',
+        )
+        self.db = self.client[name]
+
+    def __getitem__(self, collection_name):
+        return self.db[collection_name]
+
+    async def ensure_indexes(self):
+        for collection_name, indexes in INDEXES.items():
+            collection = self.db[collection_name]
+            for keys, options in indexes:
+                try:
+                    await collection.create_index(keys, **options)
+                except OperationFailure as e:
+                    # An index with the same keys but different options already exists
+                    bot_logger.warning(f"Could not create index {options.get('name')} on {collection_name}: {e}")
+        bot_logger.info("Database indexes ensured")
+
+    def sample_queries(self, channel_name):
+        return [
+            ('users', {'username': 'volictv'}),
+            ('quotes', {'channel': channel_name, 'author': '@volictv'}),
+            ('quotes', {'channel': channel_name}),
+        ]
+
+    async def check_query_plans(self, channel_name):
+        for collection_name, query in self.sample_queries(channel_name):
+            try:
+                plan = await self.db[collection_name].find(query).explain()
+            except Exception as e:
+                bot_logger.warning(f"Could not explain query {query} on {collection_name}: {e}")
+                continue
+            if self._has_collection_scan(plan.get('queryPlanner', {}).get('winningPlan', {})):
+                bot_logger.warning(f"Query {query} on {collection_name} is a collection scan")
+
+    def _has_collection_scan(self, stage):
+        if isinstance(stage, dict):
+            if stage.get('stage') == 'COLLSCAN':
+                return True
+            return any(self._has_collection_scan(value) for value in stage.values())
+        if isinstance(stage, list):
+            return any(self._has_collection_scan(value) for value in stage)
+        return False
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import random
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import config
+from utils.logger import api_logger
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Connection limits for the hosts we talk to; anything else gets the default
+HOST_LIMITS = {
+    "api.twitch.tv": 20,
+    "id.twitch.tv": 4,
+    "api.henrikdev.xyz": 10,
+}
+DEFAULT_HOST_LIMIT = 10
+
+
+class HttpResponse:
+    def __init__(self, status, headers, body, url):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpClient:
+    def __init__(self, timeout=None, connect_timeout=None, max_retries=None, backoff_base=0.5, backoff_cap=8.0):
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout or getattr(config, 'HTTP_TIMEOUT_SECONDS', 10),
+            connect=connect_timeout or getattr(config, 'HTTP_CONNECT_TIMEOUT_SECONDS', 3),
+        )
+        self.max_retries = getattr(config, 'HTTP_MAX_RETRIES', 2) if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.sessions = {}  # host -> keep-alive ClientSession
+        self._closed = False
+
+    def _session_for(self, url):
+        host = urlsplit(url).hostname
+        session = self.sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT),
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self.sessions[host] = session
+        return session
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter keeps simultaneous retries from landing together
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method, url, *, params=None, headers=None, json=None, data=None, retries=None):
+        if self._closed:
+            raise RuntimeError("HTTP client is closed")
+        retries = self.max_retries if retries is None else retries
+        session = self._session_for(url)
+
+        attempt = 0
+        while True:
+            try:
+                async with session.request(method, url, params=params, headers=headers, json=json, data=data) as response:
+                    body = await response.read()
+                    result = HttpResponse(response.status, response.headers.copy(), body, str(response.url))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                api_logger.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+            else:
+                if result.status not in RETRY_STATUSES or attempt >= retries:
+                    return result
+                delay = self._backoff_delay(attempt, result.headers.get('Retry-After'))
+                api_logger.warning(f"{method} {url} returned {result.status}, retrying in {delay:.2f}s")
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        self._closed = True
+        sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            await session.close()
@@ -1,18 +1,130 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 
+import config
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Per-logger token bucket plus fixed-rate sampling; warnings and errors always pass
+class ThrottleFilter(logging.Filter):
+    def __init__(self, rate, burst, sample_rates):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample_rates = sample_rates
+        self.buckets = {}  # logger name -> [tokens, last refill]
+        self.dropped = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        sample_rate = self.sample_rates.get(record.name)
+        if sample_rate is not None and random.random() >= sample_rate:
+            return False
+
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.setdefault(record.name, [self.burst, now])
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            self.dropped[record.name] = self.dropped.get(record.name, 0) + 1
+            return False
+
+
+class LazyQueueHandler(QueueHandler):
+    # The queue never leaves this process, so the record is handed over as-is and
+    # message formatting happens on the listener thread instead of the event loop
+    def prepare(self, record):
+        return record
+
+
+def _formatter(fmt):
+    return JsonFormatter() if getattr(config, 'LOG_JSON', False) else logging.Formatter(fmt)
+
+
+def _console_handler():
+    # Reconfigure stdout itself rather than wrapping its buffer, so print() and logging share one
+    # stream and emoji or other non-ASCII chat never break either on narrow consoles
+    try:
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    except (AttributeError, ValueError):
+        pass  # Not a TextIOWrapper (redirected or captured); leave it as it is
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_formatter(CONSOLE_FORMAT))
+    return handler
+
+
+log_queue = queue.SimpleQueue()
+throttle = ThrottleFilter(
+    rate=getattr(config, 'LOG_RATE_LIMIT', 50),
+    burst=getattr(config, 'LOG_RATE_BURST', 200),
+    sample_rates=getattr(config, 'LOG_SAMPLE_RATES', {'bot.chat': 0.1}),
+)
+listener = QueueListener(log_queue, _console_handler(), respect_handler_level=True)
+listener_started = False
+
+
+def setup_logging(level=None):
+    root = logging.getLogger()
+    root.setLevel(level or getattr(logging, getattr(config, 'LOG_LEVEL', 'INFO')))
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(throttle)
+    root.handlers = [queue_handler]
+    global listener_started
+    if not listener_started:
+        listener.start()
+        listener_started = True
+        atexit.register(listener.stop)
+
+
+def _log_path(log_file):
+    # Supervisor workers each rotate their own files; RotatingFileHandler isn't multi-process safe
+    worker = os.environ.get('VOLICAI_WORKER')
+    if worker is None:
+        return log_file
+    root, ext = os.path.splitext(log_file)
+    return f"{root}.worker-{worker}{ext}"
+
+
 def setup_logger(name, log_file, level=logging.INFO):
     """Function to setup as many loggers as you want"""
 
-    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-    
-    handler = RotatingFileHandler(log_file, maxBytes=1024*1024*5, backupCount=5)  # 5MB per file, keep 5 old files
-    handler.setFormatter(formatter)
+    handler = RotatingFileHandler(_log_path(log_file), maxBytes=1024*1024*5, backupCount=5, encoding='utf-8')  # 5MB per file, keep 5 old files
+    handler.setFormatter(_formatter(LOG_FORMAT))
+    # Only this logger's records (and its children's) go to its file; the listener sees everything
+    handler.addFilter(logging.Filter(name))
+    listener.handlers = listener.handlers + (handler,)
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(handler)
 
     return logger
 
@@ -20,7 +132,10 @@ def setup_logger(name, log_file, level=logging.INFO):
 if not os.path.exists('logs'):
     os.makedirs('logs')
 
+setup_logging()
+
 # Setup loggers
 bot_logger = setup_logger('bot', 'logs/bot.log')
 command_logger = setup_logger('commands', 'logs/commands.log')
 api_logger = setup_logger('api', 'logs/api.log')
+chat_logger = logging.getLogger('bot.chat')  # High-volume per-message logging, sampled by LOG_SAMPLE_RATES
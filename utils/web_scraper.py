@@ -1,9 +1,8 @@
 import requests
 from bs4 import BeautifulSoup
 
-def scrape_web_data(url, table_id=None, tag=None):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+def parse_web_data(html, table_id=None, tag=None):
+    soup = BeautifulSoup(html, 'html.parser')
     
     if tag == 'h3':
         # Extract text from all h3 tags
@@ -19,3 +18,7 @@ def scrape_web_data(url, table_id=None, tag=None):
             data = []
     
     return data
+
+def scrape_web_data(url, table_id=None, tag=None):
+    response = requests.get(url)
+    return parse_web_data(response.text, table_id=table_id, tag=tag)